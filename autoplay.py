@@ -0,0 +1,103 @@
+import math
+import random
+
+from features import FEATURE_NAMES, BoardFeatures, evaluate_placements
+from main import ACTIONS, TetrisGame, enumerate_placements
+
+# Autoplayer for headless runs, benchmarks and soak tests.
+#
+# A policy looks at the game and returns the (rotation, x) it wants the current
+# piece at, or None to leave it to gravity. play_placement() then gets there
+# with ordinary player actions, so games are recorded and replayed like any
+# other.
+
+# Weights for the heuristic policy (after Yiyuan Lee's tuned 4 feature player)
+HEURISTIC_WEIGHTS = {'aggregate_height': -0.51, 'lines_cleared': 0.76, 'holes': -0.36, 'bumpiness': -0.18}
+WEIGHT_VECTOR = [HEURISTIC_WEIGHTS.get(name, 0) for name in FEATURE_NAMES]
+
+def idle_policy(game, rng):
+    return None
+
+def random_policy(game, rng):
+    piece = game.current_piece
+    placements = enumerate_placements(game.grid, piece.shape, game.rotation_system, piece.y)
+    if not placements:
+        return None
+    rotation, x, _ = rng.choice(placements)
+    return rotation, x
+
+def heuristic_policy(game, rng):
+    piece = game.current_piece
+    placements = enumerate_placements(game.grid, piece.shape, game.rotation_system, piece.y)
+    if not placements:
+        return None
+    features = BoardFeatures.from_grid(game.grid, game.corrupted_grid)
+    best = max(evaluate_placements(features, placements, piece.states, piece.is_corrupted),
+               key=lambda result: sum(w * v for w, v in zip(WEIGHT_VECTOR, result[1])))
+    rotation, x, _ = best[0]
+    return rotation, x
+
+POLICIES = {
+    'idle': idle_policy,
+    'random': random_policy,
+    'heuristic': heuristic_policy,
+}
+
+def play_placement(game, rotation, x):
+    """Rotate and shift the current piece to (rotation, x) and hard drop it"""
+    piece = game.current_piece
+    turns = (rotation - piece.rotation) % len(piece.states)
+    if turns == 3:
+        game.perform(ACTIONS['rotate_ccw'])
+    else:
+        for _ in range(turns):
+            game.perform(ACTIONS['rotate_cw'])
+    # Kicks can move the piece, so steer by where it actually is
+    while piece.x != x:
+        dx = -1 if x < piece.x else 1
+        if not game.is_valid_position(piece, dx, 0):
+            break
+        game.perform(ACTIONS['left' if dx < 0 else 'right'])
+    game.perform(ACTIONS['hard_drop'])
+
+def advance(game, ms):
+    """Run the game ms forward, jumping straight from one gravity step, lock or
+    boss event to the next instead of ticking frames. Returns False on game
+    over, and stops early once the boss is beaten."""
+    end = game.game_time + ms
+    while game.game_time < end:
+        # Whole ms, recordings store the steps as integers
+        wait = max(1, math.ceil(game.time_until_next_event()))
+        if not game.update(min(wait, end - game.game_time)):
+            return False
+        if game.game_won:
+            break
+    return True
+
+def play_game(game, policy, pps=2.0, max_time=600000, seed=None):
+    """Play until game over, a boss kill or max_time ms of game time.
+    Returns 'lost', 'won' or 'timeout'."""
+    rng = random.Random(game.seed if seed is None else seed)
+    delay = max(1, int(1000 / pps))
+    while game.game_time < max_time:
+        move = policy(game, rng)
+        if move is not None:
+            play_placement(game, *move)
+        if not advance(game, delay):
+            return 'lost'
+        if game.game_won:
+            return 'won'
+    return 'timeout'
+
+def run_games(count, policy='heuristic', boss_mode=False, seed=None, ruleset=None, rotation_system='classic',
+              pps=2.0, max_time=600000, record=False):
+    """Play `count` headless games, yields (game, outcome) as each one finishes.
+    Game i uses seed + i when a seed is given, so a run can be repeated exactly."""
+    play = POLICIES[policy]
+    options = {'ruleset': ruleset} if ruleset else {}
+    for i in range(count):
+        game = TetrisGame(boss_mode, rotation_system=rotation_system, seed=None if seed is None else seed + i,
+                          headless=True, **options)
+        if record:
+            game.start_recording()
+        yield game, play_game(game, play, pps, max_time)
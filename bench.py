@@ -0,0 +1,130 @@
+import os
+import random
+import time
+
+import autoplay
+import main
+from features import BoardFeatures, evaluate_placements
+from main import ACTIONS, ROTATION_SYSTEMS, TetrisGame, enumerate_placements
+from puzzle import PUZZLES
+from solver import Solver
+
+# Benchmark suite. Every benchmark returns a dict with its name, how many
+# operations it timed and the time per operation, so results can be compared
+# across machines and commits (python main.py --benchmark prints them as JSON lines).
+
+def timed(name, count, run):
+    start = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - start
+    return {'benchmark': name, 'ops': count, 'total_ms': round(elapsed * 1000, 3),
+            'per_op_us': round(elapsed * 1e6 / max(1, count), 3)}
+
+def sample_boards(count=50, seed=1):
+    """Mid-game boards from short heuristic games, shared by the board benchmarks"""
+    return [([row[:] for row in game.grid], [row[:] for row in game.corrupted_grid])
+            for game, _ in autoplay.run_games(count, 'heuristic', seed=seed, pps=4, max_time=20000)]
+
+def bench_simulation(games=10, seed=1):
+    """Whole headless games with the heuristic player, classic and boss"""
+    results = []
+    for boss_mode in (False, True):
+        finished = []
+        def run():
+            finished.extend(autoplay.run_games(games, 'heuristic', boss_mode, seed=seed, max_time=120000))
+        result = timed('simulation_boss' if boss_mode else 'simulation_classic', games, run)
+        result['pieces'] = sum(sum(game.piece_counts.values()) for game, _ in finished)
+        result['game_ms'] = int(sum(game.game_time for game, _ in finished))
+        results.append(result)
+    return results
+
+def bench_placements(boards, rotation_system='classic'):
+    shapes = ROTATION_SYSTEMS[rotation_system]['states']
+    def run():
+        for grid, _ in boards:
+            for shape in shapes:
+                enumerate_placements(grid, shape, rotation_system)
+    return timed('enumerate_placements', len(boards) * len(shapes), run)
+
+def bench_features(boards, rotation_system='classic'):
+    # Placements are listed up front so only the feature evaluation is timed
+    work = []
+    for grid, corrupted in boards:
+        features = BoardFeatures.from_grid(grid, corrupted)
+        for shape, states in ROTATION_SYSTEMS[rotation_system]['states'].items():
+            work.append((features, enumerate_placements(grid, shape, rotation_system), states))
+    def run():
+        for features, placements, states in work:
+            evaluate_placements(features, placements, states)
+    return timed('evaluate_placements', sum(len(placements) for _, placements, _ in work), run)
+
+def bench_snapshot(frames=2000, seed=1):
+    game = TetrisGame(True, seed=seed, headless=True)
+    def run():
+        nonlocal game
+        for i in range(frames):
+            if i % 30 == 0:
+                game.perform(ACTIONS['left' if i % 60 else 'right'])
+            if not game.update(16) or game.game_won:
+                game = TetrisGame(True, seed=seed + i, headless=True)
+            game.snapshot()
+    return timed('update_and_snapshot', frames, run)
+
+def bench_solver():
+    """Solving every puzzle from scratch, per search node"""
+    searches = []
+    for spec in PUZZLES.values():
+        rules = main.get_ruleset(spec.ruleset)
+        grid, _ = spec.build_grid(rules, main.TETROMINO_COLORS, main.CORRUPTION_COLOR)
+        searches.append((Solver(rules, ROTATION_SYSTEMS[spec.rotation], spec.pieces), Solver.board_from_grid(grid)))
+    def run():
+        for solver, board in searches:
+            solver.solve(board)
+    result = timed('solve_puzzles', 0, run)
+    # Nodes are only known afterwards
+    nodes = sum(solver.nodes for solver, _ in searches)
+    result['ops'] = nodes
+    result['per_op_us'] = round(result['total_ms'] * 1000 / max(1, nodes), 3)
+    result['puzzles'] = len(searches)
+    return result
+
+def bench_render(frames=300, seed=1):
+    """Renderer frame time for every quality preset, drawn offscreen"""
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    import pygame
+    from quality import LEVELS
+    rules = main.get_ruleset()
+    screen = pygame.display.set_mode((rules.window_width, rules.window_height))
+
+    # The same boss fight frames for every preset
+    game = TetrisGame(True, seed=seed)
+    rng = random.Random(seed)
+    snaps = []
+    for frame in range(frames):
+        if frame % 30 == 0:
+            move = autoplay.heuristic_policy(game, rng)
+            if move is not None:
+                autoplay.play_placement(game, *move)
+        if not game.update(16) or game.game_won:
+            break
+        snaps.append(game.snapshot())
+
+    results = []
+    for level in LEVELS:
+        renderer = main.Renderer(screen, quality=level)
+        def run():
+            for snap in snaps:
+                renderer.draw(snap, 16)
+        results.append(timed('render_' + level, len(snaps), run))
+    return results
+
+def run_benchmarks(seed=1, render=True):
+    """Yields one result dict per benchmark"""
+    yield from bench_simulation(seed=seed)
+    boards = sample_boards(seed=seed)
+    yield bench_placements(boards)
+    yield bench_features(boards)
+    yield bench_snapshot(seed=seed)
+    yield bench_solver()
+    if render:
+        yield from bench_render(seed=seed)
@@ -0,0 +1,225 @@
+import json
+import os
+import pickle
+
+# Boss encounters live in bosses.json so new bosses don't need code changes.
+# The file is validated and compiled once into lookup tables, and the compiled
+# form is cached next to the bytecode so later startups skip all of that.
+
+BOSS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bosses.json')
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '__pycache__')
+COMPILED_VERSION = 2
+
+# Effects the game knows how to run, with the parameters each one takes and their defaults
+EFFECTS = {
+    'garbage_lines': {'min_lines': 1, 'max_lines': 2},
+    'speed_boost': {'duration': 5000, 'fall_speed_divisor': 2},
+    'time_pressure': {'duration': 10000, 'fall_speed_divisor': 4},
+    'grid_shake': {'duration': 2000, 'intensity': 3},
+    'piece_corruption': {'duration': 10000, 'chance': 0.3},
+    'piece_theft': {},
+}
+
+class BossConfigError(ValueError):
+    pass
+
+def check(condition, where, message):
+    if not condition:
+        raise BossConfigError(f"{where}: {message}")
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def compile_attack(where, name, attack, phase_count):
+    check(isinstance(attack, dict), where, "attack must be an object")
+    effect = attack.get('effect', name)
+    check(effect in EFFECTS, where, f"unknown effect '{effect}'")
+    unknown = set(attack) - {'effect', 'weight', 'cooldown', 'phases', 'params'}
+    check(not unknown, where, f"unknown keys {sorted(unknown)}")
+
+    weight = attack.get('weight', 1)
+    check(is_number(weight) and weight > 0, where, "weight must be a positive number")
+    cooldown = attack.get('cooldown', 0)
+    check(is_number(cooldown) and cooldown >= 0, where, "cooldown must be >= 0")
+    phases = attack.get('phases', list(range(1, phase_count + 1)))
+    check(isinstance(phases, list) and all(isinstance(p, int) and 1 <= p <= phase_count for p in phases),
+          where, f"phases must be a list of phase numbers 1..{phase_count}")
+
+    params = dict(EFFECTS[effect])
+    given = attack.get('params', {})
+    check(isinstance(given, dict), where, "params must be an object")
+    for key, value in given.items():
+        check(key in params, where, f"effect '{effect}' has no parameter '{key}'")
+        check(is_number(value) and value >= 0, where, f"parameter '{key}' must be a number >= 0")
+        params[key] = value
+    if effect == 'garbage_lines':
+        check(1 <= params['min_lines'] <= params['max_lines'], where, "need 1 <= min_lines <= max_lines")
+    if 'fall_speed_divisor' in params:
+        check(params['fall_speed_divisor'] >= 1, where, "fall_speed_divisor must be >= 1")
+
+    return {
+        'effect': effect,
+        'weight': weight,
+        'cooldown': cooldown,
+        'phases': tuple(sorted(set(phases))),
+        'duration': params.get('duration', 0),
+        'params': params,
+    }
+
+def build_attack_pools(attacks, phase_count):
+    """Weighted attack pools per (phase, last attack) so picking an attack is one bisect"""
+    pools = {}
+    for phase in range(1, phase_count + 1):
+        available = [name for name, attack in attacks.items() if phase in attack['phases']]
+        for last in [None] + available:
+            # Avoid repeating the same attack
+            names = [name for name in available if name != last] if len(available) > 1 else available
+            cumulative = []
+            total = 0
+            for name in names:
+                total += attacks[name]['weight']
+                cumulative.append(total)
+            pools[(phase, last)] = (tuple(names), tuple(cumulative))
+    return pools
+
+# Adaptive difficulty: each knob is a [easiest, hardest] range the controller moves within
+DIFFICULTY_DEFAULTS = {
+    'interval': 2000,  # ms of game time between adjustments
+    'rate': 0.1,  # how far one adjustment can move the difficulty level (0..1)
+    'start': 0.5,
+    'target_pps': 1.0,  # pieces per second a comfortable player keeps up
+    'target_height': 0.4,  # stack height as a fraction of the board
+    'hole_limit': 8,
+    'clear_timeout': 20000,  # ms without a line clear that counts as struggling
+    'cooldown_scale': [1.0, 1.0],
+    'gravity_scale': [1.0, 1.0],
+    'garbage_bonus': [0, 0],
+}
+
+def compile_difficulty(where, difficulty, attacks):
+    check(isinstance(difficulty, dict), where, "difficulty must be an object")
+    unknown = set(difficulty) - set(DIFFICULTY_DEFAULTS) - {'weight_scale'}
+    check(not unknown, where, f"unknown keys {sorted(unknown)}")
+    compiled = dict(DIFFICULTY_DEFAULTS)
+    compiled.update(difficulty)
+
+    for key in ('interval', 'target_pps', 'target_height', 'hole_limit', 'clear_timeout'):
+        check(is_number(compiled[key]) and compiled[key] > 0, where, f"{key} must be positive")
+    for key in ('rate', 'start'):
+        check(is_number(compiled[key]) and 0 <= compiled[key] <= 1, where, f"{key} must be between 0 and 1")
+
+    def check_range(name, value, positive=True):
+        check(isinstance(value, list) and len(value) == 2 and all(is_number(v) for v in value),
+              where, f"{name} must be [easiest, hardest]")
+        if positive:
+            check(all(v > 0 for v in value), where, f"{name} values must be positive")
+        return tuple(value)
+
+    for key in ('cooldown_scale', 'gravity_scale'):
+        compiled[key] = check_range(key, compiled[key])
+    compiled['garbage_bonus'] = check_range('garbage_bonus', compiled['garbage_bonus'], positive=False)
+    check(all(isinstance(v, int) for v in compiled['garbage_bonus']), where, "garbage_bonus must be whole lines")
+
+    weight_scale = difficulty.get('weight_scale', {})
+    check(isinstance(weight_scale, dict), where, "weight_scale must be an object")
+    for name in weight_scale:
+        check(name in attacks, where, f"weight_scale names unknown attack '{name}'")
+    compiled['weight_scale'] = {name: check_range(f"weight_scale '{name}'", value)
+                                for name, value in weight_scale.items()}
+    return compiled
+
+def compile_boss(key, boss):
+    where = f"boss '{key}'"
+    check(isinstance(boss, dict), where, "boss must be an object")
+
+    max_health = boss.get('max_health')
+    check(isinstance(max_health, int) and max_health > 0, where, "max_health must be a positive integer")
+
+    phases = boss.get('phases')
+    check(isinstance(phases, list) and phases, where, "needs at least one phase")
+    thresholds = []
+    cooldowns = []
+    for i, phase in enumerate(phases, 1):
+        phase_where = f"{where} phase {i}"
+        check(isinstance(phase, dict), phase_where, "phase must be an object")
+        health = phase.get('health')
+        cooldown = phase.get('attack_cooldown')
+        check(is_number(health) and 0 <= health <= max_health, phase_where, "health must be between 0 and max_health")
+        check(is_number(cooldown) and cooldown > 0, phase_where, "attack_cooldown must be positive")
+        check(not thresholds or health < thresholds[-1], phase_where, "phase health thresholds must be decreasing")
+        thresholds.append(health)
+        cooldowns.append(cooldown)
+
+    stun = boss.get('stun', {})
+    check(isinstance(stun, dict), where, "stun must be an object")
+    stun_damage = stun.get('min_damage', max_health + 1)
+    stun_duration = stun.get('duration', 0)
+    check(is_number(stun_damage) and is_number(stun_duration) and stun_duration >= 0, where, "bad stun settings")
+
+    line_damage = boss.get('line_damage', [0, 5, 10, 15, 20])
+    check(isinstance(line_damage, list) and len(line_damage) == 5 and all(is_number(d) and d >= 0 for d in line_damage),
+          where, "line_damage must list the damage for 0-4 lines")
+
+    attacks = boss.get('attacks')
+    check(isinstance(attacks, dict) and attacks, where, "needs at least one attack")
+    compiled_attacks = {name: compile_attack(f"{where} attack '{name}'", name, attack, len(phases))
+                        for name, attack in attacks.items()}
+    pools = build_attack_pools(compiled_attacks, len(phases))
+    for phase in range(1, len(phases) + 1):
+        check(pools[(phase, None)][0], where, f"phase {phase} has no attacks")
+
+    difficulty = boss.get('difficulty')
+    if difficulty is not None:
+        difficulty = compile_difficulty(f"{where} difficulty", difficulty, compiled_attacks)
+
+    return {
+        'key': key,
+        'name': str(boss.get('name', key)),
+        'max_health': max_health,
+        'phase_thresholds': tuple(thresholds),
+        'phase_cooldowns': tuple(cooldowns),
+        'stun_damage': stun_damage,
+        'stun_duration': stun_duration,
+        'line_damage': tuple(line_damage),
+        'attacks': compiled_attacks,
+        'pools': pools,
+        'difficulty': difficulty,  # None = fixed difficulty
+    }
+
+def compile_bosses(data):
+    check(isinstance(data, dict), "config", "top level must be an object")
+    check(data.get('version') == 1, "config", "unsupported version")
+    bosses = data.get('bosses')
+    check(isinstance(bosses, dict) and bosses, "config", "needs at least one boss")
+    return {key: compile_boss(key, boss) for key, boss in bosses.items()}
+
+def load_bosses(path=BOSS_FILE, use_cache=True):
+    """Load the boss definitions, using the compiled cache when the file hasn't changed"""
+    stat = os.stat(path)
+    stamp = (COMPILED_VERSION, stat.st_mtime_ns, stat.st_size)
+    cache_path = os.path.join(CACHE_DIR, os.path.basename(path) + '.compiled.pickle')
+
+    if use_cache:
+        try:
+            with open(cache_path, 'rb') as f:
+                cached_stamp, compiled = pickle.load(f)
+            if cached_stamp == stamp:
+                return compiled
+        except (OSError, pickle.PickleError, EOFError, ValueError):
+            pass
+
+    with open(path, encoding='utf-8') as f:
+        try:
+            data = json.load(f)
+        except json.JSONDecodeError as e:
+            raise BossConfigError(f"{path}: {e}") from None
+    compiled = compile_bosses(data)
+
+    if use_cache:
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            with open(cache_path, 'wb') as f:
+                pickle.dump((stamp, compiled), f)
+        except OSError:
+            pass  # Read-only install, just compile every time
+    return compiled
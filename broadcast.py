@@ -0,0 +1,418 @@
+import socket
+import struct
+import sys
+import threading
+from collections import deque
+
+# Compact event stream of a game for spectators. A stream is a header followed
+# by records; a viewer rebuilds the board from the records alone, so venue
+# screens only need ~15-20 bytes per event instead of a mirrored window.
+#
+#   header: b'TZEV', version, board width, board height, boss mode   (8 bytes)
+#   record: type (u8), game time in ms (u32), payload length (u16), payload
+#
+# Cells are written as 4 (x, y) pairs of signed bytes. Board cells are 0 for
+# empty, 1-7 for the piece shapes and 8 for corrupted/garbage blocks. Locks
+# carry the score as well, so it's never staler than the last piece.
+
+MAGIC = b'TZEV'
+VERSION = 2  # 2: wider level, lines and garbage row fields, score on every lock
+HEADER = struct.Struct('<4sBBBB')
+RECORD = struct.Struct('<BIH')
+CELLS = struct.Struct('<8b')
+SCORE = struct.Struct('<I')
+GARBAGE_ROW = struct.Struct('<Q')  # bit x set for a block in column x, rulesets go up to 64 wide
+CLEAR = struct.Struct('<IIHB')  # score, lines, level, rows cleared
+STATUS = struct.Struct('<IIHhB')  # keyframe: score, lines, level, boss health, active piece
+
+SHAPES = 'IOTSZJL'
+SHAPE_CODES = {shape: i + 1 for i, shape in enumerate(SHAPES)}
+CORRUPTED_CODE = 8
+
+SNAPSHOT, SPAWN, MOVE, ROTATE, LOCK, LINE_CLEAR, GARBAGE, BOSS_ATTACK, BOSS_DAMAGE, GAME_OVER = range(1, 11)
+EVENT_TYPES = {
+    'spawn': SPAWN, 'move': MOVE, 'rotate': ROTATE, 'lock': LOCK, 'line_clear': LINE_CLEAR,
+    'garbage': GARBAGE, 'boss_attack': BOSS_ATTACK, 'boss_damage': BOSS_DAMAGE, 'game_over': GAME_OVER,
+}
+
+DEFAULT_HOST = '127.0.0.1'  # this machine only, the stream has no authentication
+DEFAULT_PORT = 7777
+
+def piece_code(shape, corrupted):
+    return CORRUPTED_CODE if corrupted else SHAPE_CODES[shape]
+
+def pack_cells(cells):
+    return CELLS.pack(*[v for cell in cells for v in cell])
+
+def unpack_cells(data, offset=0):
+    values = CELLS.unpack_from(data, offset)
+    return [(values[i], values[i + 1]) for i in range(0, 8, 2)]
+
+def encode_header(width, height, boss_mode):
+    return HEADER.pack(MAGIC, VERSION, width, height, int(boss_mode))
+
+def encode_record(event_type, time_ms, payload):
+    return RECORD.pack(event_type, int(time_ms) & 0xFFFFFFFF, len(payload)) + payload
+
+def encode_event(kind, time_ms, args):
+    """Turn a TetrisGame event into a record"""
+    event_type = EVENT_TYPES[kind]
+    if kind == 'spawn':
+        shape, corrupted, cells = args
+        payload = bytes([piece_code(shape, corrupted)]) + pack_cells(cells)
+    elif kind == 'lock':
+        shape, corrupted, cells, score = args
+        payload = bytes([piece_code(shape, corrupted)]) + pack_cells(cells) + SCORE.pack(score)
+    elif kind == 'move' or kind == 'rotate':
+        payload = pack_cells(args[0])
+    elif kind == 'line_clear':
+        rows, score, lines, level = args
+        payload = CLEAR.pack(score, lines, level, len(rows)) + bytes(rows)
+    elif kind == 'garbage':
+        masks = args[0]
+        payload = bytes([len(masks)]) + b''.join(GARBAGE_ROW.pack(mask) for mask in masks)
+    elif kind == 'boss_attack':
+        payload = args[0].encode('utf-8')
+    elif kind == 'boss_damage':
+        damage, health, phase = args
+        payload = struct.pack('<BHB', min(damage, 255), health, phase)
+    else:  # game_over
+        won, score = args
+        payload = struct.pack('<BI', int(won), score)
+    return encode_record(event_type, time_ms, payload)
+
+def encode_snapshot(mirror, time_ms):
+    """Keyframe with the whole board, sent to anyone joining mid-game"""
+    active = mirror.active_cells or [(0, -100)] * 4
+    payload = bytes(code for row in mirror.board for code in row)
+    payload += STATUS.pack(mirror.score, mirror.lines, mirror.level, mirror.boss_health, mirror.active_code)
+    payload += pack_cells(active)
+    return encode_record(SNAPSHOT, time_ms, payload)
+
+class BoardMirror:
+    """Board state rebuilt from the event stream"""
+    def __init__(self, width, height, boss_mode=False):
+        self.width = width
+        self.height = height
+        self.boss_mode = boss_mode
+        self.board = [[0] * width for _ in range(height)]
+        self.active_code = 0
+        self.active_cells = []
+        self.score = 0
+        self.lines = 0
+        self.level = 1
+        self.boss_health = -1
+        self.boss_phase = 1
+        self.last_attack = None
+        self.game_over = False
+        self.won = False
+        self.time = 0
+
+    @classmethod
+    def from_game(cls, game):
+        """Mirror of a live game, for the first keyframe"""
+        mirror = cls(len(game.grid[0]), len(game.grid), game.boss_mode)
+        codes = {color: SHAPE_CODES[shape] for shape, color in game_colors().items()}
+        for y, row in enumerate(game.grid):
+            for x, color in enumerate(row):
+                if color is not None:
+                    mirror.board[y][x] = CORRUPTED_CODE if game.corrupted_grid[y][x] else codes.get(color, CORRUPTED_CODE)
+        piece = game.current_piece
+        mirror.active_code = piece_code(piece.shape, piece.is_corrupted)
+        mirror.active_cells = piece.get_cells()
+        mirror.score = game.score
+        mirror.lines = game.lines_cleared
+        mirror.level = game.level
+        if game.boss:
+            mirror.boss_health = game.boss.health
+            mirror.boss_phase = game.boss.phase
+        mirror.time = game.game_time
+        return mirror
+
+    def apply(self, event_type, time_ms, payload):
+        self.time = time_ms
+        if event_type == SNAPSHOT:
+            size = self.width * self.height
+            for y in range(self.height):
+                self.board[y] = list(payload[y * self.width:(y + 1) * self.width])
+            self.score, self.lines, self.level, self.boss_health, self.active_code = \
+                STATUS.unpack_from(payload, size)
+            self.active_cells = unpack_cells(payload, size + STATUS.size)
+            # A keyframe also starts a new game after a restart
+            self.game_over = False
+            self.won = False
+            self.last_attack = None
+        elif event_type == SPAWN:
+            self.active_code = payload[0]
+            self.active_cells = unpack_cells(payload, 1)
+        elif event_type == MOVE or event_type == ROTATE:
+            self.active_cells = unpack_cells(payload)
+        elif event_type == LOCK:
+            code = payload[0]
+            for x, y in unpack_cells(payload, 1):
+                if 0 <= y < self.height and 0 <= x < self.width:
+                    self.board[y][x] = code
+            self.score, = SCORE.unpack_from(payload, 1 + CELLS.size)
+            self.active_cells = []
+        elif event_type == LINE_CLEAR:
+            self.score, self.lines, self.level, count = CLEAR.unpack_from(payload)
+            rows = payload[CLEAR.size:CLEAR.size + count]
+            for y in sorted(rows, reverse=True):
+                del self.board[y]
+            for _ in rows:
+                self.board.insert(0, [0] * self.width)
+        elif event_type == GARBAGE:
+            for i in range(payload[0]):
+                mask, = GARBAGE_ROW.unpack_from(payload, 1 + i * GARBAGE_ROW.size)
+                del self.board[0]
+                self.board.append([CORRUPTED_CODE if mask >> x & 1 else 0 for x in range(self.width)])
+        elif event_type == BOSS_ATTACK:
+            self.last_attack = payload.decode('utf-8', 'replace')
+        elif event_type == BOSS_DAMAGE:
+            _, self.boss_health, self.boss_phase = struct.unpack('<BHB', payload)
+        elif event_type == GAME_OVER:
+            won, self.score = struct.unpack('<BI', payload)
+            self.game_over = True
+            self.won = bool(won)
+
+class StreamDecoder:
+    """Incremental parser, feed() it bytes as they arrive and it returns complete records"""
+    def __init__(self):
+        self.buffer = bytearray()
+        self.header = None
+
+    def feed(self, data):
+        self.buffer += data
+        records = []
+        if self.header is None:
+            if len(self.buffer) < HEADER.size:
+                return records
+            magic, version, width, height, boss_mode = HEADER.unpack_from(self.buffer)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError("not a Tetrizz event stream (or unsupported version)")
+            self.header = (width, height, bool(boss_mode))
+            del self.buffer[:HEADER.size]
+        offset = 0
+        while len(self.buffer) - offset >= RECORD.size:
+            event_type, time_ms, length = RECORD.unpack_from(self.buffer, offset)
+            end = offset + RECORD.size + length
+            if end > len(self.buffer):
+                break
+            records.append((event_type, time_ms, bytes(self.buffer[offset + RECORD.size:end])))
+            offset = end
+        del self.buffer[:offset]
+        return records
+
+def game_colors():
+    from main import TETROMINO_COLORS
+    return TETROMINO_COLORS
+
+class FileSink:
+    """Writes a game's event stream to a file"""
+    def __init__(self, path, game):
+        self.file = open(path, 'wb')
+        mirror = BoardMirror.from_game(game)
+        self.file.write(encode_header(mirror.width, mirror.height, mirror.boss_mode))
+        self.attach(game)
+
+    def attach(self, game):
+        """Follow a (new) game, starting with a keyframe of it"""
+        mirror = BoardMirror.from_game(game)
+        self.file.write(encode_snapshot(mirror, mirror.time))
+        game.listeners.append(self)
+
+    def __call__(self, kind, time_ms, args):
+        self.file.write(encode_event(kind, time_ms, args))
+
+    def close(self):
+        self.file.close()
+
+class SpectatorClient:
+    def __init__(self, connection, max_queued):
+        self.connection = connection
+        self.queue = deque()
+        self.max_queued = max_queued
+        self.condition = threading.Condition()
+        self.closed = False
+        self.dropped = 0
+
+class BroadcastServer:
+    """Serves one game's event stream to any number of spectators over TCP.
+
+    The game thread only encodes each event once and appends it to every
+    client's queue. Each client has its own sender thread; if a viewer falls
+    max_queued records behind, its backlog is thrown away and replaced by a
+    fresh keyframe, so slow viewers skip ahead instead of stalling the game.
+    """
+    def __init__(self, game, host=DEFAULT_HOST, port=DEFAULT_PORT, max_queued=512):
+        self.mirror = BoardMirror.from_game(game)
+        self.header = encode_header(self.mirror.width, self.mirror.height, self.mirror.boss_mode)
+        self.max_queued = max_queued
+        self.clients = []
+        self.lock = threading.Lock()
+        self.server = socket.create_server((host, port))
+        self.address = self.server.getsockname()
+        self.running = True
+        threading.Thread(target=self.accept_loop, name='broadcast-accept', daemon=True).start()
+        game.listeners.append(self)
+
+    def attach(self, game):
+        """Switch the broadcast to a new game (restart), sending everyone a keyframe of it"""
+        with self.lock:
+            self.mirror = BoardMirror.from_game(game)
+            snapshot = encode_snapshot(self.mirror, self.mirror.time)
+            for client in self.clients:
+                with client.condition:
+                    client.queue.clear()
+                    client.queue.append(snapshot)
+                    client.condition.notify()
+        game.listeners.append(self)
+
+    def __call__(self, kind, time_ms, args):
+        record = encode_event(kind, time_ms, args)
+        with self.lock:
+            self.mirror.apply(record[0], time_ms, record[RECORD.size:])
+            for client in self.clients:
+                with client.condition:
+                    if len(client.queue) >= client.max_queued:
+                        # Too far behind: skip to the current state
+                        client.dropped += len(client.queue)
+                        client.queue.clear()
+                        client.queue.append(encode_snapshot(self.mirror, time_ms))
+                    else:
+                        client.queue.append(record)
+                    client.condition.notify()
+
+    def accept_loop(self):
+        while self.running:
+            try:
+                connection, _ = self.server.accept()
+            except OSError:
+                break
+            connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            client = SpectatorClient(connection, self.max_queued)
+            # Snapshot and registration under the same lock as publishing, so
+            # every event is either in the keyframe or queued after it
+            with self.lock:
+                client.queue.append(self.header + encode_snapshot(self.mirror, self.mirror.time))
+                self.clients.append(client)
+            threading.Thread(target=self.send_loop, args=(client,), name='broadcast-client', daemon=True).start()
+
+    def send_loop(self, client):
+        try:
+            while True:
+                with client.condition:
+                    while not client.queue and not client.closed:
+                        client.condition.wait()
+                    if client.closed:
+                        break
+                    data = b''.join(client.queue)
+                    client.queue.clear()
+                client.connection.sendall(data)
+        except OSError:
+            pass
+        finally:
+            with self.lock:
+                if client in self.clients:
+                    self.clients.remove(client)
+            client.connection.close()
+
+    def close(self):
+        self.running = False
+        self.server.close()
+        with self.lock:
+            clients = list(self.clients)
+        for client in clients:
+            with client.condition:
+                client.closed = True
+                client.condition.notify()
+
+def read_stream(source):
+    """Yield (mirror, event_type) from a file path or a (host, port) address"""
+    decoder = StreamDecoder()
+    if isinstance(source, tuple):
+        connection = socket.create_connection(source)
+        read = lambda: connection.recv(65536)
+    else:
+        stream = open(source, 'rb')
+        read = lambda: stream.read(65536)
+    mirror = None
+    while True:
+        data = read()
+        if not data:
+            return
+        for event_type, time_ms, payload in decoder.feed(data):
+            if mirror is None:
+                mirror = BoardMirror(*decoder.header)
+            mirror.apply(event_type, time_ms, payload)
+            yield mirror, event_type
+
+def view(source, cell_size=24):
+    """Minimal spectator window drawn only from the stream"""
+    import pygame
+    from main import TETROMINO_COLORS, CORRUPTION_COLOR, BACKGROUND, GRID_BG, TEXT_PRIMARY, BOSS_COLOR, init_pygame
+
+    init_pygame(audio=False)
+    colors = [GRID_BG] + [TETROMINO_COLORS[shape] for shape in SHAPES] + [CORRUPTION_COLOR]
+    pygame.display.set_caption("Tetrizz - Spectator")
+    font = pygame.font.Font(None, 24)
+    screen = None
+    clock = pygame.time.Clock()
+    # Recorded files are played back at the speed they were recorded
+    paced = not isinstance(source, tuple)
+    start = None
+    last_draw = -1000
+
+    for mirror, _ in read_stream(source):
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                return
+        if screen is None:
+            # Tall boards (hidden buffer rows) get smaller cells
+            cell_size = min(cell_size, 720 // mirror.height)
+            screen = pygame.display.set_mode((mirror.width * cell_size + 220, mirror.height * cell_size + 40))
+        if paced:
+            if start is None:
+                start = (mirror.time, pygame.time.get_ticks())
+            delay = (mirror.time - start[0]) - (pygame.time.get_ticks() - start[1])
+            if delay > 0:
+                pygame.time.wait(int(delay))
+        # Redraw at most at 60 fps, the mirror keeps up with the stream in between
+        now = pygame.time.get_ticks()
+        if now - last_draw < 16 and not mirror.game_over:
+            continue
+        last_draw = now
+
+        screen.fill(BACKGROUND)
+        for y, row in enumerate(mirror.board):
+            for x, code in enumerate(row):
+                pygame.draw.rect(screen, colors[code], (20 + x * cell_size, 20 + y * cell_size, cell_size - 1, cell_size - 1))
+        for x, y in mirror.active_cells:
+            if y >= 0:
+                pygame.draw.rect(screen, colors[mirror.active_code], (20 + x * cell_size, 20 + y * cell_size, cell_size - 1, cell_size - 1))
+
+        text_x = mirror.width * cell_size + 40
+        lines = [f"Score: {mirror.score:,}", f"Level: {mirror.level}", f"Lines: {mirror.lines}"]
+        if mirror.boss_mode:
+            lines += [f"Boss: {mirror.boss_health} (phase {mirror.boss_phase})", f"Attack: {mirror.last_attack or '-'}"]
+        if mirror.game_over:
+            lines.append("VICTORY!" if mirror.won else "GAME OVER")
+        for i, line in enumerate(lines):
+            screen.blit(font.render(line, True, BOSS_COLOR if i >= 3 else TEXT_PRIMARY), (text_x, 20 + i * 28))
+        pygame.display.flip()
+
+    # Stream ended, keep the last frame up until the window is closed
+    while screen is not None:
+        if any(event.type == pygame.QUIT for event in pygame.event.get()):
+            return
+        clock.tick(30)
+
+if __name__ == '__main__':
+    # python broadcast.py game.tzev        replay a recorded stream
+    # python broadcast.py host[:port]      watch a live game
+    target = sys.argv[1] if len(sys.argv) > 1 else f'{DEFAULT_HOST}:{DEFAULT_PORT}'
+    if target.endswith('.tzev'):
+        view(target)
+    else:
+        host, _, port = target.partition(':')
+        view((host, int(port or DEFAULT_PORT)))
@@ -0,0 +1,188 @@
+import gc
+import json
+import os
+import random
+import tracemalloc
+from collections import Counter
+
+# Memory diagnostics for long running sessions (kiosks), off unless asked for.
+#
+# MemoryMonitor samples at an interval: memory traced by tracemalloc, the
+# process RSS, live objects by type, the biggest allocation sites and the
+# sites that grew since the last sample (per frame, so a leak in the frame
+# loop stands out). Growth is measured against the first sample, taken once
+# the caches (fonts, sprites, sounds) have filled up.
+#
+#   python main.py --memory-log mem.jsonl       sample while playing
+#   python main.py --soak 8 --max-growth 16     8 hours of simulated play, fails
+#                                               if memory grows more than 16 MB
+#
+# tracemalloc slows Python down by about 2x while it's on, which is why none of
+# this runs by default.
+
+TOP_SITES = 10
+TOP_TYPES = 15
+# Allocations made by the diagnostics (snapshots, counters) and the import
+# system aren't the game's, and are left out of every number but peak_kb
+IGNORED = (__file__, tracemalloc.__file__, '<frozen importlib._bootstrap>',
+           '<frozen importlib._bootstrap_external>', '<unknown>')
+
+def rss_bytes():
+    """Resident set size of this process, None where /proc isn't available"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def object_counts():
+    """Live objects tracked by the garbage collector, by type name"""
+    return Counter(type(obj).__name__ for obj in gc.get_objects())
+
+def counted(stats):
+    return [stat for stat in stats if stat.traceback[0].filename not in IGNORED]
+
+def site(stat):
+    # Parent directory too, there are plenty of __init__.py
+    frame = stat.traceback[0]
+    return f"{os.sep.join(frame.filename.split(os.sep)[-2:])}:{frame.lineno}"
+
+def kb(size):
+    return round(size / 1024, 1)
+
+def append_row(path, row):
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(row) + '\n')
+
+class MemoryMonitor:
+    def __init__(self, interval, top=TOP_SITES, frames=1):
+        """interval is in seconds (of wall time while playing, of game time in
+        a soak), frames how deep the recorded tracebacks go"""
+        self.interval = interval
+        self.top = top
+        self.depth = frames
+        self.samples = 0
+        self.frames = 0  # since the last sample
+        self.next_time = None
+        self.baseline = None  # (traced bytes, object counts) of the first sample
+        self.last = None  # previous tracemalloc snapshot
+        self.growth = 0  # traced bytes beyond the first sample, as of the last sample
+
+    def start(self, now=0):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.depth)
+        self.next_time = now + self.interval
+
+    def stop(self):
+        tracemalloc.stop()
+
+    def frame(self):
+        self.frames += 1
+
+    def tick(self, now):
+        """Sample if the interval is up, returns the sample or None"""
+        if now < self.next_time:
+            return None
+        self.next_time = now + self.interval
+        return self.sample(now)
+
+    def sample(self, now):
+        gc.collect()  # only what's really still alive
+        snapshot = tracemalloc.take_snapshot()
+        traced = sum(stat.size for stat in counted(snapshot.statistics('filename')))
+        peak = tracemalloc.get_traced_memory()[1]
+        counts = object_counts()
+        if self.baseline is None:
+            self.baseline = (traced, dict(counts))
+        base_traced, base_counts = self.baseline
+        frames = max(1, self.frames)
+        rss = rss_bytes()
+        self.growth = traced - base_traced
+
+        row = {
+            'sample': self.samples, 'time': round(now, 3), 'frames': self.frames,
+            'traced_kb': kb(traced), 'peak_kb': kb(peak), 'growth_kb': kb(self.growth),
+            'rss_kb': kb(rss) if rss is not None else None,
+            'objects': sum(counts.values()),
+            # Biggest holders of memory right now
+            'top_sites': [{'site': site(stat), 'kb': kb(stat.size), 'count': stat.count}
+                          for stat in counted(snapshot.statistics('lineno'))[:self.top]],
+            # Live object counts, with the change since the first sample
+            'types': [{'type': name, 'count': count, 'growth': count - base_counts.get(name, 0)}
+                      for name, count in counts.most_common(TOP_TYPES)],
+        }
+        if self.last is not None:
+            # What each site added (or freed) per frame since the last sample
+            diffs = [stat for stat in counted(snapshot.compare_to(self.last, 'lineno')) if stat.size_diff]
+            diffs.sort(key=lambda stat: abs(stat.size_diff), reverse=True)
+            row['sites'] = [{'site': site(stat), 'kb_diff': kb(stat.size_diff), 'count_diff': stat.count_diff,
+                             'bytes_per_frame': round(stat.size_diff / frames, 1)} for stat in diffs[:self.top]]
+        self.last = snapshot
+        self.samples += 1
+        self.frames = 0
+        return row
+
+def soak(hours, max_growth_mb, interval=600, policy='heuristic', boss_mode=False, seed=1, ruleset=None,
+         rotation_system='classic', pps=2.0, max_game_minutes=10, render=False):
+    """Play `hours` of simulated game time back to back with the autoplayer,
+    sampling every `interval` seconds of it. Yields the samples, then a summary
+    whose 'passed' says if memory stayed within `max_growth_mb` of the first
+    sample. Stops early once it's past that. With render every frame is also
+    drawn offscreen, particles and effects included; without, a frame is one
+    move and the game jumps from event to event in between."""
+    import autoplay
+    import main
+    play = autoplay.POLICIES[policy]
+    options = {'ruleset': ruleset} if ruleset else {}
+
+    renderer = None
+    step = max(1, int(1000 / pps))  # ms between moves, or per frame when drawing
+    if render:
+        os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+        import pygame
+        rules = main.get_ruleset(ruleset or main.DEFAULT_RULESET)
+        renderer = main.Renderer(pygame.display.set_mode((rules.window_width, rules.window_height)))
+        step = 16
+
+    monitor = MemoryMonitor(interval)
+    total = hours * 3600000
+    played = 0  # ms of game time in finished games
+    games = 0
+    ok = True
+    monitor.start()
+    while played < total and ok:
+        # Drawn games make the visual events (particles, effects) headless games skip
+        game = main.TetrisGame(boss_mode, rotation_system=rotation_system, seed=seed + games,
+                               headless=not render, **options)
+        rng = random.Random(game.seed)
+        next_move = 0
+        while game.game_time < max_game_minutes * 60000:
+            if game.game_time >= next_move:
+                move = play(game, rng)
+                if move is not None:
+                    autoplay.play_placement(game, *move)
+                next_move = game.game_time + 1000 / pps
+            if renderer:
+                alive = game.update(step)
+                renderer.draw(game.snapshot(game_over=not alive), step)
+            else:
+                alive = autoplay.advance(game, step)
+            monitor.frame()
+            row = monitor.tick((played + game.game_time) / 1000)
+            if row:
+                yield dict(row, games=games)
+                if monitor.growth > max_growth_mb * 1024 * 1024:
+                    ok = False
+                    break
+            if not alive or game.game_won or played + game.game_time >= total:
+                break
+        played += game.game_time
+        games += 1
+
+    if ok and monitor.frames:
+        # Where things ended up, unless the last sample was just taken
+        yield dict(monitor.sample(played / 1000), games=games)
+        ok = monitor.growth <= max_growth_mb * 1024 * 1024
+    monitor.stop()
+    yield {'summary': 'soak', 'hours': round(played / 3600000, 3), 'games': games, 'samples': monitor.samples,
+           'growth_kb': kb(monitor.growth), 'max_growth_kb': kb(max_growth_mb * 1024 * 1024), 'passed': ok}
@@ -0,0 +1,119 @@
+import json
+from collections import deque
+
+from features import BoardFeatures
+
+# Adaptive boss difficulty.
+#
+# The controller watches how the player is doing and slides a difficulty level
+# between 0 (easiest) and 1 (hardest). Each knob in the boss's "difficulty"
+# config is an [easiest, hardest] range, and the current value is just the
+# level's point along it, so the boss can never go past what the config allows.
+#
+# Everything is updated from game events (lock, line clear, garbage), never per
+# frame: the board metrics come from BoardFeatures, which only recomputes the
+# columns a piece touched (line clears included, they happen in place()) and
+# shifts the columns up for garbage. Pieces per second come from a fixed window
+# of lock times.
+
+PPS_WINDOW = 20  # locks
+
+DECISION_FIELDS = ('time', 'level', 'signal', 'pps', 'height', 'holes', 'since_clear',
+                   'cooldown_scale', 'gravity_scale', 'garbage_bonus')
+
+def lerp(value_range, t):
+    easiest, hardest = value_range
+    return easiest + (hardest - easiest) * t
+
+def clamp(value, low=-1.0, high=1.0):
+    return max(low, min(high, value))
+
+class DifficultyController:
+    def __init__(self, game, config):
+        self.game = game
+        self.config = config
+        self.level = config['start']
+        self.features = BoardFeatures.from_grid(game.grid, game.corrupted_grid)
+        self.height = 0
+        self.holes = 0
+        self.lock_times = deque(maxlen=PPS_WINDOW)
+        self.last_clear = 0
+        self.last_decision = 0
+        self.decisions = []  # one DECISION_FIELDS tuple per adjustment
+        self.apply()
+
+    # --- metrics -----------------------------------------------------------
+
+    def update_board(self):
+        # Per-column stats are cached, so this is one pass over the columns
+        columns = self.features.columns
+        self.height = max(column[0] for column in columns)
+        self.holes = sum(column[1] for column in columns)
+
+    def pieces_per_second(self):
+        times = self.lock_times
+        if len(times) < 2 or times[-1] <= times[0]:
+            return self.config['target_pps']
+        return (len(times) - 1) * 1000 / (times[-1] - times[0])
+
+    def on_lock(self, cells, corrupted):
+        now = self.game.game_time
+        self.lock_times.append(now)
+        self.features = self.features.place(cells, corrupted)
+        self.update_board()
+        if now - self.last_decision >= self.config['interval']:
+            self.adjust(now)
+
+    def on_line_clear(self):
+        # The rows are already gone from the features, on_lock cleared them
+        self.last_clear = self.game.game_time
+
+    def on_garbage(self, masks):
+        self.features = self.features.add_rows(masks)
+        self.update_board()
+
+    # --- decisions -----------------------------------------------------------
+
+    def performance(self, now):
+        """-1 (struggling) .. 1 (cruising), the average of the four metrics against their targets"""
+        config = self.config
+        pps = self.pieces_per_second()
+        height_ratio = self.height / self.game.rules.height  # visible rows, not the buffer
+        terms = (
+            clamp((pps - config['target_pps']) / config['target_pps']),
+            clamp((config['target_height'] - height_ratio) / config['target_height']),
+            1 - 2 * min(1.0, self.holes / config['hole_limit']),
+            1 - 2 * min(1.0, (now - self.last_clear) / config['clear_timeout']),
+        )
+        return sum(terms) / len(terms), pps
+
+    def adjust(self, now):
+        signal, pps = self.performance(now)
+        self.level = clamp(self.level + self.config['rate'] * signal, 0.0, 1.0)
+        self.last_decision = now
+        self.apply()
+        game = self.game
+        self.decisions.append((now, round(self.level, 3), round(signal, 3), round(pps, 2), self.height, self.holes,
+                               now - self.last_clear, round(game.boss.cooldown_scale, 3),
+                               round(game.gravity_scale, 3), game.garbage_bonus))
+
+    def apply(self):
+        """Push the current level out to the boss and the game"""
+        config = self.config
+        game = self.game
+        game.boss.cooldown_scale = lerp(config['cooldown_scale'], self.level)
+        game.garbage_bonus = round(lerp(config['garbage_bonus'], self.level))
+        game.gravity_scale = lerp(config['gravity_scale'], self.level)
+        game.update_fall_speed()
+        if config['weight_scale']:
+            game.boss.set_weight_scales({name: lerp(value_range, self.level)
+                                         for name, value_range in config['weight_scale'].items()})
+
+    def write_log(self, path, game_id=None):
+        """Append the decisions as JSON lines for offline analysis"""
+        with open(path, 'a', encoding='utf-8') as f:
+            for decision in self.decisions:
+                row = dict(zip(DECISION_FIELDS, decision))
+                row['game_id'] = game_id
+                row['seed'] = self.game.seed
+                f.write(json.dumps(row) + '\n')
@@ -0,0 +1,127 @@
+import math
+import random
+
+# Animation clock, tweens and one-shot effects for the renderer.
+#
+# Waveforms that were recomputed per cell or per panel (corruption flicker,
+# highlight pulse, boss face pulse, warning blink) are evaluated once per frame
+# in begin_frame(). One-shot animations (line clear flash, garbage rise, grid
+# shake, boss hit) are Effect objects with an explicit duration, taken from a
+# pool and returned to it when they finish, so a busy fight allocates nothing.
+#
+# scale tones everything down for slow machines: 1 is full effects, 0.5 halves
+# shake and travel distances, 0 turns effects off and holds the waveforms still.
+
+LINE_CLEAR_TIME = 300
+GARBAGE_RISE_TIME = 150
+BOSS_HIT_TIME = 250
+SHAKE_DECAY = 0.01  # shake intensity lost per ms
+
+def linear(t):
+    return t
+
+def ease_out_quad(t):
+    return 1 - (1 - t) * (1 - t)
+
+def ease_in_out_quad(t):
+    return 2 * t * t if t < 0.5 else 1 - 2 * (1 - t) * (1 - t)
+
+class Effect:
+    __slots__ = ('kind', 'start', 'duration', 'easing', 'data', 'progress', 'value')
+
+    def reset(self, kind, start, duration, easing, data):
+        self.kind = kind
+        self.start = start
+        self.duration = max(1, duration)
+        self.easing = easing
+        self.data = data
+        self.progress = 0.0
+        self.value = easing(0.0)
+
+class EffectsEngine:
+    def __init__(self, scale=1.0):
+        self.scale = scale
+        self.time = 0
+        self.active = []
+        self.pool = []
+        self.begin_frame(0)
+
+    @property
+    def enabled(self):
+        return self.scale > 0
+
+    def spawn(self, kind, duration, data=None, easing=linear):
+        """Start a one-shot effect, returns it (or None while effects are off)"""
+        if not self.enabled:
+            return None
+        effect = self.pool.pop() if self.pool else Effect()
+        effect.reset(kind, self.time, duration, easing, data)
+        self.active.append(effect)
+        return effect
+
+    def clear(self):
+        self.pool.extend(self.active)
+        self.active.clear()
+
+    def begin_frame(self, dt):
+        """Advance the clock and every effect, and evaluate the shared waveforms"""
+        self.time += dt
+        now = self.time
+
+        # Finished effects go back to the pool, in place so nothing is allocated
+        kept = 0
+        for effect in self.active:
+            progress = (now - effect.start) / effect.duration
+            if progress >= 1:
+                self.pool.append(effect)
+                continue
+            effect.progress = progress
+            effect.value = effect.easing(progress)
+            self.active[kept] = effect
+            kept += 1
+        del self.active[kept:]
+
+        if self.enabled:
+            wave = abs(math.sin(now * 0.01))
+            self.flicker = wave * 0.5 + 0.5
+            self.pulse = wave * 0.3 + 0.7
+            self.boss_pulse = abs(math.sin(now * 0.005)) * 0.2 + 0.8
+        else:
+            self.flicker = self.pulse = self.boss_pulse = 1.0
+        self.blink = not self.enabled or int(now / 100) % 2 == 1
+
+        # Combined values the renderer reads
+        shake = 0
+        self.rise = 0.0  # rows the board is still pushed down by rising garbage
+        self.boss_flash = 0.0
+        self.line_flashes = ()
+        flashes = []
+        for effect in self.active:
+            if effect.kind == 'shake':
+                shake = max(shake, effect.data * (1 - effect.value))
+            elif effect.kind == 'garbage_rise':
+                self.rise += effect.data * (1 - effect.value)
+            elif effect.kind == 'boss_hit':
+                self.boss_flash = max(self.boss_flash, 1 - effect.value)
+            elif effect.kind == 'line_clear':
+                flashes.append((effect.data, 1 - effect.value))
+        if flashes:
+            self.line_flashes = flashes
+        amount = int(shake * self.scale)
+        self.shake_x = random.randint(-amount, amount) if amount else 0
+        self.shake_y = random.randint(-amount, amount) if amount else 0
+
+    # --- game events ---------------------------------------------------------
+
+    def line_clear(self, rows):
+        self.spawn('line_clear', LINE_CLEAR_TIME, tuple(rows), ease_out_quad)
+
+    def garbage_rise(self, rows):
+        self.spawn('garbage_rise', GARBAGE_RISE_TIME, rows * self.scale, ease_out_quad)
+
+    def shake(self, intensity):
+        # Dies down at the rate the old per-update shake did
+        self.spawn('shake', intensity / SHAKE_DECAY, intensity)
+
+    def boss_hit(self):
+        self.spawn('boss_hit', BOSS_HIT_TIME, None, ease_in_out_quad)
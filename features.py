@@ -0,0 +1,255 @@
+# Board metrics for the autoplayer, difficulty tuning and dashboards.
+#
+# Boards are converted once to bitboards (one int per row and one per column)
+# and every metric is a handful of integer operations per column or row.
+# BoardFeatures keeps per-column results, so trying a placement only
+# recomputes the columns and rows the piece touches (everything after a line
+# clear, since that shifts the whole stack).
+
+FEATURE_NAMES = (
+    'aggregate_height', 'max_height', 'holes', 'covered', 'bumpiness', 'max_well', 'well_sum',
+    'row_transitions', 'column_transitions', 'corrupted', 'tspin_slots', 'lines_cleared',
+)
+
+if hasattr(int, 'bit_count'):
+    popcount = int.bit_count
+else:
+    def popcount(value):
+        return bin(value).count('1')
+
+class Bitboard:
+    """rows[y] has bit x set for a filled cell (y = 0 is the top row).
+    cols[x] has bit r set for a filled cell r rows above the floor."""
+    def __init__(self, width, height, rows, cols, corrupted):
+        self.width = width
+        self.height = height
+        self.rows = rows
+        self.cols = cols
+        self.corrupted = corrupted  # per column, same layout as cols
+
+    @classmethod
+    def from_grid(cls, grid, corrupted_grid=None):
+        """From TetrisGame.grid / corrupted_grid (None = empty cell)"""
+        height = len(grid)
+        width = len(grid[0])
+        rows = [0] * height
+        cols = [0] * width
+        corrupted = [0] * width
+        for y, row in enumerate(grid):
+            bit = 1 << (height - 1 - y)
+            mask = 0
+            for x, cell in enumerate(row):
+                if cell is not None:
+                    mask |= 1 << x
+                    cols[x] |= bit
+                    if corrupted_grid is not None and corrupted_grid[y][x]:
+                        corrupted[x] |= bit
+            rows[y] = mask
+        return cls(width, height, rows, cols, corrupted)
+
+    def place(self, cells, corrupted=False):
+        """Board after locking a piece at absolute cells.
+        Returns (new board, lines cleared, touched columns or None if every column changed)."""
+        rows = self.rows[:]
+        for x, y in cells:
+            if y >= 0:
+                rows[y] |= 1 << x
+        full = (1 << self.width) - 1
+        cleared = [y for y in {y for _, y in cells if y >= 0} if rows[y] == full]
+
+        if not cleared:
+            cols = self.cols[:]
+            corrupted_cols = self.corrupted[:] if corrupted else self.corrupted
+            touched = set()
+            for x, y in cells:
+                if y >= 0:
+                    bit = 1 << (self.height - 1 - y)
+                    cols[x] |= bit
+                    if corrupted:
+                        corrupted_cols[x] |= bit
+                    touched.add(x)
+            return Bitboard(self.width, self.height, rows, cols, corrupted_cols), 0, touched
+
+        # Line clear: drop the full rows and squeeze their bits out of every column
+        corrupted_cols = self.corrupted[:]
+        if corrupted:
+            for x, y in cells:
+                if y >= 0:
+                    corrupted_cols[x] |= 1 << (self.height - 1 - y)
+        rows = [row for row in rows if row != full]
+        rows = [0] * (self.height - len(rows)) + rows
+        cols = [0] * self.width
+        for y, row in enumerate(rows):
+            bit = 1 << (self.height - 1 - y)
+            for x in range(self.width):
+                if row >> x & 1:
+                    cols[x] |= bit
+        bits = sorted((self.height - 1 - y for y in cleared), reverse=True)
+        for x in range(self.width):
+            value = corrupted_cols[x]
+            for bit in bits:
+                value = (value & ((1 << bit) - 1)) | ((value >> (bit + 1)) << bit)
+            corrupted_cols[x] = value
+        return Bitboard(self.width, self.height, rows, cols, corrupted_cols), len(cleared), None
+
+    def add_rows(self, masks):
+        """Board with corrupted rows pushed in from the floor (garbage), masks listed top
+        to bottom. The stack moves up, so every column is a shift and an OR."""
+        count = len(masks)
+        keep = (1 << self.height) - 1
+        cols = []
+        corrupted = []
+        for x in range(self.width):
+            bits = 0
+            for i, mask in enumerate(masks):
+                if mask >> x & 1:
+                    bits |= 1 << (count - 1 - i)
+            cols.append((self.cols[x] << count | bits) & keep)
+            corrupted.append((self.corrupted[x] << count | bits) & keep)
+        return Bitboard(self.width, self.height, self.rows[count:] + list(masks), cols, corrupted)
+
+def column_stats(col, corrupted_col):
+    """(height, holes, covered cells, column transitions, corrupted cells) of one column"""
+    height = col.bit_length()
+    holes = height - popcount(col)
+    covered = 0
+    if holes:
+        empty = ~col & ((1 << height) - 1)
+        lowest_hole = (empty & -empty).bit_length() - 1
+        # Filled cells sitting above the lowest hole
+        covered = popcount(col >> lowest_hole)
+    # Floor counts as filled, the open sky above the stack doesn't
+    with_floor = (col << 1) | 1
+    transitions = popcount((with_floor ^ (with_floor >> 1)) & ((1 << height) - 1)) if height else 0
+    return height, holes, covered, transitions, popcount(corrupted_col)
+
+def row_transitions(row, width):
+    if not row:
+        return 0
+    # Walls on both sides count as filled
+    with_walls = (row << 1) | 1 | (1 << (width + 1))
+    return popcount((with_walls ^ (with_walls >> 1)) & ((1 << (width + 1)) - 1))
+
+def tspin_slots(rows, width):
+    """Spots where a T pointing down fits under an overhang with both bottom corners filled (3-corner rule)"""
+    full = (1 << width) - 1
+    height = len(rows)
+    count = 0
+    for y in range(1, height - 1):
+        above = rows[y - 1]
+        if not above:
+            continue
+        empty = ~rows[y] & full
+        # x-1, x and x+1 empty on the T's row
+        slots = empty & (empty << 1) & (empty >> 1)
+        if not slots:
+            continue
+        below = rows[y + 1]
+        slots &= ~below  # stem cell empty
+        slots &= (below << 1) & (below >> 1)  # both bottom corners filled
+        slots &= (above << 1) | (above >> 1)  # at least one top corner filled
+        slots &= rows[y + 2] if y + 2 < height else full  # something for the stem to rest on
+        count += popcount(slots & full)
+    return count
+
+class BoardFeatures:
+    """Features of a board, kept per column so a placement only recomputes what it touched"""
+    def __init__(self, board, columns=None, transitions=None, lines_cleared=0):
+        self.board = board
+        self.columns = columns if columns is not None else \
+            [column_stats(col, corrupted) for col, corrupted in zip(board.cols, board.corrupted)]
+        self.transitions = transitions if transitions is not None else \
+            [row_transitions(row, board.width) for row in board.rows]
+        self.lines_cleared = lines_cleared
+
+    @classmethod
+    def from_grid(cls, grid, corrupted_grid=None):
+        return cls(Bitboard.from_grid(grid, corrupted_grid))
+
+    def place(self, cells, corrupted=False):
+        """Features after locking a piece at absolute cells (this object is left unchanged)"""
+        board, lines, touched = self.board.place(cells, corrupted)
+        if touched is None:
+            return BoardFeatures(board, lines_cleared=lines)
+        columns = self.columns[:]
+        for x in touched:
+            columns[x] = column_stats(board.cols[x], board.corrupted[x])
+        transitions = self.transitions[:]
+        for y in {y for _, y in cells if y >= 0}:
+            transitions[y] = row_transitions(board.rows[y], board.width)
+        return BoardFeatures(board, columns, transitions, lines)
+
+    def add_rows(self, masks):
+        """Features after garbage rows (bit masks, top to bottom) push the stack up"""
+        board = self.board.add_rows(masks)
+        transitions = self.transitions[len(masks):] + [row_transitions(mask, board.width) for mask in masks]
+        return BoardFeatures(board, transitions=transitions)
+
+    def values(self):
+        """Feature values in FEATURE_NAMES order"""
+        board = self.board
+        heights = [column[0] for column in self.columns]
+        bumpiness = 0
+        max_well = 0
+        well_sum = 0
+        for x, height in enumerate(heights):
+            if x:
+                bumpiness += abs(height - heights[x - 1])
+            # Walls count as infinitely high
+            left = heights[x - 1] if x > 0 else board.height
+            right = heights[x + 1] if x + 1 < board.width else board.height
+            depth = min(left, right) - height
+            if depth > 0:
+                max_well = max(max_well, depth)
+                well_sum += depth * (depth + 1) // 2
+        return (
+            sum(heights),
+            max(heights),
+            sum(column[1] for column in self.columns),
+            sum(column[2] for column in self.columns),
+            bumpiness,
+            max_well,
+            well_sum,
+            sum(self.transitions),
+            sum(column[3] for column in self.columns),
+            sum(column[4] for column in self.columns),
+            tspin_slots(board.rows, board.width),
+            self.lines_cleared,
+        )
+
+    def as_dict(self):
+        return dict(zip(FEATURE_NAMES, self.values()))
+
+    def column_heights(self):
+        return [column[0] for column in self.columns]
+
+    def well_depths(self):
+        heights = self.column_heights()
+        depths = []
+        for x, height in enumerate(heights):
+            left = heights[x - 1] if x > 0 else self.board.height
+            right = heights[x + 1] if x + 1 < self.board.width else self.board.height
+            depths.append(max(0, min(left, right) - height))
+        return depths
+
+def extract(grid, corrupted_grid=None):
+    """Feature dict for one TetrisGame.grid"""
+    return BoardFeatures.from_grid(grid, corrupted_grid).as_dict()
+
+def extract_batch(grids, corrupted_grids=None):
+    """Feature rows (FEATURE_NAMES order) for many boards"""
+    if corrupted_grids is None:
+        corrupted_grids = [None] * len(grids)
+    return [BoardFeatures.from_grid(grid, corrupted).values() for grid, corrupted in zip(grids, corrupted_grids)]
+
+def evaluate_placements(features, placements, states, corrupted=False):
+    """Feature rows for every candidate placement of one piece, sharing the base board's column stats.
+
+    placements are (rotation, x, y) from main.enumerate_placements and states the piece's
+    rotation states from ROTATION_SYSTEMS, so nothing here touches the live game.
+    """
+    results = []
+    for rotation, x, y in placements:
+        cells = [(x + cx, y + cy) for cx, cy in states[rotation]]
+        results.append(((rotation, x, y), features.place(cells, corrupted).values()))
+    return results
@@ -0,0 +1,209 @@
+import argparse
+import json
+import sys
+import time
+
+import autoplay
+import broadcast
+import main
+from puzzle import PUZZLES
+from quality import QUALITY_MODES
+from ruleset import DEFAULT_RULESET, RULES, get_ruleset
+
+# Command line entry point (python main.py ...).
+#
+#   python main.py                                 menu, as always
+#   python main.py --mode boss --seed 42           straight into a game
+#   python main.py --headless 100 --policy random  play games without a window
+#   python main.py --benchmark                     run the benchmark suite
+#   python main.py --replay replays.tzr [--game 7] re-simulate recorded games
+#   python main.py --solve [--puzzle cave]         check the puzzles can be solved
+#   python main.py --soak 8 --max-growth 16        hours of simulated play, fails on memory growth
+#
+# The headless commands never open a window or the sound device, and print one
+# JSON object per line (per game or benchmark, then a summary) for scripts.
+
+def emit(row):
+    print(json.dumps(row), flush=True)
+
+def run_headless(args):
+    archive = None
+    if args.record_replays:
+        from replay_archive import ReplayArchive
+        archive = ReplayArchive(args.record_replays, writable=True)
+
+    outcomes = {'won': 0, 'lost': 0, 'timeout': 0}
+    scores = []
+    start = time.perf_counter()
+    last = start
+    games = autoplay.run_games(args.headless, args.policy, args.mode == 'boss', args.seed, args.ruleset,
+                               args.rotation, args.pps, args.max_time * 1000, record=archive is not None)
+    for i, (game, outcome) in enumerate(games):
+        now = time.perf_counter()
+        outcomes[outcome] += 1
+        scores.append(game.score)
+        if archive:
+            archive.append_game(game)
+        emit({'game': i, 'seed': game.seed, 'outcome': outcome, 'score': game.score, 'lines': game.lines_cleared,
+              'level': game.level, 'pieces': sum(game.piece_counts.values()), 'game_ms': int(game.game_time),
+              'wall_ms': round((now - last) * 1000, 3)})
+        last = now
+    if archive:
+        archive.close()
+
+    elapsed = time.perf_counter() - start
+    emit({'summary': 'headless', 'games': len(scores), 'policy': args.policy, 'mode': args.mode or 'classic',
+          'ruleset': args.ruleset, **outcomes, 'mean_score': round(sum(scores) / max(1, len(scores)), 1),
+          'max_score': max(scores, default=0), 'wall_ms': round(elapsed * 1000, 3),
+          'games_per_sec': round(len(scores) / elapsed, 3) if elapsed else None})
+    return 0
+
+def run_benchmark(args):
+    import bench
+    start = time.perf_counter()
+    count = 0
+    for result in bench.run_benchmarks(seed=1 if args.seed is None else args.seed):
+        emit(result)
+        count += 1
+    emit({'summary': 'benchmark', 'benchmarks': count, 'wall_ms': round((time.perf_counter() - start) * 1000, 3)})
+    return 0
+
+def run_replays(args):
+    from replay_archive import ReplayArchive
+    archive = ReplayArchive(args.replay)
+    ids = [args.game] if args.game is not None else archive.index['game_id'].tolist()
+    mismatches = 0
+    start = time.perf_counter()
+    for game_id in ids:
+        began = time.perf_counter()
+        game = archive.replay(game_id)
+        row = archive.row(game_id)
+        # A replay that doesn't end where the recording did means the simulation changed
+        match = game.score == int(row['score']) and game.lines_cleared == int(row['lines'])
+        mismatches += not match
+        emit({'game': game_id, 'score': game.score, 'recorded_score': int(row['score']), 'lines': game.lines_cleared,
+              'recorded_lines': int(row['lines']), 'match': match,
+              'wall_ms': round((time.perf_counter() - began) * 1000, 3)})
+    archive.close()
+    emit({'summary': 'replay', 'games': len(ids), 'mismatches': mismatches,
+          'wall_ms': round((time.perf_counter() - start) * 1000, 3)})
+    return 1 if mismatches else 0
+
+def run_solver(args):
+    from solver import Solver
+    keys = [args.puzzle] if args.puzzle else list(PUZZLES)
+    failures = 0
+    start = time.perf_counter()
+    for key in keys:
+        spec = PUZZLES[key]
+        rules = get_ruleset(spec.ruleset)
+        grid, _ = spec.build_grid(rules, main.TETROMINO_COLORS, main.CORRUPTION_COLOR)
+        solver = Solver(rules, main.ROTATION_SYSTEMS[spec.rotation], spec.pieces, args.max_nodes)
+        began = time.perf_counter()
+        solution = solver.solve(Solver.board_from_grid(grid))
+        # A puzzle that is already clear doesn't count as solvable either
+        solved = bool(solution)
+        failures += not solved
+        emit({'puzzle': key, 'pieces': len(spec.pieces), 'rotation': spec.rotation,
+              'status': 'solved' if solved else 'unsolvable' if solver.complete else 'gave_up',
+              'nodes': solver.nodes, 'solution': solution, 'wall_ms': round((time.perf_counter() - began) * 1000, 3)})
+    emit({'summary': 'solve', 'puzzles': len(keys), 'failures': failures,
+          'wall_ms': round((time.perf_counter() - start) * 1000, 3)})
+    return 1 if failures else 0
+
+def run_soak(args):
+    import diagnostics
+    start = time.perf_counter()
+    summary = None
+    for row in diagnostics.soak(args.soak, args.max_growth, args.sample_interval or 600, args.policy,
+                                args.mode == 'boss', 1 if args.seed is None else args.seed, args.ruleset,
+                                args.rotation, args.pps, args.max_time / 60, args.soak_render):
+        if 'summary' in row:
+            summary = row
+            row['wall_ms'] = round((time.perf_counter() - start) * 1000, 3)
+        emit(row)
+    return 0 if summary['passed'] else 1
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Tetrizz")
+    game = parser.add_argument_group('game')
+    game.add_argument('--mode', choices=('classic', 'boss'), help="skip the menu and start this mode")
+    game.add_argument('--seed', type=int, help="piece and attack seed (headless game i uses seed + i)")
+    game.add_argument('--ruleset', choices=sorted(RULES), default=DEFAULT_RULESET, help="rules variant to start with")
+    game.add_argument('--rotation', choices=sorted(main.ROTATION_SYSTEMS), default='classic', help="rotation system")
+    game.add_argument('--no-audio', action='store_true', help="don't open the sound device")
+    game.add_argument('--effects', metavar='SCALE', type=float, default=1.0,
+                      help="visual effects strength, 0 turns them off (default 1)")
+    game.add_argument('--quality', choices=QUALITY_MODES, default='auto',
+                      help="render quality preset, auto steps down when frames run over budget")
+    game.add_argument('--das', metavar='MS', type=int, default=main.HANDLING['das'],
+                      help=f"delay before a held left/right starts repeating (default {main.HANDLING['das']})")
+    game.add_argument('--arr', metavar='MS', type=int, default=main.HANDLING['arr'],
+                      help=f"time between repeats once it does, 0 slides straight to the wall "
+                           f"(default {main.HANDLING['arr']})")
+    game.add_argument('--soft-drop-factor', metavar='N', type=int, default=main.HANDLING['soft_drop_factor'],
+                      help=f"how many times faster than gravity soft drop falls "
+                           f"(default {main.HANDLING['soft_drop_factor']})")
+    game.add_argument('--puzzle', metavar='NAME', choices=list(PUZZLES),
+                      help=f"start this puzzle ({', '.join(PUZZLES)})")
+
+    output = parser.add_argument_group('recording and spectating')
+    output.add_argument('--stream', metavar='FILE', help="write the game's event stream to FILE (.tzev)")
+    output.add_argument('--broadcast', metavar='PORT', type=int, nargs='?', const=broadcast.DEFAULT_PORT,
+                        help="serve the event stream to spectators (python broadcast.py HOST:PORT)")
+    output.add_argument('--broadcast-host', metavar='HOST', default=broadcast.DEFAULT_HOST,
+                        help="address --broadcast listens on, 0.0.0.0 for the whole network (default 127.0.0.1, "
+                             "the stream isn't authenticated)")
+    output.add_argument('--record-replays', metavar='FILE', help="append every finished game to a replay archive (.tzr)")
+    output.add_argument('--difficulty-log', metavar='FILE', help="append the adaptive boss's decisions to FILE (JSON lines)")
+    output.add_argument('--memory-log', metavar='FILE',
+                        help="sample memory use while playing and append it to FILE (JSON lines, slows the game down)")
+
+    automation = parser.add_argument_group('automation (no window, JSON lines on stdout)')
+    commands = automation.add_mutually_exclusive_group()
+    commands.add_argument('--headless', metavar='N', type=int, help="play N games with --policy")
+    commands.add_argument('--benchmark', action='store_true', help="run the benchmark suite")
+    commands.add_argument('--replay', metavar='FILE', help="re-simulate the games in a replay archive and check them")
+    commands.add_argument('--solve', action='store_true', help="check every puzzle (or --puzzle) has a solution")
+    commands.add_argument('--soak', metavar='HOURS', type=float,
+                          help="play HOURS of game time with --policy and fail if memory grows past --max-growth")
+    automation.add_argument('--policy', choices=sorted(autoplay.POLICIES), default='heuristic',
+                            help="autoplayer for --headless and --soak (default heuristic)")
+    automation.add_argument('--pps', type=float, default=2.0, help="autoplayer pieces per second (default 2)")
+    automation.add_argument('--max-time', metavar='SECONDS', type=float, default=600,
+                            help="end headless and soak games after this much game time (default 600)")
+    automation.add_argument('--game', metavar='ID', type=int, help="only replay this game")
+    automation.add_argument('--max-growth', metavar='MB', type=float, default=16,
+                            help="memory --soak may grow by after its first sample (default 16)")
+    automation.add_argument('--sample-interval', metavar='SECONDS', type=float,
+                            help="memory sample interval, game time for --soak (default 600), "
+                                 "wall time for --memory-log (default 60)")
+    automation.add_argument('--soak-render', action='store_true',
+                            help="draw every --soak frame offscreen too (much slower)")
+    automation.add_argument('--max-nodes', metavar='N', type=int, default=1000000,
+                            help="give up --solve on a puzzle after searching this many positions (default 1000000)")
+    return parser
+
+def cli(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.das < 0 or args.arr < 0 or args.soft_drop_factor < 1:
+        parser.error("--das and --arr can't be negative and --soft-drop-factor must be at least 1")
+    if args.headless is not None:
+        return run_headless(args)
+    if args.benchmark:
+        return run_benchmark(args)
+    if args.replay:
+        return run_replays(args)
+    if args.solve:
+        return run_solver(args)
+    if args.soak is not None:
+        return run_soak(args)
+    boss_mode = None if args.mode is None else args.mode == 'boss'
+    main.main(args.stream, args.broadcast, args.record_replays, args.difficulty_log, args.ruleset, args.effects,
+              args.quality, boss_mode, args.seed, args.rotation, not args.no_audio, args.puzzle,
+              args.memory_log, args.sample_interval or 60, args.broadcast_host,
+              {'das': args.das, 'arr': args.arr, 'soft_drop_factor': args.soft_drop_factor})
+
+if __name__ == '__main__':
+    sys.exit(cli())
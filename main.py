@@ -1,20 +1,42 @@
+import os
+# Keep stdout clean for the JSON lines of the headless commands (launcher.py)
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
 import pygame
 import random
 import sys
 import math
+import heapq
+import itertools
+import bisect
+import queue
+import threading
+import time
+from array import array
+from collections import deque
 
-# Initialize Pygame
-pygame.init()
+import boss_config
+from stats import StatsStore
+import broadcast
+from difficulty import DifficultyController
+from ruleset import RULES, DEFAULT_RULESET, get_ruleset
+from effects import EffectsEngine
+from quality import QualityManager, QUALITY_MODES
+from puzzle import PUZZLES
+from solver import Solver, SolverProcess
 
-# Constants
-GRID_WIDTH = 10
-GRID_HEIGHT = 20
-CELL_SIZE = 32
-GRID_X_OFFSET = 60
-GRID_Y_OFFSET = 60
+# Fonts are all the renderer needs at import. The window, clock and audio are
+# started by init_pygame(), so headless runs never open a display or sound device.
+pygame.font.init()
 
-WINDOW_WIDTH = GRID_WIDTH * CELL_SIZE + 2 * GRID_X_OFFSET + 350
-WINDOW_HEIGHT = GRID_HEIGHT * CELL_SIZE + 2 * GRID_Y_OFFSET + 40
+def init_pygame(audio=True):
+    global AUDIO_ENABLED
+    if not audio:
+        # SDL's dummy audio driver comes up instantly and plays nothing
+        os.environ['SDL_AUDIODRIVER'] = 'dummy'
+    pygame.init()
+    AUDIO_ENABLED = audio and pygame.mixer.get_init() is not None
+
+# Board size, window layout, scoring and gravity come from the ruleset (ruleset.py)
 
 # Modern color palette
 BACKGROUND = (15, 15, 23)
@@ -158,10 +180,127 @@ TETROMINOES = {
            '.....']]
 }
 
+PIECE_SHAPES = list(TETROMINOES.keys())
+
+# SRS spawn states (box size, cells) with y pointing down; the other three
+# states are clockwise rotations of these inside the box
+SRS_SPAWN_STATES = {
+    'I': (4, [(0, 1), (1, 1), (2, 1), (3, 1)]),
+    'O': (4, [(1, 0), (2, 0), (1, 1), (2, 1)]),
+    'T': (3, [(1, 0), (0, 1), (1, 1), (2, 1)]),
+    'S': (3, [(1, 0), (2, 0), (0, 1), (1, 1)]),
+    'Z': (3, [(0, 0), (1, 0), (1, 1), (2, 1)]),
+    'J': (3, [(0, 0), (0, 1), (1, 1), (2, 1)]),
+    'L': (3, [(2, 0), (0, 1), (1, 1), (2, 1)]),
+}
+
+# SRS wall kicks as (x, y) with y pointing up, as they are usually written.
+# States are 0 = spawn, 1 = R, 2 = 180, 3 = L.
+SRS_KICKS_JLSTZ = {
+    (0, 1): [(0, 0), (-1, 0), (-1, 1), (0, -2), (-1, -2)],
+    (1, 0): [(0, 0), (1, 0), (1, -1), (0, 2), (1, 2)],
+    (1, 2): [(0, 0), (1, 0), (1, -1), (0, 2), (1, 2)],
+    (2, 1): [(0, 0), (-1, 0), (-1, 1), (0, -2), (-1, -2)],
+    (2, 3): [(0, 0), (1, 0), (1, 1), (0, -2), (1, -2)],
+    (3, 2): [(0, 0), (-1, 0), (-1, -1), (0, 2), (-1, 2)],
+    (3, 0): [(0, 0), (-1, 0), (-1, -1), (0, 2), (-1, 2)],
+    (0, 3): [(0, 0), (1, 0), (1, 1), (0, -2), (1, -2)],
+}
+SRS_KICKS_I = {
+    (0, 1): [(0, 0), (-2, 0), (1, 0), (-2, -1), (1, 2)],
+    (1, 0): [(0, 0), (2, 0), (-1, 0), (2, 1), (-1, -2)],
+    (1, 2): [(0, 0), (-1, 0), (2, 0), (-1, 2), (2, -1)],
+    (2, 1): [(0, 0), (1, 0), (-2, 0), (1, -2), (-2, 1)],
+    (2, 3): [(0, 0), (2, 0), (-1, 0), (2, 1), (-1, -2)],
+    (3, 2): [(0, 0), (-2, 0), (1, 0), (-2, -1), (1, 2)],
+    (3, 0): [(0, 0), (1, 0), (-2, 0), (1, -2), (-2, 1)],
+    (0, 3): [(0, 0), (-1, 0), (2, 0), (-1, 2), (2, -1)],
+}
+
+def build_classic_rotation():
+    """The original rotation: template states, no kicks"""
+    states = {}
+    kicks = {}
+    for shape, templates in TETROMINOES.items():
+        states[shape] = tuple(
+            tuple((j, i) for i, row in enumerate(template) for j, cell in enumerate(row) if cell == '#')
+            for template in templates)
+        count = len(templates)
+        kicks[shape] = {(r, (r + d) % count): ((0, 0),) for r in range(count) for d in (1, -1)}
+    return {'states': states, 'kicks': kicks}
+
+def build_srs_rotation():
+    states = {}
+    kicks = {}
+    for shape, (size, cells) in SRS_SPAWN_STATES.items():
+        rotations = [tuple(cells)]
+        for _ in range(3):
+            rotations.append(tuple(sorted((size - 1 - y, x) for x, y in rotations[-1])))
+        if shape == 'O':
+            # O doesn't actually turn, it just keeps its cells
+            rotations = [tuple(cells)] * 4
+            table = {move: [(0, 0)] for move in SRS_KICKS_JLSTZ}
+        else:
+            table = SRS_KICKS_I if shape == 'I' else SRS_KICKS_JLSTZ
+        states[shape] = tuple(rotations)
+        # Flip y so the offsets can be added to grid coordinates directly
+        kicks[shape] = {move: tuple((dx, -dy) for dx, dy in offsets) for move, offsets in table.items()}
+    return {'states': states, 'kicks': kicks}
+
+# Rotation states and kick offsets for every piece, computed once at import.
+# Used by the game, the placement enumerator and anything else that moves pieces.
+ROTATION_SYSTEMS = {
+    'classic': build_classic_rotation(),
+    'srs': build_srs_rotation(),
+}
+
+def piece_fits(grid, cells, x, y):
+    """Collision test for a piece with the given cell offsets at (x, y)"""
+    height = len(grid)
+    width = len(grid[0])
+    for cx, cy in cells:
+        gx = x + cx
+        gy = y + cy
+        if gx < 0 or gx >= width or gy >= height:
+            return False
+        if gy >= 0 and grid[gy][gx] is not None:
+            return False
+    return True
+
+def enumerate_placements(grid, shape, rotation_system='classic', start_y=0):
+    """All spots a piece can be hard dropped to, as (rotation, x, y) tuples.
+    Identical landing cells reached by different states are only listed once."""
+    states = ROTATION_SYSTEMS[rotation_system]['states'][shape]
+    width = len(grid[0])
+    placements = []
+    seen = set()
+    for rotation, cells in enumerate(states):
+        min_x = min(cx for cx, _ in cells)
+        max_x = max(cx for cx, _ in cells)
+        for x in range(-min_x, width - max_x):
+            y = start_y
+            if not piece_fits(grid, cells, x, y):
+                continue
+            while piece_fits(grid, cells, x, y + 1):
+                y += 1
+            landing = frozenset((x + cx, y + cy) for cx, cy in cells)
+            if landing not in seen:
+                seen.add(landing)
+                placements.append((rotation, x, y))
+    return placements
+
+# Piece handling defaults (milliseconds): delayed auto shift, auto repeat rate
+# (0 = straight to the wall) and soft drop gravity multiplier.
+# Lock delay and lock resets are part of the ruleset.
+HANDLING = {'das': 167, 'arr': 33, 'soft_drop_factor': 20}
+
+# Particles were tuned for one step per 60 fps frame
+PARTICLE_STEP = 1000 / 60
+
 class ParticleEffect:
-    def __init__(self, x, y, color, velocity_scale=1.0):
+    def __init__(self, x, y, color, velocity_scale=1.0, density=1.0):
         self.particles = []
-        particle_count = 12 if velocity_scale > 1 else 8
+        particle_count = max(1, int((12 if velocity_scale > 1 else 8) * density))
         for _ in range(particle_count):
             self.particles.append({
                 'x': x,
@@ -188,26 +327,89 @@ class ParticleEffect:
             size = max(1, int(3 * alpha))
             pygame.draw.circle(screen, particle['color'], 
                              (int(particle['x']), int(particle['y'])), size)
-class Boss:
+# Boss encounters (phases, attacks, effect parameters) come from bosses.json
+BOSSES = boss_config.load_bosses()
+DEFAULT_BOSS = 'overlord'
+
+class EventScheduler:
+    """Priority queue of timed events on the game clock (milliseconds)"""
     def __init__(self):
-        self.max_health = 100
+        self.now = 0
+        self.queue = []
+        self.pending = set()  # handles still in the queue
+        self.cancelled = set()
+        self.counter = 0
+    
+    def schedule(self, delay, event, data=None):
+        """Schedule an event delay ms from now, returns a handle for cancel()"""
+        self.counter += 1
+        heapq.heappush(self.queue, (self.now + delay, self.counter, event, data))
+        self.pending.add(self.counter)
+        return self.counter
+    
+    def cancel(self, handle):
+        # Handles that already fired (or were cancelled) are ignored, so the set
+        # only ever holds events that are still in the queue
+        if handle in self.pending:
+            self.pending.discard(handle)
+            self.cancelled.add(handle)
+    
+    def next_event_time(self):
+        # Drop cancelled events sitting at the front of the queue
+        while self.queue and self.queue[0][1] in self.cancelled:
+            self.cancelled.discard(heapq.heappop(self.queue)[1])
+        return self.queue[0][0] if self.queue else None
+    
+    def advance(self, dt, handler):
+        """Move the clock forward by dt and call handler(event, data) for every event that comes due"""
+        target = self.now + dt
+        while True:
+            event_time = self.next_event_time()
+            if event_time is None or event_time > target:
+                break
+            _, handle, event, data = heapq.heappop(self.queue)
+            self.pending.discard(handle)
+            # Run the handler at the event's own time so anything it schedules is relative to that
+            self.now = max(self.now, event_time)
+            handler(event, data)
+        self.now = target
+
+class Boss:
+    def __init__(self, scheduler, config, rng=random):
+        self.scheduler = scheduler
+        self.config = config
+        self.rng = rng
+        self.name = config['name']
+        self.attacks = config['attacks']
+        self.attack_pools = config['pools']  # (phase, last attack) -> (names, cumulative weights)
+        self.max_health = config['max_health']
         self.health = self.max_health
         self.phase = 1
-        self.attack_timer = 0
-        self.attack_cooldown = 5000  # milliseconds
+        self.attack_cooldown = config['phase_cooldowns'][0]  # milliseconds
+        self.attack_due = 0
+        self.attack_handle = None
+        self.attack_remaining = 0  # attack clock saved while stunned
         self.is_stunned = False
-        self.stun_timer = 0
-        self.animation_time = 0
-        self.shake_intensity = 0
-        self.shake_timer = 0
         self.last_attack = None
+        self.attack_ready_at = {}  # attack -> time its own cooldown ends
+        self.cooldown_scale = 1.0  # set by the difficulty controller
         
-        # Boss attacks
-        self.attacks = {
-            1: ['garbage_lines', 'speed_boost'],
-            2: ['garbage_lines', 'speed_boost', 'grid_shake'],
-            3: ['garbage_lines', 'speed_boost', 'grid_shake', 'piece_theft', 'time_pressure']
-        }
+        self.schedule_attack(self.next_cooldown())
+    
+    def next_cooldown(self):
+        return self.attack_cooldown * self.cooldown_scale
+    
+    def set_weight_scales(self, scales):
+        """Scale attack weights (attack -> multiplier) and rebuild the pick tables"""
+        self.attacks = {name: dict(attack, weight=attack['weight'] * scales.get(name, 1))
+                        for name, attack in self.config['attacks'].items()}
+        self.attack_pools = boss_config.build_attack_pools(self.attacks, len(self.config['phase_cooldowns']))
+    
+    def schedule_attack(self, delay):
+        self.scheduler.cancel(self.attack_handle)
+        delay = max(0, delay)
+        self.attack_due = self.scheduler.now + delay
+        self.attack_handle = self.scheduler.schedule(delay, 'boss_attack')
     
     def take_damage(self, damage):
         if not self.is_stunned:
@@ -215,64 +417,85 @@ class Boss:
             self.health = max(0, self.health)
             
             # Phase transitions
-            if self.health <= 66 and self.phase == 1:
-                self.phase = 2
-                self.attack_cooldown = 2500
-            elif self.health <= 33 and self.phase == 2:
-                self.phase = 3
-                self.attack_cooldown = 2000
+            thresholds = self.config['phase_thresholds']
+            old_cooldown = self.next_cooldown()
+            while self.phase < len(thresholds) and self.health <= thresholds[self.phase]:
+                self.phase += 1
+                self.attack_cooldown = self.config['phase_cooldowns'][self.phase - 1]
+            if self.next_cooldown() != old_cooldown:
+                # Time already waited counts towards the new cooldown
+                self.schedule_attack(self.time_until_attack() + self.next_cooldown() - old_cooldown)
             
             # Stun on big damage
-            if damage >= 20:  # Tetris damage
+            if damage >= self.config['stun_damage']:  # Tetris damage
+                # The attack clock stops while stunned
+                self.attack_remaining = self.time_until_attack()
                 self.is_stunned = True
-                self.stun_timer = 1500
+                self.scheduler.cancel(self.attack_handle)
+                self.attack_handle = None
+                self.scheduler.schedule(self.config['stun_duration'], 'boss_stun_end')
     
-    def update(self, dt):
-        self.animation_time += dt
-        
-        if self.is_stunned:
-            self.stun_timer -= dt
-            if self.stun_timer <= 0:
-                self.is_stunned = False
-        
-        if self.shake_timer > 0:
-            self.shake_timer -= dt
-            self.shake_intensity = max(0, self.shake_intensity - dt * 0.01)
-        
-        if not self.is_stunned:
-            self.attack_timer += dt
+    def end_stun(self):
+        self.is_stunned = False
+        self.schedule_attack(self.attack_remaining)
     
-    def should_attack(self):
-        return self.attack_timer >= self.attack_cooldown and not self.is_stunned
+    def time_until_attack(self):
+        if self.is_stunned:
+            return self.attack_remaining
+        return self.attack_due - self.scheduler.now
     
     def get_random_attack(self):
-        available_attacks = self.attacks.get(self.phase, self.attacks[1])
-        # Avoid repeating the same attack
-        if self.last_attack and len(available_attacks) > 1:
-            available_attacks = [a for a in available_attacks if a != self.last_attack]
-        return random.choice(available_attacks)
+        pool = self.attack_pools.get((self.phase, self.last_attack)) or self.attack_pools[(self.phase, None)]
+        names, cumulative = pool
+        attack = names[bisect.bisect_right(cumulative, self.rng.random() * cumulative[-1])]
+        
+        # Rare case: the pick is still on its own cooldown, so choose among the ready ones
+        now = self.scheduler.now
+        if self.attack_ready_at.get(attack, 0) > now:
+            ready = [name for name in names if self.attack_ready_at.get(name, 0) <= now]
+            if ready:
+                attack = self.rng.choices(ready, [self.attacks[name]['weight'] for name in ready])[0]
+        return attack
     
     def execute_attack(self):
         attack = self.get_random_attack()
         self.last_attack = attack
-        self.attack_timer = 0
+        self.attack_ready_at[attack] = self.scheduler.now + self.attacks[attack]['cooldown']
+        self.schedule_attack(self.next_cooldown())
         return attack
     
-    def draw(self, screen, x, y, width, height):
+    def view(self):
+        return BossView(self.name, self.health, self.max_health, self.phase, self.is_stunned,
+                        self.time_until_attack() < self.next_cooldown() * 0.2 and not self.is_stunned)
+
+class BossView:
+    """What the renderer needs of the boss, frozen at snapshot time"""
+    __slots__ = ('name', 'health', 'max_health', 'phase', 'is_stunned', 'attack_incoming')
+    
+    def __init__(self, name, health, max_health, phase, is_stunned, attack_incoming):
+        self.name = name
+        self.health = health
+        self.max_health = max_health
+        self.phase = phase
+        self.is_stunned = is_stunned
+        self.attack_incoming = attack_incoming
+    
+    def draw(self, screen, x, y, width, height, effects):
         # Boss health bar background
         health_bg = pygame.Rect(x, y, width, 20)
         pygame.draw.rect(screen, (50, 50, 50), health_bg, border_radius=10)
         
         # Health bar
         health_width = int((self.health / self.max_health) * width)
-        health_color = DANGER if self.health < 30 else WARNING if self.health < 60 else SUCCESS
+        health_ratio = self.health / self.max_health
+        health_color = DANGER if health_ratio < 0.3 else WARNING if health_ratio < 0.6 else SUCCESS
         if health_width > 0:
             health_bar = pygame.Rect(x, y, health_width, 20)
             pygame.draw.rect(screen, health_color, health_bar, border_radius=10)
         
         # Boss name and phase
-        font = pygame.font.Font(None, 24)
-        boss_text = font.render(f"TETRIS OVERLORD - Phase {self.phase}", True, BOSS_COLOR)
+        font = get_font(24)
+        boss_text = font.render(f"{self.name} - Phase {self.phase}", True, BOSS_COLOR)
         screen.blit(boss_text, (x, y - 47))
         
         # Health text
@@ -285,14 +508,15 @@ class Boss:
         # Boss face color based on health/stun
         if self.is_stunned:
             boss_face_color = (100, 100, 200)
-        elif self.health < 30:
+        elif self.health < self.max_health * 0.3:
             boss_face_color = DANGER
         else:
             boss_face_color = BOSS_COLOR
         
-        # Animated boss face
-        pulse = abs(math.sin(self.animation_time * 0.005)) * 0.2 + 0.8
-        face_color = tuple(int(c * pulse) for c in boss_face_color)
+        # Animated boss face, flashing white when hit
+        pulse = effects.boss_pulse
+        flash = effects.boss_flash
+        face_color = tuple(int(c * pulse + (255 - c * pulse) * flash) for c in boss_face_color)
         
         pygame.draw.rect(screen, face_color, avatar_rect, border_radius=8)
         pygame.draw.rect(screen, TEXT_PRIMARY, avatar_rect, 2, border_radius=8)
@@ -312,328 +536,849 @@ class Boss:
             pygame.draw.arc(screen, TEXT_PRIMARY, (avatar_rect.x + 15, avatar_rect.y + 30, 20, 10), math.pi, 2 * math.pi, 2)
 
 class Tetromino:
-    def __init__(self, shape, color):
+    def __init__(self, shape, color, rotation_system='classic', x=3, y=0):
         self.shape = shape
         self.color = color
+        self.rotation_system = rotation_system
+        self.states = ROTATION_SYSTEMS[rotation_system]['states'][shape]
         self.shadow_color = SHADOW_COLORS[shape]
-        self.x = GRID_WIDTH // 2 - 2
-        self.y = 0
+        self.x = x
+        self.y = y
         self.rotation = 0
         self.animation_offset = 0
         self.pulse = 0
         self.is_corrupted = False
     
-    def get_rotated_shape(self):
-        return TETROMINOES[self.shape][self.rotation]
-    
     def get_cells(self):
-        cells = []
-        shape = self.get_rotated_shape()
-        for i, row in enumerate(shape):
-            for j, cell in enumerate(row):
-                if cell == '#':
-                    cells.append((self.x + j, self.y + i))
-        return cells
+        return [(self.x + cx, self.y + cy) for cx, cy in self.states[self.rotation]]
+
+class PieceQueue:
+    """Preallocated ring buffer of upcoming pieces (shape, corrupted), always kept full"""
+    def __init__(self, size, randomizer):
+        self.size = size
+        self.randomizer = randomizer
+        self.shapes = [None] * size
+        self.corrupted = [False] * size
+        self.head = 0
+        for i in range(size):
+            self.shapes[i], self.corrupted[i] = randomizer()
+    
+    def peek(self, index=0):
+        slot = (self.head + index) % self.size
+        return self.shapes[slot], self.corrupted[slot]
+    
+    def replace(self, index, shape, corrupted):
+        slot = (self.head + index) % self.size
+        self.shapes[slot] = shape
+        self.corrupted[slot] = corrupted
+    
+    def pop(self):
+        """Take the front piece and refill its slot at the back"""
+        piece = self.shapes[self.head], self.corrupted[self.head]
+        self.shapes[self.head], self.corrupted[self.head] = self.randomizer()
+        self.head = (self.head + 1) % self.size
+        return piece
+
+# Fonts are loaded once per size instead of on every frame
+FONTS = {}
+
+def get_font(size):
+    font = FONTS.get(size)
+    if font is None:
+        font = FONTS[size] = pygame.font.Font(None, size)
+    return font
+
+# Pre-rendered preview pieces, keyed by (rotation system, shape, cell size, color)
+PIECE_SPRITES = {}
+
+def get_piece_sprite(shape, cell_size, color, rotation_system='classic'):
+    key = (rotation_system, shape, cell_size, color)
+    sprite = PIECE_SPRITES.get(key)
+    if sprite is None:
+        # Crop the spawn rotation to its filled cells so the sprite can be centered
+        cells = ROTATION_SYSTEMS[rotation_system]['states'][shape][0]
+        min_x = min(x for x, _ in cells)
+        min_y = min(y for _, y in cells)
+        width = (max(x for x, _ in cells) - min_x + 1) * cell_size
+        height = (max(y for _, y in cells) - min_y + 1) * cell_size
+        sprite = pygame.Surface((width, height), pygame.SRCALPHA)
+        for x, y in cells:
+            mini_rect = pygame.Rect((x - min_x) * cell_size, (y - min_y) * cell_size, cell_size - 2, cell_size - 2)
+            pygame.draw.rect(sprite, color, mini_rect, border_radius=3)
+        PIECE_SPRITES[key] = sprite
+    return sprite
+
+# Player actions as small ints, for recordings and bots
+ACTIONS = {
+    'left': 1, 'right': 2, 'rotate_cw': 3, 'rotate_ccw': 4, 'hard_drop': 5, 'hold': 6,
+    'soft_drop_on': 7, 'soft_drop_off': 8,
+}
+
+class BackgroundWorker:
+    """Thread that runs submitted jobs in order, so slow disks or decoders never
+    hold up the caller. A failing job is reported and skipped."""
+    def __init__(self, name):
+        self.name = name
+        self.jobs = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+    
+    def submit(self, job, *args):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name=self.name, daemon=True)
+                self.thread.start()
+        self.jobs.put((job, args))
+    
+    def run(self):
+        while True:
+            job, args = self.jobs.get()
+            try:
+                if job is None:
+                    return
+                job(*args)
+            except Exception as e:
+                print(f"{self.name}: {e}", file=sys.stderr)
+            finally:
+                self.jobs.task_done()
+    
+    def wait(self):
+        """Block until everything submitted so far has run"""
+        if self.thread is not None:
+            self.jobs.join()
+    
+    def close(self):
+        with self.lock:
+            thread, self.thread = self.thread, None
+        if thread is not None:
+            self.jobs.put((None, ()))
+            thread.join()
+
+# Sounds are loaded once and reused. Loading and playback run on the audio
+# worker, so the simulation and the renderer never wait on the disk or a decoder.
+SOUNDS = {}
+SOUND_FILES = ('sfx/dropop.wav', 'sfx/dblock.mp3')
+AUDIO = BackgroundWorker('audio')
+AUDIO_ENABLED = False  # set by init_pygame()
+
+def load_sound(path):
+    sound = SOUNDS.get(path)
+    if sound is None:
+        sound = SOUNDS[path] = pygame.mixer.Sound(path)
+    return sound
+
+def start_sound(path):
+    load_sound(path).play()
+
+def start_music(path, volume):
+    pygame.mixer.music.load(path)
+    pygame.mixer.music.play(-1)
+    pygame.mixer.music.set_volume(volume)
+
+def play_sound(path):
+    if AUDIO_ENABLED:
+        AUDIO.submit(start_sound, path)
+
+def play_music(path, volume=0.5):
+    if AUDIO_ENABLED:
+        AUDIO.submit(start_music, path, volume)
+
+def preload_sounds():
+    if AUDIO_ENABLED:
+        for path in SOUND_FILES:
+            AUDIO.submit(load_sound, path)
+
+# Visual events are numbered (across games, so a renderer outliving a game
+# isn't confused by the next one) and snapshots carry the last FX_HISTORY of
+# them. The renderer starts the ones newer than the last it saw, so it neither
+# misses the events of snapshots it skipped nor restarts those it drew again.
+FX_HISTORY = 256
+FX_NUMBERS = itertools.count(1)
 
 class TetrisGame:
-    def __init__(self, boss_mode=False):
-        self.grid = [[None for _ in range(GRID_WIDTH)] for _ in range(GRID_HEIGHT)]
-        self.corrupted_grid = [[False for _ in range(GRID_WIDTH)] for _ in range(GRID_HEIGHT)]
+    def __init__(self, boss_mode=False, boss_name=DEFAULT_BOSS, preview_count=5, rotation_system='classic',
+                 lock_delay=None, soft_drop_factor=HANDLING['soft_drop_factor'],
+                 adaptive=True, ruleset=DEFAULT_RULESET, seed=None, headless=False, puzzle=None):
+        # Puzzles bring their own board, so they also decide its size
+        self.puzzle = PUZZLES[puzzle] if puzzle else None
+        if self.puzzle:
+            ruleset = self.puzzle.ruleset
+        self.rules = get_ruleset(ruleset)
+        if lock_delay is None:
+            lock_delay = self.rules.lock_delay
+        # Everything that is needed to play the same game again from its seed and inputs
+        self.config = {
+            'boss_mode': boss_mode, 'boss_name': boss_name, 'preview_count': preview_count,
+            'rotation_system': rotation_system, 'lock_delay': lock_delay, 'soft_drop_factor': soft_drop_factor,
+            'adaptive': adaptive, 'ruleset': ruleset, 'puzzle': puzzle,
+        }
+        # All gameplay randomness comes from this generator so games can be replayed
+        self.seed = random.randrange(2 ** 32) if seed is None else seed
+        self.rng = random.Random(self.seed)
+        # Headless games (simulations, replays) skip sound and particles
+        self.headless = headless
+        # Optional recording of update(dt) calls and actions, as (dt, action) pairs
+        self.recording = None
+        
+        # Rows above rules.hidden are the buffer zone, not drawn
+        self.grid = [[None] * self.rules.width for _ in range(self.rules.total_height)]
+        self.corrupted_grid = [[False] * self.rules.width for _ in range(self.rules.total_height)]
+        # Puzzle mode: a fixed board and piece sequence, cleared when the board is empty
+        self.puzzle_index = 0  # position of the current piece in the sequence
+        self.puzzle_done = False  # sequence used up
+        if self.puzzle:
+            self.grid, self.corrupted_grid = self.puzzle.build_grid(self.rules, TETROMINO_COLORS, CORRUPTION_COLOR)
+            self.puzzle_pieces = iter(self.puzzle.pieces)
         
         # Initialize boss mode first
         self.boss_mode = boss_mode
-        self.boss = Boss() if boss_mode else None
-        self.boss_attacks_active = []
-        self.speed_boost_timer = 0
-        self.time_pressure_timer = 0
+        self.rotation_system = rotation_system
+        self.kicks = ROTATION_SYSTEMS[rotation_system]['kicks']
+        # Boss attacks, stuns and effect expirations all run off one event queue
+        self.scheduler = EventScheduler()
+        self.boss = Boss(self.scheduler, BOSSES[boss_name], self.rng) if boss_mode else None
+        self.effects = {}  # active effect -> (scheduler handle of its expiry, effect params)
         self.game_won = False
+        
+        # Event stream listeners, called as listener(kind, game time, args)
+        self.listeners = []
+        
+        # Per-game history for the stats store
+        self.piece_counts = {}
+        self.attack_history = []  # (time, attack, phase)
+        self.boss_kill_time = None
 
-        # Safely call get_new_piece
-        self.current_piece = self.get_new_piece()
-        self.next_piece = self.get_new_piece()
+        # Upcoming pieces and the hold slot
+        self.queue = PieceQueue(max(1, preview_count), self.puzzle_piece if self.puzzle else self.random_piece)
+        self.hold_shape = None
+        self.hold_corrupted = False
+        self.hold_used = False
+        self.current_piece = self.make_piece(*self.queue.pop())
 
         self.score = 0
         self.level = 1
         self.lines_cleared = 0
         self.fall_time = 0
-        self.fall_speed = 500
-        self.base_fall_speed = 500
-        self.particles = []
-        self.line_clear_animation = []
-        self.animation_time = 0
-        self.grid_shake_x = 0
-        self.grid_shake_y = 0
+        self.base_fall_speed = self.rules.fall_speed(1)
+        self.fall_speed = self.base_fall_speed
+        self.soft_dropping = False
+        self.soft_drop_factor = soft_drop_factor
+        self.lock_delay = lock_delay
+        self.lock_timer = 0
+        self.lock_resets = 0
+        self.topped_out = False
+        # Visual events for the renderer's effects, taken by snapshot(): ('burst', x, y, color,
+        # velocity scale), ('line_clear', rows), ('garbage', rows), ('shake', intensity), ('boss_hit',)
+        self.fx = []
+        self.fx_history = ()  # (number, event) of the latest ones, see FX_HISTORY
+        self.board_version = 0  # bumped whenever the locked cells change
+        self.board_snapshot = None
+        self.ghost_snapshot = (None, ())
         self.pending_line_clears = []
-        self.line_clear_timer = 0
         
-    def get_new_piece(self):
-        shape = random.choice(list(TETROMINOES.keys()))
-        piece = Tetromino(shape, TETROMINO_COLORS[shape])
+        # Adaptive difficulty, for bosses that configure it
+        self.gravity_scale = 1.0
+        self.garbage_bonus = 0
+        self.difficulty = None
+        if self.boss and adaptive and self.boss.config['difficulty']:
+            self.difficulty = DifficultyController(self, self.boss.config['difficulty'])
+        
+    def random_piece(self):
+        """Randomizer feeding the piece queue, returns (shape, corrupted)"""
+        shape = self.rng.choice(PIECE_SHAPES)
         # Boss attack: make some pieces corrupted
-        if self.boss_mode and 'piece_corruption' in self.boss_attacks_active and random.random() < 0.3:
+        corrupted = (self.boss_mode and 'piece_corruption' in self.effects and
+                     self.rng.random() < self.effects['piece_corruption'][1]['chance'])
+        return shape, corrupted
+    
+    def puzzle_piece(self):
+        """Randomizer for puzzles: the sequence, then (None, False) once it runs out"""
+        return next(self.puzzle_pieces, None), False
+    
+    def make_piece(self, shape, corrupted=False):
+        piece = Tetromino(shape, TETROMINO_COLORS[shape], self.rotation_system, self.rules.spawn_x, self.rules.spawn_y)
+        if corrupted:
             piece.is_corrupted = True
             piece.color = CORRUPTION_COLOR
-        
         return piece
     
+    def emit(self, kind, *args):
+        """Send a gameplay event to the listeners (spectator stream, recorders)"""
+        for listener in self.listeners:
+            listener(kind, self.scheduler.now, args)
+    
+    def emit_spawn(self):
+        if self.listeners:
+            piece = self.current_piece
+            self.emit('spawn', piece.shape, piece.is_corrupted, piece.get_cells())
+    
+    def spawn_next_piece(self):
+        """Bring in the front of the queue, returns False if it doesn't fit (game over)"""
+        shape, corrupted = self.queue.pop()
+        if shape is None:
+            # Out of puzzle pieces, the next update() decides how it went
+            self.puzzle_done = True
+            return True
+        self.puzzle_index += 1
+        self.current_piece = self.make_piece(shape, corrupted)
+        self.hold_used = False
+        self.lock_timer = 0
+        self.lock_resets = 0
+        self.emit_spawn()
+        if not self.is_valid_position(self.current_piece):
+            self.emit('game_over', False, self.score)
+            return False
+        return True
+    
+    def hold_piece(self):
+        """Swap the current piece with the hold slot, once per piece"""
+        if self.hold_used or self.puzzle:
+            # No hold in puzzles, the solver checks them in sequence order
+            return False
+        held = (self.hold_shape, self.hold_corrupted)
+        self.hold_shape = self.current_piece.shape
+        self.hold_corrupted = self.current_piece.is_corrupted
+        if held[0] is None:
+            self.current_piece = self.make_piece(*self.queue.pop())
+        else:
+            self.current_piece = self.make_piece(*held)
+        self.hold_used = True
+        self.fall_time = 0
+        self.lock_timer = 0
+        self.lock_resets = 0
+        self.emit_spawn()
+        return True
+    
     def is_valid_position(self, piece, dx=0, dy=0, rotation=None):
         if rotation is None:
             rotation = piece.rotation
-        
-        old_rotation = piece.rotation
-        piece.rotation = rotation
-        
-        for x, y in piece.get_cells():
-            x += dx
-            y += dy
-            
-            if x < 0 or x >= GRID_WIDTH or y >= GRID_HEIGHT:
-                piece.rotation = old_rotation
-                return False
-            
-            if y >= 0 and self.grid[y][x] is not None:
-                piece.rotation = old_rotation
-                return False
-        
-        piece.rotation = old_rotation
-        return True
+        return piece_fits(self.grid, piece.states[rotation], piece.x + dx, piece.y + dy)
+    
+    @property
+    def game_time(self):
+        return self.scheduler.now
     
     def place_piece(self, piece):
+        self.piece_counts[piece.shape] = self.piece_counts.get(piece.shape, 0) + 1
         for x, y in piece.get_cells():
             if y >= 0:
                 self.grid[y][x] = piece.color
                 if piece.is_corrupted: # Mark corrupted Cells
                     self.corrupted_grid[y][x] = True
+        self.board_version += 1
+        if self.listeners:
+            self.emit('lock', piece.shape, piece.is_corrupted, piece.get_cells(), self.score)
+        if self.difficulty:
+            self.difficulty.on_lock(piece.get_cells(), piece.is_corrupted)
 
-        lines_to_clear = []
-        for y in range(GRID_HEIGHT):
-            if all(cell is not None for cell in self.grid[y]):
-                lines_to_clear.append(y)
+        # Only rows the piece landed in can have filled up
+        lines_to_clear = sorted(y for y in {y for _, y in piece.get_cells() if y >= 0}
+                                if None not in self.grid[y])
         
-        # Add line clear animation
+        # Cleared on the next update()
         if lines_to_clear:
-            self.line_clear_animation = lines_to_clear[:]
-            self.pending_line_clears = lines_to_clear[:]
-            self.line_clear_timer = 0 
+            self.pending_line_clears = lines_to_clear
             # Add particles for line clear effect
-            for y in lines_to_clear:
-                for x in range(GRID_WIDTH):
-                    px = GRID_X_OFFSET + x * CELL_SIZE + CELL_SIZE // 2 + self.grid_shake_x
-                    py = GRID_Y_OFFSET + y * CELL_SIZE + CELL_SIZE // 2 + self.grid_shake_y
-                    self.particles.append(ParticleEffect(px, py, self.grid[y][x], 1.5))
+            half = self.rules.cell_size // 2
+            for y in lines_to_clear if not self.headless else ():
+                for x in range(self.rules.width):
+                    px, py = self.rules.cell_position(x, y)
+                    self.fx.append(('burst', px + half, py + half, self.grid[y][x], 1.5))
 
     def move_piece(self, dx, dy):
         if self.is_valid_position(self.current_piece, dx, dy):
             self.current_piece.x += dx
             self.current_piece.y += dy
+            if dy > 0:
+                self.lock_timer = 0
+            else:
+                self.reset_lock_delay()
+            if self.listeners:
+                self.emit('move', self.current_piece.get_cells())
             return True
         return False
     
-    def rotate_piece(self):
-        rotations = len(TETROMINOES[self.current_piece.shape])
-        new_rotation = (self.current_piece.rotation + 1) % rotations
-        
-        if self.is_valid_position(self.current_piece, 0, 0, new_rotation):
-            self.current_piece.rotation = new_rotation
-            return True
+    def reset_lock_delay(self):
+        # Moving or rotating on the ground buys more time, a limited number of times
+        if self.lock_timer > 0 and self.lock_resets < self.rules.max_lock_resets:
+            self.lock_timer = 0
+            self.lock_resets += 1
+    
+    def set_soft_drop(self, active):
+        if active and not self.soft_dropping:
+            # First row drops right away like it used to
+            if self.move_piece(0, 1):
+                self.score += self.rules.soft_drop_score
+            self.fall_time = 0
+        self.soft_dropping = active
+    
+    def rotate_piece(self, direction=1):
+        """Rotate clockwise (1) or counter-clockwise (-1), trying each kick offset in order"""
+        piece = self.current_piece
+        new_rotation = (piece.rotation + direction) % len(piece.states)
+        cells = piece.states[new_rotation]
+        
+        for dx, dy in self.kicks[piece.shape].get((piece.rotation, new_rotation), ((0, 0),)):
+            if piece_fits(self.grid, cells, piece.x + dx, piece.y + dy):
+                piece.rotation = new_rotation
+                piece.x += dx
+                piece.y += dy
+                self.reset_lock_delay()
+                if self.listeners:
+                    self.emit('rotate', piece.get_cells())
+                return True
         return False
     
     def add_garbage_lines(self, count=1):
         """Boss attack: add garbage lines from bottom"""
+        rules = self.rules
         for _ in range(count):
             # Remove top line
             self.grid.pop(0)
             self.corrupted_grid.pop(0)
             
             # Add garbage line at bottom
-            garbage_line = [CORRUPTION_COLOR if random.random() < 0.8 else None for _ in range(GRID_WIDTH)]
+            garbage_line = [CORRUPTION_COLOR if self.rng.random() < rules.garbage_fill else None for _ in range(rules.width)]
             # Ensure there's at least one gap
-            gap_pos = random.randint(0, GRID_WIDTH - 1)
-            garbage_line[gap_pos] = None
+            if rules.garbage_gaps == 1:
+                garbage_line[self.rng.randint(0, rules.width - 1)] = None
+            else:
+                for gap_pos in self.rng.sample(range(rules.width), rules.garbage_gaps):
+                    garbage_line[gap_pos] = None
             
             self.grid.append(garbage_line)
             self.corrupted_grid.append([cell is not None for cell in garbage_line])
+        self.board_version += 1
+        # Rows filled by the last lock moved up with everything else
+        if self.pending_line_clears:
+            self.pending_line_clears = [y - count for y in self.pending_line_clears if y >= count]
+        
+        if self.listeners or self.difficulty:
+            masks = [sum(1 << x for x, cell in enumerate(row) if cell is not None) for row in self.grid[-count:]]
+            self.emit('garbage', masks)
+            if self.difficulty:
+                self.difficulty.on_garbage(masks)
+        if not self.headless:
+            self.fx.append(('garbage', count))
         
         # Add particles for garbage lines
-        for x in range(GRID_WIDTH):
+        for x in range(rules.width if not self.headless else 0):
             if self.grid[-1][x] is not None:
-                px = GRID_X_OFFSET + x * CELL_SIZE + CELL_SIZE // 2
-                py = GRID_Y_OFFSET + (GRID_HEIGHT - 1) * CELL_SIZE + CELL_SIZE // 2
-                self.particles.append(ParticleEffect(px, py, CORRUPTION_COLOR, 0.5))
+                px, py = rules.cell_position(x, rules.total_height - 1)
+                px += rules.cell_size // 2
+                py += rules.cell_size // 2
+                self.fx.append(('burst', px, py, CORRUPTION_COLOR, 0.5))
+    
+    def start_effect(self, effect, params):
+        """Start (or refresh) a timed boss effect"""
+        if effect in self.effects:
+            self.scheduler.cancel(self.effects[effect][0])
+        self.effects[effect] = (self.scheduler.schedule(params['duration'], 'effect_end', effect), params)
+        self.update_fall_speed()
+    
+    def has_effect(self, effect):
+        return effect in self.effects
+    
+    def update_fall_speed(self):
+        # Only changes when an effect starts/ends or the level changes
+        current_fall_speed = int(self.base_fall_speed * self.gravity_scale)
+        for _, params in self.effects.values():
+            if 'fall_speed_divisor' in params:
+                current_fall_speed //= params['fall_speed_divisor']
+        self.fall_speed = current_fall_speed
+    
+    def effect_garbage_lines(self, effect, params):
+        self.add_garbage_lines(max(1, self.rng.randint(params['min_lines'], params['max_lines']) + self.garbage_bonus))
+    
+    def effect_grid_shake(self, effect, params):
+        if not self.headless:
+            self.fx.append(('shake', params['intensity']))
+        self.start_effect(effect, params)
+    
+    def effect_piece_theft(self, effect, params):
+        # Steal next piece and give a bad one (random)
+        self.queue.replace(0, *self.random_piece())
+    
+    def effect_timed(self, effect, params):
+        # speed_boost, time_pressure and piece_corruption just need to be active for a while
+        self.start_effect(effect, params)
+    
+    # Effect name -> handler, one for every effect in boss_config.EFFECTS
+    EFFECT_HANDLERS = {
+        'garbage_lines': effect_garbage_lines,
+        'speed_boost': effect_timed,
+        'time_pressure': effect_timed,
+        'piece_corruption': effect_timed,
+        'grid_shake': effect_grid_shake,
+        'piece_theft': effect_piece_theft,
+    }
     
     def execute_boss_attack(self, attack):
         """Execute a boss attack"""
-        if attack == 'garbage_lines':
-            self.add_garbage_lines(random.randint(1, 2))
-            
-        elif attack == 'speed_boost':
-            self.speed_boost_timer = 5000  # 5 seconds of fast fall
-            
-        elif attack == 'piece_corruption':
-            if 'piece_corruption' not in self.boss_attacks_active:
-                self.boss_attacks_active.append('piece_corruption')
-            
-        elif attack == 'grid_shake':
-            self.boss.shake_intensity = 3
-            self.boss.shake_timer = 2000
-            
-        elif attack == 'piece_theft':
-            # Steal next piece and give a bad one (random)
-            self.next_piece = self.get_new_piece()
-            
-        elif attack == 'time_pressure':
-            self.time_pressure_timer = 10000  # 10 seconds of extreme speed
+        spec = self.boss.attacks[attack]
+        self.EFFECT_HANDLERS[spec['effect']](self, spec['effect'], spec['params'])
     
-    def update(self, dt):
-        self.animation_time += dt
-        
-        # Update boss
-        if self.boss_mode and self.boss and not self.game_won:
-            self.boss.update(dt)
-            
-            # Execute boss attacks
-            if self.boss.should_attack():
+    def handle_event(self, event, data):
+        """Called by the scheduler when a timed event comes due"""
+        if event == 'boss_attack':
+            if self.boss and not self.game_won:
                 attack = self.boss.execute_attack()
+                self.attack_history.append((self.scheduler.now, attack, self.boss.phase))
+                self.emit('boss_attack', attack)
                 self.execute_boss_attack(attack)
         
-        # Update boss attack timers
-        if self.speed_boost_timer > 0:
-            self.speed_boost_timer -= dt
-        
-        if self.time_pressure_timer > 0:
-            self.time_pressure_timer -= dt
-        else:
-            # Remove piece corruption when time pressure ends
-            if 'piece_corruption' in self.boss_attacks_active:
-                self.boss_attacks_active.remove('piece_corruption')
-        
-        # Update grid shake
-        if self.boss and self.boss.shake_timer > 0:
-            shake_amount = int(self.boss.shake_intensity)
-            self.grid_shake_x = random.randint(-shake_amount, shake_amount)
-            self.grid_shake_y = random.randint(-shake_amount, shake_amount)
-        else:
-            self.grid_shake_x = 0
-            self.grid_shake_y = 0
-        
-        # Calculate current fall speed with boss effects
-        current_fall_speed = self.base_fall_speed
-        if self.speed_boost_timer > 0:
-            current_fall_speed //= 2
-        if self.time_pressure_timer > 0:
-            current_fall_speed //= 4
+        elif event == 'boss_stun_end':
+            self.boss.end_stun()
         
-        self.fall_speed = current_fall_speed
-
-        # Update particles
-        for particle_effect in self.particles[:]:
-            particle_effect.update()
-            if not particle_effect.particles:
-                self.particles.remove(particle_effect)
-        """"""
-        # Update line clear timer
-        if self.line_clear_animation:
-            self.line_clear_timer += dt
-        # Clear line clear animation
-        if self.line_clear_animation and self.animation_time > 300:
-            if self.pending_line_clears:
-                # Clear lines (clear from bottom to top to avoid index shifting issues)
-                clear_effect = pygame.mixer.Sound('sfx/dropop.wav')
-                clear_effect.play()
-                lines_cleared = len(self.pending_line_clears)
-                for y in sorted(self.pending_line_clears, reverse=True):
-                    del self.grid[y]
-                    del self.corrupted_grid[y]
-                for _ in range(lines_cleared):
-                    self.grid.insert(0, [None for _ in range(GRID_WIDTH)])
-                    self.corrupted_grid.insert(0, [False for _ in range(GRID_WIDTH)])
+        elif event == 'effect_end':
+            del self.effects[data]
+            self.update_fall_speed()
+    
+    def time_until_next_event(self):
+        """Milliseconds until gravity or the scheduler next has something to do.
+        Headless simulations can update() by this much instead of ticking every frame."""
+        if self.pending_line_clears:
+            return 0
+        wait = max(0, self.current_fall_interval() - self.fall_time)
+        if self.lock_timer > 0 or not self.is_valid_position(self.current_piece, 0, 1):
+            wait = min(wait, max(0, self.lock_delay - self.lock_timer))
+        next_time = self.scheduler.next_event_time()
+        if next_time is not None:
+            wait = min(wait, max(0, next_time - self.scheduler.now))
+        return wait
+    
+    def perform(self, action):
+        """Apply a player action (one of ACTIONS)"""
+        if self.recording is not None:
+            self.recording.extend((0, action))
+        if self.puzzle_done:
+            return
+        if action == 1:
+            self.move_piece(-1, 0)
+        elif action == 2:
+            self.move_piece(1, 0)
+        elif action == 3:
+            self.rotate_piece()
+        elif action == 4:
+            self.rotate_piece(-1)
+        elif action == 5:
+            self.hard_drop()
+        elif action == 6:
+            self.hold_piece()
+        elif action == 7:
+            self.set_soft_drop(True)
+        elif action == 8:
+            self.set_soft_drop(False)
+    
+    def snapshot(self, game_over=False):
+        """Immutable copy of everything the renderer draws. The board is only
+        copied again after it changes, and the ghost after the piece moves."""
+        if self.board_snapshot is None or self.board_snapshot[0] != self.board_version:
+            self.board_snapshot = (self.board_version, tuple(map(tuple, self.grid)),
+                                   tuple(map(tuple, self.corrupted_grid)))
+        
+        piece = self.current_piece
+        key = (piece, piece.x, piece.y, piece.rotation, self.board_version)
+        if self.ghost_snapshot[0] != key:
+            drop = 0
+            while self.is_valid_position(piece, 0, drop + 1):
+                drop += 1
+            # Only shown while the piece is above where it would land
+            ghost = tuple((x, y + drop) for x, y in piece.get_cells()) if drop else ()
+            self.ghost_snapshot = (key, ghost)
+        
+        if self.fx:
+            fx, self.fx = self.fx, []
+            self.fx_history = (self.fx_history + tuple((next(FX_NUMBERS), event) for event in fx))[-FX_HISTORY:]
+        # The last puzzle piece is already part of the board
+        active = not self.puzzle_done
+        return GameSnapshot(
+            rules=self.rules,
+            rotation_system=self.rotation_system,
+            time=self.scheduler.now,
+            grid=self.board_snapshot[1],
+            corrupted_grid=self.board_snapshot[2],
+            piece_cells=tuple(piece.get_cells()) if active else (),
+            piece_color=piece.color,
+            piece_shadow_color=piece.shadow_color,
+            piece_corrupted=piece.is_corrupted,
+            ghost_cells=self.ghost_snapshot[1] if active else (),
+            preview=tuple(self.queue.peek(i) for i in range(self.queue.size)),
+            hold_shape=self.hold_shape,
+            hold_corrupted=self.hold_corrupted,
+            score=self.score,
+            level=self.level,
+            lines_cleared=self.lines_cleared,
+            boss_mode=self.boss_mode,
+            boss=self.boss.view() if self.boss else None,
+            effects=frozenset(self.effects),
+            game_won=self.game_won,
+            game_over=game_over,
+            fx=self.fx_history,
+            board_version=self.board_version,
+            puzzle=self.puzzle,
+            puzzle_index=self.puzzle_index,
+        )
+    
+    def start_recording(self):
+        # Flat array of (dt, action) pairs: update(dt) is (dt, 0), an action is (0, action)
+        self.recording = array('H')
+    
+    def current_fall_interval(self):
+        if self.soft_dropping:
+            return max(1, self.fall_speed // self.soft_drop_factor)
+        return self.fall_speed
+    
+    def update(self, dt):
+        if self.recording is not None:
+            if dt > 65535:
+                # Keep each recorded step within 16 bits
+                return self.update(65535) and self.update(dt - 65535)
+            # Record the exact step sizes (whole ms), gravity and lock timing depend on them
+            dt = int(dt)
+            self.recording.extend((dt, 0))
+        if self.topped_out:
+            return False
+        
+        # Boss attacks, stuns and effect timers
+        self.scheduler.advance(dt, self.handle_event)
+        
+        # Lines filled by the last lock are cleared on the next update; the flash
+        # is a renderer effect with its own timer and doesn't hold the game up
+        if self.pending_line_clears:
+            # Clear lines (clear from bottom to top to avoid index shifting issues)
+            if not self.headless:
+                play_sound('sfx/dropop.wav')
+                self.fx.append(('line_clear', tuple(self.pending_line_clears)))
+            lines_cleared = len(self.pending_line_clears)
+            for y in sorted(self.pending_line_clears, reverse=True):
+                del self.grid[y]
+                del self.corrupted_grid[y]
+            for _ in range(lines_cleared):
+                self.grid.insert(0, [None] * self.rules.width)
+                self.corrupted_grid.insert(0, [False] * self.rules.width)
+            self.board_version += 1
+        
+            lines_cleared = len(self.pending_line_clears)
+            self.lines_cleared += lines_cleared
+            cleared_rows = self.pending_line_clears
             
-                lines_cleared = len(self.pending_line_clears)
-                self.lines_cleared += lines_cleared
-                
-                # Enhanced scoring
-                score_values = {0: 0, 1: 100, 2: 300, 3: 500, 4: 800}
-                line_score = score_values.get(lines_cleared, 0) * self.level
-                self.score += line_score
-                
-                # Boss damage
-                if self.boss_mode and self.boss and lines_cleared > 0:
-                    damage = lines_cleared * 5
-                    if lines_cleared == 4:  # Tetris
-                        damage = 25
-                    self.boss.take_damage(damage)
-                    
-                    # Check win condition
-                    if self.boss.health <= 0:
-                        self.game_won = True
+            # Scoring table comes from the ruleset
+            line_score = self.rules.line_score(lines_cleared) * self.level
+            self.score += line_score
+            
+            # Boss damage
+            if self.boss_mode and self.boss and lines_cleared > 0:
+                damage = self.boss.config['line_damage'][min(lines_cleared, 4)]
+                self.boss.take_damage(damage)
+                self.emit('boss_damage', damage, self.boss.health, self.boss.phase)
+                if not self.headless:
+                    self.fx.append(('boss_hit',))
                 
-                # Level progression
-                self.level = self.lines_cleared // 10 + 1
-                self.base_fall_speed = max(50, 500 - (self.level - 1) * 25)
-
-                self.pending_line_clears = []
+                # Check win condition
+                if self.boss.health <= 0:
+                    self.game_won = True
+                    self.boss_kill_time = self.scheduler.now
+            
+            # Level progression
+            self.level = self.lines_cleared // self.rules.lines_per_level + 1
+            self.base_fall_speed = self.rules.fall_speed(self.level)
+            self.update_fall_speed()
+            if self.difficulty:
+                self.difficulty.on_line_clear()
+            # Puzzle mode: an empty board solves the puzzle
+            if self.puzzle and not any(map(any, self.grid)):
+                self.game_won = True
+            self.emit('line_clear', cleared_rows, self.score, self.lines_cleared, self.level)
+            if self.game_won:
+                self.emit('game_over', True, self.score)
 
-            self.line_clear_animation = []
-            self.line_clear_timer = 0
+            self.pending_line_clears = []
         
+        if self.puzzle_done:
+            if not self.game_won:
+                # No pieces left and blocks still on the board
+                self.topped_out = True
+                self.emit('game_over', False, self.score)
+                return False
+            return True
+        
+        # Gravity, faster while soft dropping
+        resting = dt  # how much of this step the piece spent on the ground
         self.fall_time += dt
+        interval = self.current_fall_interval()
+        if self.fall_time >= interval:
+            if self.move_piece(0, 1):
+                # Landing partway through the step only starts the lock delay from there
+                resting = min(dt, self.fall_time - interval)
+                if self.soft_dropping:
+                    self.score += self.rules.soft_drop_score
+            self.fall_time = 0
         
-        if self.fall_time >= self.fall_speed:
-            if not self.move_piece(0, 1):
+        # Lock once the piece has been resting on something for lock_delay
+        if self.is_valid_position(self.current_piece, 0, 1):
+            self.lock_timer = 0
+        else:
+            self.lock_timer += resting
+            if self.lock_timer >= self.lock_delay:
                 self.place_piece(self.current_piece)
-                self.current_piece = self.next_piece
-                self.next_piece = self.get_new_piece()
                 
                 # Check game over
-                if not self.is_valid_position(self.current_piece):
+                if not self.spawn_next_piece():
                     return False
-            
-            self.fall_time = 0
+                self.fall_time = 0
         
         return True
     
     def hard_drop(self):
-        drop_effect = pygame.mixer.Sound('sfx/dblock.mp3')
-        drop_effect.play()
+        if not self.headless:
+            play_sound('sfx/dblock.mp3')
         drop_distance = 0
-        while self.move_piece(0, 1):
+        while self.is_valid_position(self.current_piece, 0, drop_distance + 1):
             drop_distance += 1
-            self.score += 2
+        self.current_piece.y += drop_distance
+        self.score += self.rules.hard_drop_score * drop_distance
+        
+        # fixed bug placed block moved yippeeeeeeee
+        self.place_piece(self.current_piece)
+        # Game over is reported by the next update()
+        self.topped_out = not self.spawn_next_piece()
+        self.fall_time = 0  # Reset fall timer
         
         # Add drop effect
-        if drop_distance > 0:
-            # fixed bug placed block moved yippeeeeeeee
-            self.place_piece(self.current_piece)
-            self.current_piece = self.next_piece
-            self.next_piece = self.get_new_piece()
-            self.fall_time = 0  # Reset fall timer
+        if drop_distance > 0 and not self.headless:
+            half = self.rules.cell_size // 2
             for x, y in self.current_piece.get_cells():
-                px = GRID_X_OFFSET + x * CELL_SIZE + CELL_SIZE // 2
-                py = GRID_Y_OFFSET + y * CELL_SIZE + CELL_SIZE // 2
-                self.particles.append(ParticleEffect(px, py, self.current_piece.color))
+                px, py = self.rules.cell_position(x, y)
+                self.fx.append(('burst', px + half, py + half, self.current_piece.color, 1.0))
+
+class GameSnapshot:
+    """One frame of game state published by the simulation thread. Never
+    modified after it's built, so the renderer can read it without locks."""
+    __slots__ = (
+        'rules', 'rotation_system', 'time', 'grid', 'corrupted_grid', 'piece_cells', 'piece_color', 'piece_shadow_color', 'piece_corrupted',
+        'ghost_cells', 'preview', 'hold_shape', 'hold_corrupted', 'score', 'level', 'lines_cleared',
+        'boss_mode', 'boss', 'effects', 'game_won', 'game_over', 'fx', 'board_version', 'puzzle', 'puzzle_index',
+    )
+    
+    def __init__(self, **fields):
+        for name, value in fields.items():
+            setattr(self, name, value)
+    
+    def has_effect(self, effect):
+        return effect in self.effects
+
+class SnapshotBuffer:
+    """Double buffer between the simulation and the renderer. The simulation
+    fills the back slot and flips the index; both steps are single reference
+    stores, atomic in CPython, so neither side ever takes a lock."""
+    def __init__(self, snapshot=None):
+        self.slots = [snapshot, snapshot]
+        self.front = 0
+    
+    def publish(self, snapshot):
+        back = 1 - self.front
+        self.slots[back] = snapshot
+        self.front = back
+    
+    def latest(self):
+        return self.slots[self.front]
+
+class Renderer:
+    """Draws game snapshots. Runs on the main thread (pygame's display and event
+    queue live there) and owns the particles and effects, which are purely visual."""
+    def __init__(self, screen, effects_scale=1.0, quality='auto'):
+        self.screen = screen
+        self.snap = None
+        self.effects_scale = effects_scale
+        self.effects = EffectsEngine(effects_scale)
+        self.quality = QualityManager(quality)
+        self.particles = []
+        self.particle_time = 0
+        self.flash_row = None
+        self.fx_seen = 0  # number of the last visual event started
+        self.overlay = None
+        self.shadow_colors = {}
+        # Puzzle hint from the solver worker: (puzzle index, board version, cells or None, status)
+        self.hint = None
+        # Per frame values, set in draw()
+        self.shake_x = self.shake_y = 0
+        self.corruption_color = CORRUPTION_COLOR
+        self.apply_quality()
+    
+    def apply_quality(self):
+        preset = self.quality.preset
+        self.gradients = preset['gradients']
+        self.particle_density = preset['particles']
+        self.flicker = preset['flicker']
+        self.effects.scale = self.effects_scale * preset['effects']
+    
+    def record_frame(self, ms):
+        """Feed the time a whole frame took to draw (including the flip) to the quality manager"""
+        if self.quality.frame(ms):
+            self.apply_quality()
+    
+    def handle_fx(self, snap):
+        """Start the effects for the visual events that are new since the last frame"""
+        fx = snap.fx
+        if not fx or fx[-1][0] <= self.fx_seen:
+            return  # nothing new, the usual case
+        start = len(fx)
+        while start and fx[start - 1][0] > self.fx_seen:
+            start -= 1
+        for _, event in fx[start:]:
+            self.start_fx(event)
+        self.fx_seen = fx[-1][0]
+    
+    def start_fx(self, event):
+        effects = self.effects
+        kind = event[0]
+        if kind == 'burst':
+            if effects.enabled and self.particle_density:
+                self.particles.append(ParticleEffect(*event[1:], self.particle_density))
+        elif kind == 'line_clear':
+            effects.line_clear(event[1])
+        elif kind == 'garbage':
+            effects.garbage_rise(event[1])
+        elif kind == 'shake':
+            effects.shake(event[1])
+        elif kind == 'boss_hit':
+            effects.boss_hit()
+    
+    def update_particles(self, dt):
+        # Step at the rate the particles were tuned for, whatever the frame rate
+        self.particle_time += dt
+        while self.particle_time >= PARTICLE_STEP:
+            self.particle_time -= PARTICLE_STEP
+            for particle_effect in self.particles[:]:
+                particle_effect.update()
+                if not particle_effect.particles:
+                    self.particles.remove(particle_effect)
     
     def draw_rounded_rect(self, screen, color, rect, radius=4):
         """Draw a rounded rectangle"""
         pygame.draw.rect(screen, color, rect, border_radius=radius)
     
-    def draw_cell_with_gradient(self, screen, x, y, color, shadow_color, highlight=False, corrupted=False):
-        adjusted_x = x + self.grid_shake_x // 2
-        adjusted_y = y + self.grid_shake_y // 2
-        
+    def draw_cell_with_gradient(self, screen, x, y, color, shadow_color, highlight=False, corrupted=False, offset_y=0):
         """Draw a cell with gradient effect"""
-        rect = pygame.Rect(
-            GRID_X_OFFSET + adjusted_x * CELL_SIZE + 1,
-            GRID_Y_OFFSET + adjusted_y * CELL_SIZE + 1,
-            CELL_SIZE - 2,
-            CELL_SIZE - 2
-        )
+        rules = self.snap.rules
+        px, py = rules.cell_position(x, y)
+        rect = pygame.Rect(px + 1 + self.shake_x, py + 1 + self.shake_y + offset_y, rules.cell_size - 2, rules.cell_size - 2)
+        
+        if not self.gradients:
+            # Low quality: one flat block, no rounded corners or layers
+            if corrupted:
+                color = self.corruption_color
+            elif highlight:
+                pulse = self.effects.pulse
+                color = tuple(min(255, int(c * pulse)) for c in color)
+            screen.fill(color, rect)
+            return
         
         # Corrupted blocks have special color
         if corrupted:
             # Flickering corruption effect
-            flicker = abs(math.sin(self.animation_time * 0.01)) * 0.5 + 0.5
-            corruption_color = tuple(int(c * flicker) for c in CORRUPTION_COLOR)
-            self.draw_rounded_rect(screen, corruption_color, rect, 3)
+            self.draw_rounded_rect(screen, self.corruption_color, rect, 3)
             
             # Corruption overlay
             overlay_rect = pygame.Rect(rect.x + 4, rect.y + 4, rect.width - 8, rect.height - 8)
@@ -644,7 +1389,7 @@ class TetrisGame:
         
             # Highlight effect
             if highlight:
-                pulse = abs(math.sin(self.animation_time * 0.01)) * 0.3 + 0.7
+                pulse = self.effects.pulse
                 highlight_color = tuple(min(255, max(0, int(c * pulse))) for c in color)
                 self.draw_rounded_rect(screen, highlight_color, rect, 3)
         
@@ -660,70 +1405,96 @@ class TetrisGame:
             self.draw_rounded_rect(screen, safe_shadow_color, shadow_rect, 2)
     
     def draw_grid(self, screen):
-        # Draw background
-        grid_bg_rect = pygame.Rect(
-            GRID_X_OFFSET - 5 + self.grid_shake_x, 
-            GRID_Y_OFFSET - 5 + self.grid_shake_y,
-            GRID_WIDTH * CELL_SIZE + 10, 
-            GRID_HEIGHT * CELL_SIZE + 10
-        )
+        snap = self.snap
+        rules = snap.rules
+        left = rules.grid_x + self.shake_x
+        top = rules.grid_y + self.shake_y
+        grid_bg_rect = pygame.Rect(left - 5, top - 5, rules.board_width + 10, rules.board_height + 10)
         self.draw_rounded_rect(screen, GRID_BG, grid_bg_rect, 8)
         
         # Draw grid lines
-        for x in range(GRID_WIDTH + 1):
-            start_pos = (GRID_X_OFFSET + x * CELL_SIZE + self.grid_shake_x, GRID_Y_OFFSET + self.grid_shake_y)
-            end_pos = (GRID_X_OFFSET + x * CELL_SIZE + self.grid_shake_x, GRID_Y_OFFSET + GRID_HEIGHT * CELL_SIZE + self.grid_shake_y)
-            pygame.draw.line(screen, GRID_LINE, start_pos, end_pos, 1)
-        
-        for y in range(GRID_HEIGHT + 1):
-            start_pos = (GRID_X_OFFSET + self.grid_shake_x, GRID_Y_OFFSET + y * CELL_SIZE + self.grid_shake_y)
-            end_pos = (GRID_X_OFFSET + GRID_WIDTH * CELL_SIZE + self.grid_shake_x, GRID_Y_OFFSET + y * CELL_SIZE + self.grid_shake_y)
-            pygame.draw.line(screen, GRID_LINE, start_pos, end_pos, 1)
-        
-        # Draw placed pieces
-        for y in range(GRID_HEIGHT):
-            for x in range(GRID_WIDTH):
-                if self.grid[y][x] is not None:
-                    # Check if this line is being cleared
-                    highlight = y in self.line_clear_animation
-                    shadow_color = tuple(max(0, c - 60) for c in self.grid[y][x])
-                    self.draw_cell_with_gradient(screen, x, y, self.grid[y][x], shadow_color, highlight, self.corrupted_grid[y][x])
-    
-    def draw_piece(self, screen, piece, ghost=False):
-        alpha = 0.3 if ghost else 1.0
-        
-        for x, y in piece.get_cells():
-            if y >= 0:
-                if ghost:
-                    # Draw ghost piece
-                    rect = pygame.Rect(
-                        GRID_X_OFFSET + x * CELL_SIZE + 1 + self.grid_shake_x,
-                        GRID_Y_OFFSET + y * CELL_SIZE + 1 + self.grid_shake_y,
-                        CELL_SIZE - 2,
-                        CELL_SIZE - 2
-                    )
-                    ghost_color = tuple(max(0, c // 3) for c in piece.color)
-                    pygame.draw.rect(screen, ghost_color, rect, 2, border_radius=3)
-                else:
-                    shadow_color = tuple(max(0, c - 60) for c in piece.color)
-                    self.draw_cell_with_gradient(screen, x, y, piece.color, piece.shadow_color, True, piece.is_corrupted)
+        for x in range(rules.width + 1):
+            line_x = left + x * rules.cell_size
+            pygame.draw.line(screen, GRID_LINE, (line_x, top), (line_x, top + rules.board_height), 1)
+        
+        for y in range(rules.height + 1):
+            line_y = top + y * rules.cell_size
+            pygame.draw.line(screen, GRID_LINE, (left, line_y), (left + rules.board_width, line_y), 1)
+        
+        # Draw placed pieces, skipping the hidden buffer rows. Rising garbage
+        # pushes the stack down and eases it back up, clipped to the board.
+        rise = int(self.effects.rise * rules.cell_size)
+        if rise:
+            screen.set_clip(pygame.Rect(left, top, rules.board_width, rules.board_height))
+        for y in range(rules.hidden, rules.total_height):
+            row = snap.grid[y]
+            for x in range(rules.width):
+                if row[x] is not None:
+                    shadow_color = self.shadow_color(row[x])
+                    self.draw_cell_with_gradient(screen, x, y, row[x], shadow_color, False, snap.corrupted_grid[y][x], rise)
+        if rise:
+            screen.set_clip(None)
+        
+        self.draw_line_flashes(screen, left, top)
+    
+    def shadow_color(self, color):
+        shadow = self.shadow_colors.get(color)
+        if shadow is None:
+            shadow = self.shadow_colors[color] = tuple(max(0, c - 60) for c in color)
+        return shadow
+    
+    def draw_overlay(self, screen, alpha=200):
+        """Darken the whole screen, the overlay Surface is made once per window size"""
+        size = screen.get_size()
+        if self.overlay is None or self.overlay.get_size() != size:
+            self.overlay = pygame.Surface(size)
+            self.overlay.fill((0, 0, 0))
+        self.overlay.set_alpha(alpha)
+        screen.blit(self.overlay, (0, 0))
+    
+    def draw_line_flashes(self, screen, left, top):
+        """Fade out a white bar over each row that was just cleared"""
+        rules = self.snap.rules
+        if self.flash_row is None or self.flash_row.get_width() != rules.board_width:
+            self.flash_row = pygame.Surface((rules.board_width, rules.cell_size))
+            self.flash_row.fill((255, 255, 255))
+        for rows, alpha in self.effects.line_flashes:
+            self.flash_row.set_alpha(int(200 * alpha))
+            for y in rows:
+                if y >= rules.hidden:
+                    screen.blit(self.flash_row, (left, top + (y - rules.hidden) * rules.cell_size))
+    
+    def draw_piece(self, screen):
+        snap = self.snap
+        for x, y in snap.piece_cells:
+            if y >= snap.rules.hidden:
+                self.draw_cell_with_gradient(screen, x, y, snap.piece_color, snap.piece_shadow_color, True, snap.piece_corrupted)
     
     def draw_ghost_piece(self, screen):
-        if not self.current_piece:
-            return
         """Draw the ghost piece showing where the current piece will land"""
-        ghost_piece = Tetromino(self.current_piece.shape, self.current_piece.color)
-        ghost_piece.x = self.current_piece.x
-        ghost_piece.y = self.current_piece.y
-        ghost_piece.rotation = self.current_piece.rotation
-        
-        # Move ghost piece down until it can't move anymore
-        while self.is_valid_position(ghost_piece, 0, 1):
-            ghost_piece.y += 1
-        
-        # Only draw if ghost is below current piece
-        if ghost_piece.y > self.current_piece.y:
-            self.draw_piece(screen, ghost_piece, ghost=True)
+        snap = self.snap
+        rules = snap.rules
+        ghost_color = tuple(max(0, c // 3) for c in snap.piece_color)
+        for x, y in snap.ghost_cells:
+            if y >= rules.hidden:
+                px, py = rules.cell_position(x, y)
+                rect = pygame.Rect(px + 1 + self.shake_x, py + 1 + self.shake_y,
+                                   rules.cell_size - 2, rules.cell_size - 2)
+                pygame.draw.rect(screen, ghost_color, rect, 2, border_radius=3)
+    
+    def draw_hint(self, screen):
+        """Outline where the solver would put the current puzzle piece"""
+        snap = self.snap
+        hint = self.hint
+        if not hint or hint[:2] != (snap.puzzle_index, snap.board_version) or not hint[2]:
+            return
+        rules = snap.rules
+        for x, y in hint[2]:
+            if y >= rules.hidden:
+                px, py = rules.cell_position(x, y)
+                rect = pygame.Rect(px + 3 + self.shake_x, py + 3 + self.shake_y,
+                                   rules.cell_size - 6, rules.cell_size - 6)
+                pygame.draw.rect(screen, SUCCESS, rect, 3, border_radius=3)
     
     def draw_ui_panel(self, screen, x, y, width, height, title):
         """Draw a styled UI panel"""
@@ -732,150 +1503,157 @@ class TetrisGame:
         pygame.draw.rect(screen, UI_BORDER, panel_rect, 2, border_radius=8)
         
         if title:
-            font = pygame.font.Font(None, 24)
+            font = get_font(24)
             title_text = font.render(title, True, TEXT_PRIMARY)
             screen.blit(title_text, (x + 10, y + 8))
         
         return panel_rect
     
+    def blit_piece_sprite(self, screen, shape, corrupted, cell_size, center):
+        if shape is None:
+            return  # past the end of a puzzle's sequence
+        color = CORRUPTION_COLOR if corrupted else TETROMINO_COLORS[shape]
+        sprite = get_piece_sprite(shape, cell_size, color, self.snap.rotation_system)
+        if corrupted:
+            # Flickering corruption effect, steady on low quality
+            sprite.set_alpha(int(255 * self.effects.flicker) if self.flicker else None)
+        screen.blit(sprite, sprite.get_rect(center=center))
+    
     def draw_next_piece(self, screen):
-        ui_x = GRID_X_OFFSET + GRID_WIDTH * CELL_SIZE + 20
-        ui_y = GRID_Y_OFFSET
+        snap = self.snap
+        ui_x = snap.rules.ui_x
+        ui_y = snap.rules.grid_y
         
         panel = self.draw_ui_panel(screen, ui_x, ui_y, 150, 125, "Next")
         
         # Draw next piece
-        if self.next_piece:
-            shape = self.next_piece.get_rotated_shape()
-            piece_width = len(shape[0])
-            piece_height = len(shape)
-
-            start_x = ui_x + 5 + (150 - piece_width * 20) // 2
-            start_y = ui_y + 20 + (80 - piece_height * 20) // 2
-            
-            for i, row in enumerate(shape):
-                for j, cell in enumerate(row):
-                    if cell == '#':
-                        mini_rect = pygame.Rect(
-                            start_x + j * 20,
-                            start_y + i * 20,
-                            18,
-                            18
-                        )
-                        color = self.next_piece.color
-                        if self.next_piece.is_corrupted:
-                            # Flickering corruption effect
-                            flicker = abs(math.sin(self.animation_time * 0.01)) * 0.5 + 0.5
-                            color = tuple(int(c * flicker) for c in CORRUPTION_COLOR)
-                        
-                        self.draw_rounded_rect(screen, color, mini_rect, 3)
+        shape, corrupted = snap.preview[0]
+        self.blit_piece_sprite(screen, shape, corrupted, 20, (ui_x + 75, ui_y + 72))
+        
+        # Hold slot and the rest of the preview queue in a column to the right
+        column_x = ui_x + 160
+        self.draw_ui_panel(screen, column_x, ui_y, 90, 80, "Hold")
+        if snap.hold_shape is not None:
+            self.blit_piece_sprite(screen, snap.hold_shape, snap.hold_corrupted, 12, (column_x + 45, ui_y + 50))
+        
+        if len(snap.preview) > 1:
+            queue_y = ui_y + 90
+            self.draw_ui_panel(screen, column_x, queue_y, 90, 30 + 55 * (len(snap.preview) - 1), "Queue")
+            for i in range(1, len(snap.preview)):
+                shape, corrupted = snap.preview[i]
+                self.blit_piece_sprite(screen, shape, corrupted, 12, (column_x + 45, queue_y + 2 + 55 * i))
     
     def draw_score_panel(self, screen):
-        ui_x = GRID_X_OFFSET + GRID_WIDTH * CELL_SIZE + 20
-        ui_y = GRID_Y_OFFSET + 140
+        snap = self.snap
+        ui_x = snap.rules.ui_x
+        ui_y = snap.rules.grid_y + 140
         
         panel_rect = self.draw_ui_panel(screen, ui_x, ui_y, 150, 200, "STATS")
         
-        font = pygame.font.Font(None, 20)
+        font = get_font(20)
         y_offset = ui_y + 35
         
         # Score
-        score_text = font.render(f"Score: {self.score:,}", True, TEXT_PRIMARY)
+        score_text = font.render(f"Score: {snap.score:,}", True, TEXT_PRIMARY)
         screen.blit(score_text, (ui_x + 10, y_offset))
         y_offset += 25
         
         # Level
-        level_text = font.render(f"Level: {self.level}", True, TEXT_PRIMARY)
+        level_text = font.render(f"Level: {snap.level}", True, TEXT_PRIMARY)
         screen.blit(level_text, (ui_x + 10, y_offset))
         y_offset += 25
         
         # Lines
-        lines_text = font.render(f"Lines: {self.lines_cleared}", True, TEXT_PRIMARY)
+        lines_text = font.render(f"Lines: {snap.lines_cleared}", True, TEXT_PRIMARY)
         screen.blit(lines_text, (ui_x + 10, y_offset))
         y_offset += 35
         
         # Boss mode indicators
-        if self.boss_mode:
+        if snap.boss_mode:
             # Active effects
-            if self.speed_boost_timer > 0:
+            if snap.has_effect('speed_boost'):
                 effect_text = font.render("SPEED BOOST!", True, WARNING)
                 screen.blit(effect_text, (ui_x + 10, y_offset))
                 y_offset += 20
             
-            if self.time_pressure_timer > 0:
+            if snap.has_effect('time_pressure'):
                 effect_text = font.render("TIME PRESSURE!", True, DANGER)
                 screen.blit(effect_text, (ui_x + 10, y_offset))
                 y_offset += 20
             
-            if 'piece_corruption' in self.boss_attacks_active:
+            if snap.has_effect('piece_corruption'):
                 effect_text = font.render("CORRUPTION!", True, CORRUPTION_COLOR)
                 screen.blit(effect_text, (ui_x + 10, y_offset))
                 y_offset += 20
             
-            if self.boss and self.boss.is_stunned:
+            if snap.boss and snap.boss.is_stunned:
                 effect_text = font.render("BOSS STUNNED", True, SUCCESS)
                 screen.blit(effect_text, (ui_x + 10, y_offset))
                 y_offset += 20
 
     def draw_boss_panel(self, screen):
-        if not self.boss_mode or not self.boss:
+        snap = self.snap
+        if not snap.boss_mode or not snap.boss:
             return
         
-        ui_x = GRID_X_OFFSET + GRID_WIDTH * CELL_SIZE + 20
-        ui_y = GRID_Y_OFFSET + 400
+        ui_x = snap.rules.ui_x
+        ui_y = snap.rules.grid_y + 400
         
         # Boss health and info
-        self.boss.draw(screen, ui_x, ui_y, 200, 20)
+        snap.boss.draw(screen, ui_x, ui_y, 200, 20, self.effects)
         
         # Attack warning
-        if self.boss.attack_timer > self.boss.attack_cooldown * 0.8 and not self.boss.is_stunned:
+        if snap.boss.attack_incoming:
             warning_y = ui_y + 70
-            font = pygame.font.Font(None, 24)
+            font = get_font(24)
             warning_text = font.render("INCOMING ATTACK!", True, DANGER)
             # Blinking effect
-            if int(self.animation_time / 100) % 2:
+            if self.effects.blink:
                 screen.blit(warning_text, (ui_x, warning_y))
     
     def draw_victory_screen(self, screen):
-        if not self.game_won:
+        snap = self.snap
+        if not snap.game_won:
             return
         
         # Victory overlay
-        overlay = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT))
-        overlay.set_alpha(200)
-        overlay.fill((0, 0, 0))
-        screen.blit(overlay, (0, 0))
+        window_width, window_height = snap.rules.window_width, snap.rules.window_height
+        self.draw_overlay(screen)
         
         # Victory text
-        font_large = pygame.font.Font(None, 72)
-        font_medium = pygame.font.Font(None, 36)
+        font_large = get_font(72)
+        font_medium = get_font(36)
         
-        victory_text = font_large.render("VICTORY!", True, SUCCESS)
-        victory_rect = victory_text.get_rect(center=(WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2 - 50))
+        victory_text = font_large.render("SOLVED!" if snap.puzzle else "VICTORY!", True, SUCCESS)
+        victory_rect = victory_text.get_rect(center=(window_width // 2, window_height // 2 - 50))
         screen.blit(victory_text, victory_rect)
         
-        score_text = font_medium.render(f"Final Score: {self.score:,}", True, TEXT_PRIMARY)
-        score_rect = score_text.get_rect(center=(WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2 + 20))
+        score_text = font_medium.render(f"Final Score: {snap.score:,}", True, TEXT_PRIMARY)
+        score_rect = score_text.get_rect(center=(window_width // 2, window_height // 2 + 20))
         screen.blit(score_text, score_rect)
         
-        restart_text = font_medium.render("Press R to restart or ESC to quit", True, TEXT_SECONDARY)
-        restart_rect = restart_text.get_rect(center=(WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2 + 60))
+        prompt = "R to retry, N for the next puzzle" if snap.puzzle else "Press R to restart or ESC to quit"
+        restart_text = font_medium.render(prompt, True, TEXT_SECONDARY)
+        restart_rect = restart_text.get_rect(center=(window_width // 2, window_height // 2 + 60))
         screen.blit(restart_text, restart_rect)
     
     def draw_controls(self, screen):
-        ui_x = GRID_X_OFFSET + GRID_WIDTH * CELL_SIZE + 20
-        ui_y = GRID_Y_OFFSET + 355
+        snap = self.snap
+        ui_x = snap.rules.ui_x
+        ui_y = snap.rules.grid_y + 355
         
-        panel = self.draw_ui_panel(screen, ui_x, ui_y, 150, 200, "Controls")
+        panel = self.draw_ui_panel(screen, ui_x, ui_y, 150, 220, "Controls")
         
-        font = pygame.font.Font(None, 16)
+        font = get_font(16)
         
         controls = [
             "Arrow Key Also Works",
             "A/D Move",
             "S Soft Drop",
             "W Rotate",
+            "Q Rotate Left",
             "\"Space Bar\" Hard Drop",
+            "C Hold",
             "",
             "R Restart",
             "ESC Quit"
@@ -887,24 +1665,68 @@ class TetrisGame:
                 text = font.render(control, True, color)
                 screen.blit(text, (ui_x + 10, ui_y + 30 + i * 18))
 
-    def draw(self, screen):
+    def draw_puzzle_panel(self, screen):
+        snap = self.snap
+        ui_x = snap.rules.ui_x
+        ui_y = snap.rules.grid_y + 355
+        self.draw_ui_panel(screen, ui_x, ui_y, 150, 220, "Puzzle")
+        
+        pieces = len(snap.puzzle.pieces)
+        hint = self.hint
+        status = ""
+        if hint and hint[:2] == (snap.puzzle_index, snap.board_version):
+            status = {'searching': "Thinking...", 'found': "Hint shown", 'none': "No solution now",
+                      'gave up': "Too hard to tell"}[hint[3]]
+        lines = [
+            (snap.puzzle.name, TEXT_PRIMARY),
+            (f"Piece {min(snap.puzzle_index + 1, pieces)} of {pieces}", TEXT_PRIMARY),
+            ("Clear every block", TEXT_SECONDARY),
+            ("", None),
+            (status, ACCENT),
+            ("", None),
+            ("H Hint", TEXT_SECONDARY),
+            ("R Retry", TEXT_SECONDARY),
+            ("N Next Puzzle", TEXT_SECONDARY),
+        ]
+        font = get_font(18)
+        for i, (line, color) in enumerate(lines):
+            if line:
+                screen.blit(font.render(line, True, color), (ui_x + 10, ui_y + 35 + i * 19))
+    
+    def draw(self, snap, dt):
+        """Draw one frame from a snapshot, dt being the time since the last frame"""
+        self.snap = snap
+        screen = self.screen
+        effects = self.effects
+        effects.begin_frame(dt)
+        self.handle_fx(snap)
+        self.update_particles(dt)
+        
+        # Shared per frame values, so cells don't each redo them
+        self.shake_x = effects.shake_x
+        self.shake_y = effects.shake_y
+        flicker = effects.flicker if self.flicker else 1.0
+        self.corruption_color = tuple(int(c * flicker) for c in CORRUPTION_COLOR)
+        
         # Clear screen
         screen.fill(BACKGROUND)
         
         # Draw grid and pieces
         self.draw_grid(screen)
         self.draw_ghost_piece(screen)
-        
-        if self.current_piece:
-            self.draw_piece(screen, self.current_piece)
+        if snap.puzzle:
+            self.draw_hint(screen)
+        self.draw_piece(screen)
         
         # Draw UI
         self.draw_next_piece(screen)
         self.draw_score_panel(screen)
-        if not self.boss_mode:
+        if snap.puzzle:
+            self.draw_puzzle_panel(screen)
+        elif not snap.boss_mode:
             self.draw_controls(screen)
         
-        if self.boss_mode:
+        if snap.boss_mode:
             self.draw_boss_panel(screen)
         
         # Draw particles
@@ -914,20 +1736,184 @@ class TetrisGame:
         # Draw victory screen
         self.draw_victory_screen(screen)
 
-def main():
+# Keys -> game actions
+KEY_ACTIONS = {
+    pygame.K_LEFT: 'left', pygame.K_a: 'left',
+    pygame.K_RIGHT: 'right', pygame.K_d: 'right',
+    pygame.K_DOWN: 'soft_drop', pygame.K_s: 'soft_drop',
+    pygame.K_UP: 'rotate_cw', pygame.K_w: 'rotate_cw',
+    pygame.K_q: 'rotate_ccw', pygame.K_z: 'rotate_ccw',
+    pygame.K_SPACE: 'hard_drop',
+    pygame.K_c: 'hold', pygame.K_LSHIFT: 'hold',
+}
+
+class InputHandler:
+    """Timestamped queue of key presses/releases, applied inside the simulation
+    step at their own times, with delayed auto shift and auto repeat"""
+    def __init__(self, das=HANDLING['das'], arr=HANDLING['arr']):
+        self.das = das
+        self.arr = arr
+        self.events = deque()  # (time, action, pressed)
+        self.reset(0)
+    
+    def reset(self, now):
+        self.events.clear()
+        self.time = now  # how far the game has been simulated
+        self.held = {'left': False, 'right': False}
+        self.direction = 0  # horizontal direction being auto shifted
+        self.repeat_at = None  # next auto shift move
+        self.slide = False  # 0 ms ARR: keep the piece against the wall
+    
+    def push(self, time, action, pressed):
+        self.events.append((time, action, pressed))
+    
+    def step(self, game, until):
+        """Simulate the game up to `until`, returns False on game over"""
+        while True:
+            next_time = until
+            kind = None
+            if self.events and self.events[0][0] <= next_time:
+                next_time = self.events[0][0]
+                kind = 'input'
+            if self.repeat_at is not None and self.repeat_at <= next_time:
+                next_time = self.repeat_at
+                kind = 'repeat'
+            
+            if next_time > self.time:
+                alive = game.update(next_time - self.time)
+                self.time = next_time
+                if not alive:
+                    return False
+            if self.slide:
+                # Actions are recorded, so only try moves that will succeed
+                action = ACTIONS['left' if self.direction < 0 else 'right']
+                while game.is_valid_position(game.current_piece, self.direction, 0):
+                    game.perform(action)
+            if kind is None or game.game_won:
+                return True
+            
+            if kind == 'input':
+                _, action, pressed = self.events.popleft()
+                self.apply(game, action, pressed)
+            else:
+                self.auto_shift(game)
+    
+    def start_shift(self, direction):
+        self.direction = direction
+        self.repeat_at = self.time + self.das if direction else None
+        self.slide = False
+    
+    def auto_shift(self, game):
+        if self.arr == 0:
+            self.repeat_at = None
+            self.slide = True
+        else:
+            game.perform(ACTIONS['left' if self.direction < 0 else 'right'])
+            self.repeat_at += self.arr
+    
+    def apply(self, game, action, pressed):
+        if action in self.held:
+            direction = -1 if action == 'left' else 1
+            self.held[action] = pressed
+            if pressed:
+                game.perform(ACTIONS[action])
+                self.start_shift(direction)
+            elif self.direction == direction:
+                # Fall back to the other direction if it's still held
+                other = 'right' if action == 'left' else 'left'
+                self.start_shift(-direction if self.held[other] else 0)
+        
+        elif action == 'soft_drop':
+            game.perform(ACTIONS['soft_drop_on' if pressed else 'soft_drop_off'])
+        
+        elif pressed:
+            game.perform(ACTIONS[action])
+
+# Simulation steps per second. Inputs carry their own timestamps, so this only
+# bounds how long a key press can wait to be applied, not the game's timing.
+SIMULATION_RATE = 240
+# Search budget for one puzzle hint, a few seconds of the solver process at most
+HINT_NODES = 50000
+
+class SimulationThread(threading.Thread):
+    """Runs the game at a fixed rate, apart from rendering and audio, and
+    publishes a snapshot after every step"""
+    def __init__(self, game, inputs, buffer, on_finish=None, rate=SIMULATION_RATE):
+        super().__init__(name='simulation', daemon=True)
+        self.game = game
+        self.inputs = inputs
+        self.buffer = buffer
+        self.on_finish = on_finish
+        self.interval = 1.0 / rate
+        self.calls = deque()  # (function, args) queued by other threads
+        self.finished = False
+        self.running = True
+        buffer.publish(game.snapshot())
+    
+    def call(self, function, *args):
+        """Run function(*args) on the simulation thread before its next step"""
+        self.calls.append((function, args))
+    
+    def set_game(self, game, now):
+        self.game = game
+        self.inputs.reset(now)
+        self.finished = False
+        self.buffer.publish(game.snapshot())
+    
+    def step(self):
+        game = self.game
+        alive = self.inputs.step(game, pygame.time.get_ticks())
+        self.finished = not alive or game.game_won
+        self.buffer.publish(game.snapshot(game_over=not alive))
+        if self.finished and self.on_finish:
+            self.on_finish(game)
+    
+    def run(self):
+        next_step = time.perf_counter()
+        while self.running:
+            while self.calls:
+                function, args = self.calls.popleft()
+                function(*args)
+            if not self.finished:
+                self.step()
+            next_step += self.interval
+            delay = next_step - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                # Running late: don't burst to catch up, the next step covers the whole gap
+                next_step = time.perf_counter()
+    
+    def stop(self):
+        self.running = False
+        self.join()
+
+def main(stream_file=None, broadcast_port=None, replay_file=None, difficulty_log=None, ruleset=DEFAULT_RULESET,
+         effects_scale=1.0, quality='auto', boss_mode=None, seed=None, rotation_system='classic', audio=True,
+         puzzle=None, memory_log=None, memory_interval=60, broadcast_host=broadcast.DEFAULT_HOST, handling=None):
+    """Play in a window. boss_mode None shows the menu, True/False go straight into that mode,
+    and a puzzle key straight into that puzzle. handling overrides HANDLING's das, arr
+    and soft_drop_factor."""
+    handling = dict(HANDLING, **(handling or {}))
+    init_pygame(audio)
+    rules = get_ruleset(ruleset)
+    WINDOW_WIDTH, WINDOW_HEIGHT = rules.window_width, rules.window_height
     screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
     pygame.display.set_caption("Tetrizz")
     clock = pygame.time.Clock()
-    pygame.mixer.music.load('music/menutet.mp3')
-    pygame.mixer.music.play(-1)
-    pygame.mixer.music.set_volume(0.4)
+    preload_sounds()
     
     # Show mode selection
     font = pygame.font.Font(None, 48)
     title_font = pygame.font.Font(None, 72)
     
-    mode_selected = False
-    boss_mode = False
+    if puzzle is not None:
+        boss_mode = False
+    mode_selected = boss_mode is not None
+    if mode_selected:
+        play_music('music/TETrizzz.mp3' if boss_mode else 'music/tetrizz.mp3')
+    else:
+        play_music('music/menutet.mp3', 0.4)
     
     while not mode_selected:
         screen.fill(BACKGROUND)
@@ -946,8 +1932,24 @@ def main():
         boss_rect = boss_text.get_rect(center=(WINDOW_WIDTH // 2, 300))
         screen.blit(boss_text, boss_rect)
         
-        instruction_text = font.render("Press 1 or 2 to select mode", True, TEXT_SECONDARY)
-        instruction_rect = instruction_text.get_rect(center=(WINDOW_WIDTH // 2, 400))
+        puzzle_text = font.render("3 - Puzzle Mode", True, SUCCESS)
+        puzzle_rect = puzzle_text.get_rect(center=(WINDOW_WIDTH // 2, 350))
+        screen.blit(puzzle_text, puzzle_rect)
+        
+        rotation_text = font.render(f"R - Rotation: {rotation_system.upper()}", True, TEXT_SECONDARY)
+        rotation_rect = rotation_text.get_rect(center=(WINDOW_WIDTH // 2, 400))
+        screen.blit(rotation_text, rotation_rect)
+        
+        rules_text = font.render(f"V - Rules: {rules.name.upper()}", True, TEXT_SECONDARY)
+        rules_rect = rules_text.get_rect(center=(WINDOW_WIDTH // 2, 450))
+        screen.blit(rules_text, rules_rect)
+        
+        quality_text = font.render(f"Q - Quality: {quality.upper()}", True, TEXT_SECONDARY)
+        quality_rect = quality_text.get_rect(center=(WINDOW_WIDTH // 2, 500))
+        screen.blit(quality_text, quality_rect)
+        
+        instruction_text = font.render("Press 1, 2 or 3 to select mode", True, TEXT_SECONDARY)
+        instruction_rect = instruction_text.get_rect(center=(WINDOW_WIDTH // 2, 550))
         screen.blit(instruction_text, instruction_rect)
         
         pygame.display.flip()
@@ -958,28 +1960,144 @@ def main():
                 sys.exit()
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_1:
-                    pygame.mixer.music.load('music/tetrizz.mp3')
-                    pygame.mixer.music.play(-1)
-                    pygame.mixer.music.set_volume(0.5)
+                    play_music('music/tetrizz.mp3')
                     boss_mode = False
                     mode_selected = True
                 elif event.key == pygame.K_2:
-                    pygame.mixer.music.load('music/TETrizzz.mp3')
-                    pygame.mixer.music.play(-1)
-                    pygame.mixer.music.set_volume(0.5)
+                    play_music('music/TETrizzz.mp3')
                     boss_mode = True
                     mode_selected = True
+                elif event.key == pygame.K_3:
+                    play_music('music/tetrizz.mp3')
+                    boss_mode = False
+                    puzzle = next(iter(PUZZLES))
+                    mode_selected = True
+                elif event.key == pygame.K_r:
+                    rotation_system = 'srs' if rotation_system == 'classic' else 'classic'
+                elif event.key == pygame.K_v:
+                    keys = list(RULES)
+                    rules = RULES[keys[(keys.index(rules.key) + 1) % len(keys)]]
+                elif event.key == pygame.K_q:
+                    quality = QUALITY_MODES[(QUALITY_MODES.index(quality) + 1) % len(QUALITY_MODES)]
                 elif event.key == pygame.K_ESCAPE:
                     pygame.quit()
                     sys.exit()
     
-    # Initialize game
-    game = TetrisGame(boss_mode)
+    # Variants can have a different board size
+    if puzzle is not None:
+        rules = get_ruleset(PUZZLES[puzzle].ruleset)
+    if (rules.window_width, rules.window_height) != (WINDOW_WIDTH, WINDOW_HEIGHT):
+        WINDOW_WIDTH, WINDOW_HEIGHT = rules.window_width, rules.window_height
+        screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
+    
+    # Game history, written in the background (variants get their own leaderboards)
+    mode = 'boss' if boss_mode else 'classic'
+    if rules.key != DEFAULT_RULESET:
+        mode += '/' + rules.key
+    if puzzle is not None:
+        mode = 'puzzle/' + puzzle
+    stats = StatsStore()
+    best = stats.top_scores(mode, 1)
+    high_score = best[0][0] if best else 0
+    
+    # Optional replay archive (needs numpy)
+    archive = None
+    if replay_file:
+        from replay_archive import ReplayArchive
+        archive = ReplayArchive(replay_file, writable=True)
+    # Finished games are written out here instead of on the simulation thread
+    saver = BackgroundWorker('saver')
+    
+    # Puzzle hints are searched for in a solver process, so the search never
+    # competes with the game for the GIL; the hints thread just waits on it.
+    # One solver per puzzle keeps its tables across hints and retries, so once
+    # a line of play has been solved every later hint along it is instant.
+    hints = BackgroundWorker('hints')
+    solver = SolverProcess()
+    
+    def find_hint(snap, show=True):
+        spec = snap.puzzle
+        move, complete, cells = solver.hint(spec.key, snap.rules, ROTATION_SYSTEMS[snap.rotation_system], spec.pieces,
+                                            HINT_NODES, Solver.board_from_grid(snap.grid), snap.puzzle_index)
+        if show:
+            status = 'found' if move else 'none' if complete else 'gave up'
+            renderer.hint = (snap.puzzle_index, snap.board_version, cells, status)
+    
+    def new_game():
+        if puzzle is not None:
+            # Played with the rotation system the puzzle was checked with
+            game = TetrisGame(rotation_system=PUZZLES[puzzle].rotation, seed=seed, puzzle=puzzle,
+                              soft_drop_factor=handling['soft_drop_factor'])
+            # Start solving right away, so the first hint is usually ready when it's asked for
+            hints.submit(find_hint, game.snapshot(), False)
+        else:
+            game = TetrisGame(boss_mode, rotation_system=rotation_system, ruleset=rules.key, seed=seed,
+                              soft_drop_factor=handling['soft_drop_factor'])
+        if archive:
+            game.start_recording()
+        return game
+    
+    def finish(game):
+        # Called once per game on the simulation thread, the game isn't touched after this
+        nonlocal high_score
+        on_saved = None
+        if difficulty_log and game.difficulty:
+            # The log rows carry the game's stats id, known once the stats writer has saved it
+            on_saved = lambda game_id: saver.submit(game.difficulty.write_log, difficulty_log, game_id)
+        stats.record_game(game, 'puzzle/' + game.puzzle.key if game.puzzle else mode, on_saved)
+        high_score = max(high_score, game.score)
+        if archive:
+            saver.submit(archive.append_game, game)
+    
+    def start_game():
+        game = new_game()
+        for feed in feeds:
+            feed.attach(game)
+        sim.set_game(game, pygame.time.get_ticks())
+    
+    def restart():
+        if not sim.finished:
+            return  # R pressed twice
+        start_game()
+    
+    def change_puzzle(step):
+        # Retry (0) or move on (1), whether or not this one is finished
+        nonlocal puzzle
+        keys = [key for key, spec in PUZZLES.items() if spec.ruleset == rules.key]
+        puzzle = keys[(keys.index(puzzle) + step) % len(keys)]
+        start_game()
+    
+    game = new_game()
+    
+    # Optional spectator feeds
+    feeds = []
+    if stream_file:
+        feeds.append(broadcast.FileSink(stream_file, game))
+    if broadcast_port is not None:
+        feeds.append(broadcast.BroadcastServer(game, broadcast_host, broadcast_port))
+    
+    # The game runs on its own thread and hands frames over through the snapshot buffer
+    inputs = InputHandler(handling['das'], handling['arr'])
+    inputs.reset(pygame.time.get_ticks())
+    buffer = SnapshotBuffer()
+    sim = SimulationThread(game, inputs, buffer, finish)
+    sim.start()
+    renderer = Renderer(screen, effects_scale, quality)
+    
+    # Opt-in memory diagnostics (diagnostics.py). Sampling takes a few ms on this
+    # thread every memory_interval seconds; the rows are written by the saver.
+    monitor = None
+    if memory_log:
+        from diagnostics import MemoryMonitor, append_row
+        monitor = MemoryMonitor(memory_interval)
+        session_start = time.perf_counter()
+        monitor.start()
     running = True
-    game_over = False
     
     while running:
         dt = clock.tick(60)
+        snap = buffer.latest()
+        finished = snap.game_over or snap.game_won
         
         # Handle events
         for event in pygame.event.get():
@@ -990,64 +2108,82 @@ def main():
                 if event.key == pygame.K_ESCAPE:
                     running = False
                 
-                elif game_over or game.game_won:
+                elif snap.puzzle and event.key in (pygame.K_r, pygame.K_n):
+                    sim.call(change_puzzle, int(event.key == pygame.K_n))
+                
+                elif finished:
                     if event.key == pygame.K_r:
                         # Restart game
-                        game = TetrisGame(boss_mode)
-                        game_over = False
+                        sim.call(restart)
                 
-                else:  # Game is active
-                    if event.key == pygame.K_LEFT or event.key == pygame.K_a:
-                        game.move_piece(-1, 0)
-                    elif event.key == pygame.K_RIGHT or event.key == pygame.K_d:
-                        game.move_piece(1, 0)
-                    elif event.key == pygame.K_DOWN or event.key == pygame.K_s:
-                        if game.move_piece(0, 1):
-                            game.score += 1
-                    elif event.key == pygame.K_UP or event.key == pygame.K_w:
-                        game.rotate_piece()
-                    elif event.key == pygame.K_SPACE:
-                        game.hard_drop()
-        
-        # Update game
-        if not game_over and not game.game_won:
-            if not game.update(dt):
-                game_over = True
+                elif snap.puzzle and event.key == pygame.K_h:
+                    renderer.hint = (snap.puzzle_index, snap.board_version, None, 'searching')
+                    hints.submit(find_hint, snap)
+                
+                elif event.key in KEY_ACTIONS:  # Game is active
+                    # Applied by the simulation thread at the time they happened
+                    inputs.push(pygame.time.get_ticks(), KEY_ACTIONS[event.key], True)
+            
+            elif event.type == pygame.KEYUP and event.key in KEY_ACTIONS:
+                if not finished:
+                    inputs.push(pygame.time.get_ticks(), KEY_ACTIONS[event.key], False)
         
         # Draw everything
-        game.draw(screen)
+        frame_start = time.perf_counter()
+        renderer.draw(snap, dt)
         
         # Game over screen
-        if game_over and not game.game_won:
-            overlay = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT))
-            overlay.set_alpha(200)
-            overlay.fill((0, 0, 0))
-            screen.blit(overlay, (0, 0))
+        if snap.game_over and not snap.game_won:
+            renderer.draw_overlay(screen)
             
-            font_large = pygame.font.Font(None, 72)
-            font_medium = pygame.font.Font(None, 36)
+            font_large = get_font(72)
+            font_medium = get_font(36)
             
-            game_over_text = font_large.render("GAME OVER", True, DANGER)
+            game_over_text = font_large.render("OUT OF PIECES" if snap.puzzle else "GAME OVER", True, DANGER)
             game_over_rect = game_over_text.get_rect(center=(WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2 - 50))
             screen.blit(game_over_text, game_over_rect)
             
-            if boss_mode and game.boss and game.boss.health > 0:
-                boss_health_text = font_medium.render(f"Boss Health Remaining: {game.boss.health}/100", True, BOSS_COLOR)
+            if boss_mode and snap.boss and snap.boss.health > 0:
+                boss_health_text = font_medium.render(f"Boss Health Remaining: {snap.boss.health}/{snap.boss.max_health}", True, BOSS_COLOR)
                 boss_health_rect = boss_health_text.get_rect(center=(WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2))
                 screen.blit(boss_health_text, boss_health_rect)
             
-            score_text = font_medium.render(f"Final Score: {game.score:,}", True, TEXT_PRIMARY)
+            score_text = font_medium.render(f"Final Score: {snap.score:,}", True, TEXT_PRIMARY)
             score_rect = score_text.get_rect(center=(WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2 + 40))
             screen.blit(score_text, score_rect)
             
-            restart_text = font_medium.render("Press R to restart or ESC to quit", True, TEXT_SECONDARY)
-            restart_rect = restart_text.get_rect(center=(WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2 + 80))
+            high_score_text = font_medium.render(f"High Score: {high_score:,}", True, ACCENT)
+            high_score_rect = high_score_text.get_rect(center=(WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2 + 80))
+            screen.blit(high_score_text, high_score_rect)
+            
+            prompt = "R to retry, N for the next puzzle" if snap.puzzle else "Press R to restart or ESC to quit"
+            restart_text = font_medium.render(prompt, True, TEXT_SECONDARY)
+            restart_rect = restart_text.get_rect(center=(WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2 + 120))
             screen.blit(restart_text, restart_rect)
         
         pygame.display.flip()
+        renderer.record_frame((time.perf_counter() - frame_start) * 1000)
+        if monitor:
+            monitor.frame()
+            row = monitor.tick(time.perf_counter() - session_start)
+            if row:
+                saver.submit(append_row, memory_log, dict(row, mode=mode, quality=renderer.quality.name))
     
+    sim.stop()
+    # Not waiting on the hint thread, it's a daemon; stopping the solver ends its wait
+    solver.close()
+    # Stats first, saving a game can still hand the saver its difficulty log
+    stats.close()
+    saver.close()
+    for feed in feeds:
+        feed.close()
+    AUDIO.close()
     pygame.quit()
     sys.exit()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # The command line lives in launcher.py, which uses this file as the `main`
+    # module. Register it under that name first, or `import main` would run it again.
+    sys.modules['main'] = sys.modules[__name__]
+    from launcher import cli
+    sys.exit(cli())
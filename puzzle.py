@@ -0,0 +1,115 @@
+import os
+
+from ruleset import DEFAULT_RULESET, RULES
+
+# Puzzles: a starting board and a fixed piece sequence that has to clear it.
+#
+# They live in puzzles.txt, one block per puzzle, separated by blank lines:
+#
+#   [key]
+#   name: Display name
+#   pieces: ILJOTSZIL
+#   rotation: classic           (optional, the solver checks it with this system)
+#   ruleset: standard           (optional)
+#   ..........
+#   XX........
+#   XX........
+#
+# Board rows are drawn as they look on screen and sit on the floor, so only
+# the rows with something in them need to be written. '.' is empty, a piece
+# letter is a block of that piece's color and 'X' is corrupted garbage.
+# Lines starting with '#' are comments.
+
+PUZZLE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'puzzles.txt')
+PIECES = 'IOTSZJL'
+GARBAGE = 'X'
+ROTATIONS = ('classic', 'srs')
+
+class Puzzle:
+    def __init__(self, key, name, pieces, rows, rotation='classic', ruleset=DEFAULT_RULESET):
+        self.key = key
+        self.name = name or key
+        self.pieces = pieces
+        self.rows = rows
+        self.rotation = rotation
+        self.ruleset = ruleset
+        self.validate()
+
+    def validate(self):
+        def check(condition, message):
+            if not condition:
+                raise ValueError(f"puzzle '{self.key}': {message}")
+        check(self.pieces and all(shape in PIECES for shape in self.pieces), f"pieces must be letters from {PIECES}")
+        check(self.rotation in ROTATIONS, f"unknown rotation system '{self.rotation}'")
+        check(self.ruleset in RULES, f"unknown ruleset '{self.ruleset}'")
+        rules = RULES[self.ruleset]
+        check(self.rows, "no board rows")
+        check(len(self.rows) <= rules.height, f"more than {rules.height} rows")
+        for row in self.rows:
+            check(len(row) == rules.width, f"row '{row}' isn't {rules.width} cells wide")
+            check(all(cell == '.' or cell == GARBAGE or cell in PIECES for cell in row), f"unknown cell in row '{row}'")
+            check('.' in row, f"row '{row}' is already full")
+
+    def build_grid(self, rules, colors, garbage_color):
+        """(grid, corrupted_grid) like TetrisGame's, for the given ruleset and piece colors"""
+        empty = rules.total_height - len(self.rows)
+        grid = [[None] * rules.width for _ in range(empty)]
+        corrupted = [[False] * rules.width for _ in range(empty)]
+        for row in self.rows:
+            grid.append([None if cell == '.' else garbage_color if cell == GARBAGE else colors[cell] for cell in row])
+            corrupted.append([cell == GARBAGE for cell in row])
+        return grid, corrupted
+
+    @classmethod
+    def from_grid(cls, key, pieces, grid, corrupted_grid, colors, **options):
+        """Puzzle from a game board, so any position can be saved as a puzzle"""
+        shapes = {color: shape for shape, color in colors.items()}
+        rows = []
+        for row, corrupted in zip(grid, corrupted_grid):
+            if rows or any(cell is not None for cell in row):
+                rows.append(''.join('.' if cell is None else GARBAGE if bad else shapes.get(cell, GARBAGE)
+                                    for cell, bad in zip(row, corrupted)))
+        return cls(key, None, pieces, rows, **options)
+
+    def to_text(self):
+        lines = [f"[{self.key}]", f"name: {self.name}", f"pieces: {self.pieces}"]
+        if self.rotation != 'classic':
+            lines.append(f"rotation: {self.rotation}")
+        if self.ruleset != DEFAULT_RULESET:
+            lines.append(f"ruleset: {self.ruleset}")
+        return '\n'.join(lines + self.rows) + '\n'
+
+def parse_puzzles(text, where=PUZZLE_FILE):
+    puzzles = {}
+    for block in text.replace('\r', '').split('\n\n'):
+        lines = [line.strip() for line in block.split('\n')]
+        lines = [line for line in lines if line and not line.startswith('#')]
+        if not lines:
+            continue
+        if not (lines[0].startswith('[') and lines[0].endswith(']')):
+            raise ValueError(f"{where}: puzzle block must start with [key], got '{lines[0]}'")
+        key = lines[0][1:-1].strip()
+        if key in puzzles:
+            raise ValueError(f"{where}: duplicate puzzle '{key}'")
+        fields = {}
+        rows = []
+        for line in lines[1:]:
+            if ':' in line:
+                name, _, value = line.partition(':')
+                name = name.strip()
+                if name not in ('name', 'pieces', 'rotation', 'ruleset'):
+                    raise ValueError(f"{where}: puzzle '{key}' has unknown field '{name}'")
+                fields[name] = value.strip()
+            else:
+                rows.append(line)
+        if 'pieces' not in fields:
+            raise ValueError(f"{where}: puzzle '{key}' has no pieces")
+        puzzles[key] = Puzzle(key, fields.get('name'), fields['pieces'].upper(), rows,
+                              fields.get('rotation', 'classic'), fields.get('ruleset', DEFAULT_RULESET))
+    return puzzles
+
+def load_puzzles(path=PUZZLE_FILE):
+    with open(path, encoding='utf-8') as f:
+        return parse_puzzles(f.read(), path)
+
+PUZZLES = load_puzzles()
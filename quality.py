@@ -0,0 +1,90 @@
+from collections import deque
+
+# Render quality presets and the automatic quality manager.
+#
+# Each preset says how much of the expensive drawing the renderer does:
+#   gradients  per-cell highlight and shadow layers (off: one flat block per cell)
+#   particles  fraction of the particles a burst spawns (0: no particles)
+#   effects    EffectsEngine.scale, so shake distance and garbage travel (0: off)
+#   flicker    corruption flicker (off: corrupted cells are a steady color)
+#
+# In auto mode the manager watches how long each frame takes to draw and steps
+# one preset down when the average goes over budget, and one back up after a
+# long stretch with plenty of headroom. A preset that had to be left waits
+# twice as long before each retry, so a scene that sits right at the edge
+# doesn't flip between two presets.
+
+PRESETS = {
+    'high': {'gradients': True, 'particles': 1.0, 'effects': 1.0, 'flicker': True},
+    'medium': {'gradients': True, 'particles': 0.5, 'effects': 0.5, 'flicker': True},
+    'low': {'gradients': False, 'particles': 0.25, 'effects': 0.5, 'flicker': False},
+    'minimal': {'gradients': False, 'particles': 0.0, 'effects': 0.0, 'flicker': False},
+}
+LEVELS = ('high', 'medium', 'low', 'minimal')  # best first
+QUALITY_MODES = ('auto',) + LEVELS
+
+FRAME_BUDGET = 1000 / 60  # ms
+WINDOW = 30  # frames averaged per decision
+STEP_DOWN = 0.8  # of the budget, leaves room for event handling and the tick
+STEP_UP = 0.4
+UP_WINDOWS = 4  # good windows in a row before stepping back up
+MAX_UP_WINDOWS = 64  # about half a minute, the longest wait the backoff gets to
+
+class QualityManager:
+    def __init__(self, mode='auto', budget=FRAME_BUDGET):
+        self.budget = budget
+        self.frame_times = deque(maxlen=WINDOW)
+        self.good_windows = 0
+        self.up_windows = None  # per preset, good windows needed to step up to it
+        self.set_mode(mode)
+
+    @property
+    def name(self):
+        return LEVELS[self.level]
+
+    @property
+    def preset(self):
+        return PRESETS[LEVELS[self.level]]
+
+    @property
+    def mode(self):
+        return 'auto' if self.auto else self.name
+
+    def set_mode(self, mode):
+        if mode not in QUALITY_MODES:
+            raise ValueError(f"unknown quality '{mode}' (have {', '.join(QUALITY_MODES)})")
+        # Auto starts from the top and finds its own level
+        self.auto = mode == 'auto'
+        self.level = 0 if self.auto else LEVELS.index(mode)
+        self.frame_times.clear()
+        self.good_windows = 0
+        self.up_windows = [UP_WINDOWS] * len(LEVELS)
+
+    def frame(self, ms):
+        """Record how long a frame took to draw, returns True if the preset changed"""
+        if not self.auto:
+            return False
+        times = self.frame_times
+        times.append(ms)
+        if len(times) < WINDOW:
+            return False
+        average = sum(times) / WINDOW
+        times.clear()
+
+        if average > self.budget * STEP_DOWN:
+            self.good_windows = 0
+            if self.level < len(LEVELS) - 1:
+                self.up_windows[self.level] = min(self.up_windows[self.level] * 2, MAX_UP_WINDOWS)
+                return self.change(self.level + 1)
+        elif average < self.budget * STEP_UP:
+            self.good_windows += 1
+            if self.level > 0 and self.good_windows >= self.up_windows[self.level - 1]:
+                return self.change(self.level - 1)
+        else:
+            self.good_windows = 0
+        return False
+
+    def change(self, level):
+        self.level = level
+        self.good_windows = 0
+        return True
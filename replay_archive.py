@@ -0,0 +1,240 @@
+import json
+import mmap
+import os
+import struct
+import sys
+
+import numpy as np
+
+# Append-only archive of recorded games for analytics.
+#
+# name.tzr holds the games back to back:
+#   file header: b'TZRA', version (u32)
+#   per game:    GAME header, config JSON (padded to 4 bytes), records
+#   records:     (dt u16, action u16) pairs, exactly what TetrisGame.recording holds
+#
+# name.tzr.idx is a fixed-width index (one INDEX_DTYPE row per game) that is
+# memory-mapped as a NumPy structured array, so millions of games can be
+# filtered by score or outcome without reading the game data. It can always be
+# rebuilt from the .tzr file.
+
+MAGIC = b'TZRA'
+INDEX_MAGIC = b'TZRI'
+VERSION = 1
+FILE_HEADER = struct.Struct('<4sI')
+GAME = struct.Struct('<QQIIIbBHI')  # id, seed, score, lines, duration, outcome, mode, config length, records
+
+INDEX_DTYPE = np.dtype([
+    ('game_id', '<u8'),
+    ('offset', '<u8'),  # of the game header in the .tzr file
+    ('seed', '<u8'),
+    ('score', '<u4'),
+    ('lines', '<u4'),
+    ('duration', '<u4'),  # game time in ms
+    ('records', '<u4'),
+    ('outcome', 'i1'),  # -1 no boss, 0 boss survived, 1 boss defeated
+    ('mode', 'u1'),  # 0 classic, 1 boss
+    ('pad', 'V6'),
+])
+RECORD_DTYPE = np.dtype([('dt', '<u2'), ('action', '<u2')])
+
+NO_BOSS, BOSS_SURVIVED, BOSS_DEFEATED = -1, 0, 1
+
+class ReplayArchive:
+    def __init__(self, path, writable=False):
+        self.path = path
+        self.index_path = path + '.idx'
+        self.writable = writable
+        self.data = None
+        self.index_map = None
+
+        if writable and not os.path.exists(path):
+            with open(path, 'wb') as f:
+                f.write(FILE_HEADER.pack(MAGIC, VERSION))
+        with open(path, 'rb') as f:
+            magic, version = FILE_HEADER.unpack(f.read(FILE_HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a Tetrizz replay archive")
+
+        if not self.index_is_current():
+            self.rebuild_index()
+        self.next_id = int(self.index['game_id'].max()) + 1 if len(self.index) else 1
+
+    # --- index -----------------------------------------------------------
+
+    def index_is_current(self):
+        try:
+            with open(self.index_path, 'rb') as f:
+                magic, version = FILE_HEADER.unpack(f.read(FILE_HEADER.size))
+            size = os.path.getsize(self.index_path) - FILE_HEADER.size
+        except (OSError, struct.error):
+            return False
+        if magic != INDEX_MAGIC or version != VERSION or size % INDEX_DTYPE.itemsize:
+            return False
+        # The last indexed game must end exactly where the data file ends
+        count = size // INDEX_DTYPE.itemsize
+        if count == 0:
+            return os.path.getsize(self.path) == FILE_HEADER.size
+        last = np.fromfile(self.index_path, INDEX_DTYPE, count=1,
+                           offset=FILE_HEADER.size + (count - 1) * INDEX_DTYPE.itemsize)[0]
+        return int(last['offset']) + self.game_size(int(last['offset'])) == os.path.getsize(self.path)
+
+    def game_size(self, offset):
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            header = GAME.unpack(f.read(GAME.size))
+        return GAME.size + padded(header[7]) + header[8] * RECORD_DTYPE.itemsize
+
+    def rebuild_index(self):
+        """Scan the whole archive and rewrite the index (after a crash or a lost .idx file)"""
+        rows = []
+        size = os.path.getsize(self.path)
+        with open(self.path, 'rb') as f:
+            offset = FILE_HEADER.size
+            while offset + GAME.size <= size:
+                f.seek(offset)
+                header = GAME.unpack(f.read(GAME.size))
+                end = offset + GAME.size + padded(header[7]) + header[8] * RECORD_DTYPE.itemsize
+                if end > size:
+                    break  # Torn write at the end, ignore it
+                rows.append(index_row(header, offset))
+                offset = end
+        if offset != size and self.writable:
+            # Drop the incomplete game so appends continue from a clean end
+            with open(self.path, 'r+b') as f:
+                f.truncate(offset)
+        with open(self.index_path, 'wb') as f:
+            f.write(FILE_HEADER.pack(INDEX_MAGIC, VERSION))
+            np.array(rows, dtype=INDEX_DTYPE).tofile(f)
+        self.close_maps()
+
+    @property
+    def index(self):
+        """All games as a read-only structured array backed by the mmapped index file"""
+        if self.index_map is None:
+            count = (os.path.getsize(self.index_path) - FILE_HEADER.size) // INDEX_DTYPE.itemsize
+            if count == 0:
+                return np.zeros(0, INDEX_DTYPE)
+            self.index_map = np.memmap(self.index_path, INDEX_DTYPE, 'r', offset=FILE_HEADER.size, shape=(count,))
+        return self.index_map
+
+    def mapped_data(self):
+        if self.data is None:
+            with open(self.path, 'rb') as f:
+                self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self.data
+
+    def close_maps(self):
+        self.index_map = None
+        if self.data is not None:
+            self.data.close()
+            self.data = None
+
+    def close(self):
+        self.close_maps()
+
+    # --- writing ---------------------------------------------------------
+
+    def append(self, seed, config, records, score, lines, duration, outcome):
+        """Add a game, returns its id. records is a flat (dt, action) sequence."""
+        if not self.writable:
+            raise ValueError("archive was opened read-only")
+        game_id = self.next_id
+        self.next_id += 1
+        config_bytes = json.dumps(config, sort_keys=True).encode('utf-8')
+        records = np.asarray(records, dtype='<u2').view(RECORD_DTYPE)
+        header = (game_id, seed, score, lines, int(duration), outcome, int(bool(config.get('boss_mode'))),
+                  len(config_bytes), len(records))
+
+        with open(self.path, 'ab') as f:
+            offset = f.tell()
+            f.write(GAME.pack(*header))
+            f.write(config_bytes.ljust(padded(len(config_bytes)), b' '))
+            f.write(records.tobytes())
+        # Index row last, so a crash in between only leaves a game the next rebuild picks up
+        with open(self.index_path, 'ab') as f:
+            np.array([index_row(header, offset)], dtype=INDEX_DTYPE).tofile(f)
+        self.close_maps()
+        return game_id
+
+    def append_game(self, game):
+        """Add a finished TetrisGame that was recording"""
+        if game.boss is None:
+            outcome = NO_BOSS
+        else:
+            outcome = BOSS_DEFEATED if game.game_won else BOSS_SURVIVED
+        return self.append(game.seed, game.config, game.recording, game.score, game.lines_cleared,
+                           game.game_time, outcome)
+
+    # --- reading ---------------------------------------------------------
+
+    def row(self, game_id):
+        index = self.index
+        # Ids are increasing, so this is a binary search
+        i = int(np.searchsorted(index['game_id'], game_id))
+        if i >= len(index) or index['game_id'][i] != game_id:
+            raise KeyError(game_id)
+        return index[i]
+
+    def header(self, game_id):
+        offset = int(self.row(game_id)['offset'])
+        return offset, GAME.unpack_from(self.mapped_data(), offset)
+
+    def config(self, game_id):
+        offset, header = self.header(game_id)
+        start = offset + GAME.size
+        return json.loads(bytes(self.mapped_data()[start:start + header[7]]))
+
+    def records(self, game_id):
+        """Zero-copy (dt, action) view of a game's records"""
+        offset, header = self.header(game_id)
+        start = offset + GAME.size + padded(header[7])
+        return np.frombuffer(self.mapped_data(), RECORD_DTYPE, count=header[8], offset=start)
+
+    def games(self, min_score=None, outcome=None, mode=None):
+        """Index rows matching the filters, as a NumPy array"""
+        index = self.index
+        mask = np.ones(len(index), dtype=bool)
+        if min_score is not None:
+            mask &= index['score'] >= min_score
+        if outcome is not None:
+            mask &= index['outcome'] == outcome
+        if mode is not None:
+            mask &= index['mode'] == mode
+        return index[mask]
+
+    def replay(self, game_id, game_class=None):
+        """Re-simulate a game headless from its seed and records, returns the finished game"""
+        if game_class is None:
+            from main import TetrisGame as game_class
+        _, header = self.header(game_id)
+        game = game_class(seed=header[1], headless=True, **self.config(game_id))
+        records = self.records(game_id)
+        for dt, action in zip(records['dt'].tolist(), records['action'].tolist()):
+            if action:
+                game.perform(action)
+            elif not game.update(dt):
+                break
+        return game
+
+def padded(length):
+    return (length + 3) & ~3
+
+def index_row(header, offset):
+    game_id, seed, score, lines, duration, outcome, mode, _, records = header
+    return (game_id, offset, seed, score, lines, duration, records, outcome, mode, b'')
+
+if __name__ == '__main__':
+    # python replay_archive.py replays.tzr [GAME_ID]   summary, or re-simulate one game
+    archive = ReplayArchive(sys.argv[1])
+    if len(sys.argv) > 2:
+        game_id = int(sys.argv[2])
+        game = archive.replay(game_id)
+        row = archive.row(game_id)
+        print(f"game {game_id}: recorded score {row['score']}, replayed score {game.score}, lines {game.lines_cleared}")
+    else:
+        index = archive.index
+        print(f"{len(index)} games")
+        if len(index):
+            print(f"best score {index['score'].max()}, mean {index['score'].mean():.0f}, "
+                  f"boss kills {(index['outcome'] == BOSS_DEFEATED).sum()}")
@@ -0,0 +1,96 @@
+# Game variants. Everything that used to be a module constant or an inline
+# literal in the game loop (board size, scoring, gravity, lock and garbage
+# rules, window layout) lives on a Ruleset. All derived tables are built once
+# when the ruleset is created, so a 10x40 marathon or a 20x20 wide board costs
+# the game loop the same lookups as the standard 10x20.
+
+GRID_X_OFFSET = 60
+GRID_Y_OFFSET = 60
+UI_WIDTH = 350  # side panels right of the board
+
+def classic_gravity(level):
+    return max(50, 500 - (level - 1) * 25)
+
+def guideline_gravity(level):
+    # Tetris guideline curve, (0.8 - (level - 1) * 0.007) ^ (level - 1) seconds per row
+    return max(1, int(1000 * (0.8 - (level - 1) * 0.007) ** (level - 1)))
+
+GRAVITY_CURVES = {
+    'classic': classic_gravity,
+    'guideline': guideline_gravity,
+}
+
+RULESETS = {
+    'standard': {'name': 'Standard'},
+    # Guideline style: 20 visible rows with a 20 row buffer above them
+    'marathon': {'name': 'Marathon', 'hidden': 20, 'gravity': 'guideline', 'max_level': 20},
+    'wide': {'name': 'Wide', 'width': 20, 'height': 20, 'garbage_gaps': 2},
+}
+DEFAULT_RULESET = 'standard'
+
+class Ruleset:
+    def __init__(self, key, name=None, width=10, height=20, hidden=0, cell_size=32,
+                 line_scores=(0, 100, 300, 500, 800), soft_drop_score=1, hard_drop_score=2,
+                 gravity='classic', lines_per_level=10, max_level=30,
+                 lock_delay=500, max_lock_resets=15, garbage_fill=0.8, garbage_gaps=1):
+        if not 4 <= width <= 64 or not 4 <= height + hidden <= 64:
+            raise ValueError(f"ruleset '{key}': board must be between 4x4 and 64x64")
+        if gravity not in GRAVITY_CURVES:
+            raise ValueError(f"ruleset '{key}': unknown gravity curve '{gravity}'")
+        if not 1 <= garbage_gaps < width:
+            raise ValueError(f"ruleset '{key}': garbage_gaps must leave at least one filled cell")
+
+        self.key = key
+        self.name = name or key
+        # Board: rows 0..hidden-1 are a buffer above the visible playfield
+        self.width = width
+        self.height = height
+        self.hidden = hidden
+        self.total_height = height + hidden
+        self.spawn_x = width // 2 - 2
+        self.spawn_y = max(0, hidden - 2)
+
+        # Scoring, indexed by lines cleared at once (a piece clears at most 4)
+        self.line_scores = tuple(line_scores)
+        self.soft_drop_score = soft_drop_score
+        self.hard_drop_score = hard_drop_score
+
+        # Gravity: ms per row for every level, the last entry holds for higher levels
+        self.gravity = gravity
+        self.lines_per_level = lines_per_level
+        self.fall_speeds = tuple(GRAVITY_CURVES[gravity](level) for level in range(1, max_level + 1))
+
+        self.lock_delay = lock_delay
+        self.max_lock_resets = max_lock_resets
+        self.garbage_fill = garbage_fill
+        self.garbage_gaps = garbage_gaps
+
+        # Window layout
+        self.cell_size = cell_size
+        self.grid_x = GRID_X_OFFSET
+        self.grid_y = GRID_Y_OFFSET
+        self.board_width = width * cell_size
+        self.board_height = height * cell_size
+        self.ui_x = self.grid_x + self.board_width + 20
+        self.window_width = self.board_width + 2 * GRID_X_OFFSET + UI_WIDTH
+        # The side panels need about 20 rows worth of height
+        self.window_height = max(self.board_height, 640) + 2 * GRID_Y_OFFSET + 40
+
+    def line_score(self, lines):
+        return self.line_scores[min(lines, len(self.line_scores) - 1)]
+
+    def fall_speed(self, level):
+        return self.fall_speeds[min(level, len(self.fall_speeds)) - 1]
+
+    def cell_position(self, x, y):
+        """Top-left pixel of board cell (x, y), y counting the hidden rows"""
+        return self.grid_x + x * self.cell_size, self.grid_y + (y - self.hidden) * self.cell_size
+
+# Built once at import, games share them
+RULES = {key: Ruleset(key, **settings) for key, settings in RULESETS.items()}
+
+def get_ruleset(key=DEFAULT_RULESET):
+    try:
+        return RULES[key]
+    except KeyError:
+        raise ValueError(f"unknown ruleset '{key}' (have {', '.join(RULES)})") from None
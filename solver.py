@@ -0,0 +1,308 @@
+import multiprocessing
+
+from features import popcount
+
+# Exhaustive puzzle solver.
+#
+# The board is a single int, bit y * width + x set for a filled cell, so a
+# collision test is one shift and one AND and a board is its own hash key.
+# Placements come from a flood fill over (rotation, x, y) with the game's own
+# moves (shift, soft drop, rotate with kicks), so tucks and spins a player can
+# do are found too. Every spot the piece can rest on is a placement, listed
+# once per distinct set of cells. Everywhere above the stack is open air, so
+# the fill starts just above it instead of at the spawn row.
+#
+# The search is a depth-first walk over the fixed piece sequence with:
+#   - a transposition table of (board, piece index) states already known to fail,
+#     so the many orders that build the same board are only searched once
+#   - pruning: every row that still has a block has to be completed, so the
+#     empty cells in those rows must fit in the pieces left, and the board can
+#     only end up empty when the cells placed make a whole number of rows. For
+#     that number of rows, a column filled all the way up is a wall no piece can
+#     cross and no line clear removes, so the empty cells between two walls
+#     must come in fours.
+#   - placements that clear lines or keep the stack low are tried first
+# Solved states are remembered too, so hints after the first are instant.
+#
+# The search is pure Python and can run for seconds, so the game asks for
+# hints through a SolverProcess: the searching happens in another process and
+# never holds the GIL the simulation and the renderer run on.
+
+class SearchLimit(Exception):
+    pass
+
+class Solver:
+    def __init__(self, rules, rotation, sequence, max_nodes=200000):
+        """rules is a Ruleset, rotation a ROTATION_SYSTEMS entry and sequence the piece letters"""
+        self.width = rules.width
+        self.height = rules.total_height
+        self.spawn = (rules.spawn_x, rules.spawn_y)
+        self.sequence = tuple(sequence)
+        self.max_nodes = max_nodes
+        self.row_masks = [((1 << self.width) - 1) << (y * self.width) for y in range(self.height)]
+        self.kicks = rotation['kicks']
+        self.states = rotation['states']
+        # Per shape and rotation: (lowest x, highest x, lowest y, highest y, masks at y = 0 by x - lowest x)
+        self.shapes = {shape: [self.prepare(cells) for cells in states] for shape, states in self.states.items()}
+        self.column_masks = {}  # rows from the bottom -> mask of each column in those rows
+        self.failed = set()  # (board, index) with no solution
+        self.solved = {}  # (board, index) -> (placement, board after it)
+        self.nodes = 0
+        self.complete = True  # False if the last search hit max_nodes
+
+    def prepare(self, cells):
+        width = self.width
+        min_x = min(cx for cx, _ in cells)
+        max_x = max(cx for cx, _ in cells)
+        masks = []
+        for x in range(-min_x, width - max_x):
+            mask = 0
+            for cx, cy in cells:
+                mask |= 1 << (cy * width + x + cx)
+            masks.append(mask)
+        return -min_x, width - 1 - max_x, -min(cy for _, cy in cells), self.height - 1 - max(cy for _, cy in cells), masks
+
+    @staticmethod
+    def board_from_grid(grid):
+        """Bitboard of a TetrisGame.grid (or a puzzle grid)"""
+        width = len(grid[0])
+        board = 0
+        for y, row in enumerate(grid):
+            for x, cell in enumerate(row):
+                if cell is not None:
+                    board |= 1 << (y * width + x)
+        return board
+
+    def cells(self, shape, rotation, x, y):
+        return [(x + cx, y + cy) for cx, cy in self.states[shape][rotation]]
+
+    # --- placements ----------------------------------------------------------
+
+    def placements(self, board, shape, ceiling=0):
+        """[(mask, (rotation, x, y))] for every resting spot the piece can reach from
+        spawn, leaving out spots with cells above row `ceiling`"""
+        width = self.width
+        rotations = self.shapes[shape]
+        kicks = self.kicks[shape]
+        count = len(rotations)
+        tested = {}  # each state is only tested once
+
+        def mask_at(rotation, x, y):
+            state = (rotation, x, y)
+            mask = tested.get(state, 0)
+            if mask == 0:
+                low, high, top, bottom, masks = rotations[rotation]
+                if x < low or x > high or y < top or y > bottom:
+                    mask = None
+                else:
+                    mask = masks[x - low] << (y * width)
+                    if mask & board:
+                        mask = None
+                tested[state] = mask
+            return mask
+
+        start = (0,) + self.spawn
+        if mask_at(*start) is None:
+            return []
+        # Every state with the piece wholly above the stack can be reached by
+        # turning and shifting at the spawn row and dropping, so the fill starts
+        # from the lowest of those and skips anything higher
+        stack_top = ((board & -board).bit_length() - 1) // width if board else self.height
+        floors = [stack_top - self.height + bottom for _, _, _, bottom, _ in rotations]
+        if all(floor >= max(top, self.spawn[1]) for floor, (_, _, top, _, _) in zip(floors, rotations)):
+            stack = [(rotation, x, floors[rotation])
+                     for rotation, (low, high, _, _, _) in enumerate(rotations) for x in range(low, high + 1)]
+        else:
+            # Stack up near the spawn row: fill from spawn
+            floors = [-self.height] * count
+            stack = [start]
+        seen = set(stack)
+        landings = {}
+        above = (1 << (ceiling * width)) - 1
+        while stack:
+            rotation, x, y = state = stack.pop()
+            if y < floors[rotation]:
+                continue
+            moves = [(rotation, x - 1, y), (rotation, x + 1, y)]
+            if mask_at(rotation, x, y + 1) is None:
+                # Resting on something: locking here is a placement
+                mask = mask_at(rotation, x, y)
+                if mask not in landings and not mask & above:
+                    landings[mask] = state
+            else:
+                moves.append((rotation, x, y + 1))
+            for direction in (1, -1):
+                turned = (rotation + direction) % count
+                for dx, dy in kicks.get((rotation, turned), ((0, 0),)):
+                    if mask_at(turned, x + dx, y + dy) is not None:
+                        moves.append((turned, x + dx, y + dy))
+                        break
+            for move in moves:
+                if move not in seen and mask_at(*move) is not None:
+                    seen.add(move)
+                    stack.append(move)
+        return list(landings.items())
+
+    def lock(self, board, mask):
+        """Board after locking a piece mask, full rows cleared, and the number of rows cleared"""
+        board |= mask
+        width = self.width
+        lines = 0
+        # Top to bottom, so a clear never moves a row that is still to be checked
+        for y in range(((mask & -mask).bit_length() - 1) // width, (mask.bit_length() - 1) // width + 1):
+            row = self.row_masks[y]
+            if board & row == row:
+                below = board & ~((1 << ((y + 1) * width)) - 1)
+                above = board & ((1 << (y * width)) - 1)
+                board = below | (above << width)
+                lines += 1
+        return board, lines
+
+    # --- search ----------------------------------------------------------------
+
+    def target_rows(self, board, remaining):
+        """The most rows the pieces left could fill to clear the board, 0 if they can't"""
+        cells = popcount(board)
+        rows = sum(1 for row in self.row_masks if board & row)
+        needed = rows * self.width - cells  # empty cells in rows that still have to be cleared
+        # The board is empty only when everything placed so far adds up to whole rows
+        for pieces in range(remaining, (needed + 3) // 4 - 1, -1):
+            total = cells + 4 * pieces
+            if total % self.width == 0 and self.walls_allow(board, total // self.width):
+                return total // self.width
+        return 0
+
+    def walls_allow(self, board, rows):
+        """False if a stretch between two filled columns of the bottom `rows` rows
+        has a number of empty cells no set of pieces can fill"""
+        if board & ((1 << ((self.height - rows) * self.width)) - 1):
+            return False  # blocks above the rows being filled
+        columns = self.column_masks.get(rows)
+        if columns is None:
+            columns = self.column_masks[rows] = [
+                sum(1 << (y * self.width + x) for y in range(self.height - rows, self.height))
+                for x in range(self.width)]
+        empty = 0
+        for column in columns:
+            filled = popcount(board & column)
+            if filled == rows:
+                if empty % 4:
+                    return False
+                empty = 0
+            else:
+                empty += rows - filled
+        return empty % 4 == 0
+
+    def search(self, board, index):
+        if board == 0:
+            return True
+        key = (board, index)
+        if key in self.solved:
+            return True
+        if index >= len(self.sequence) or key in self.failed:
+            return False
+        rows = self.target_rows(board, len(self.sequence) - index)
+        if not rows:
+            return False  # cheap to find out again, not worth a table entry
+        if self.nodes >= self.max_nodes:
+            raise SearchLimit()
+        self.nodes += 1
+
+        children = []
+        for mask, placement in self.placements(board, self.sequence[index], self.height - rows):
+            after, lines = self.lock(board, mask)
+            # The lowest set bit is the top of the stack, the higher it is the lower the stack
+            top = (after & -after).bit_length() if after else self.width * self.height + 1
+            children.append((-lines, -top, after, placement))
+        # Clears first, then the lowest stacks
+        children.sort(key=lambda child: child[:2])
+        for _, _, after, placement in children:
+            if self.search(after, index + 1):
+                self.solved[key] = (placement, after)
+                return True
+        self.failed.add(key)
+        return False
+
+    def solve(self, board, index=0):
+        """Placements (shape, rotation, x, y) that clear the board using the pieces from
+        sequence[index] on, [] if it's already clear, or None when there is no solution
+        (or self.complete is False: the node limit was hit before one was found)"""
+        self.nodes = 0
+        self.complete = True
+        try:
+            found = self.search(board, index)
+        except SearchLimit:
+            self.complete = False
+            found = False
+        if not found:
+            return None
+        solution = []
+        while board:
+            placement, board = self.solved[(board, index)]
+            solution.append((self.sequence[index],) + placement)
+            index += 1
+        return solution
+
+    def hint(self, board, index):
+        """Where to put piece sequence[index] (shape, rotation, x, y), or None"""
+        solution = self.solve(board, index)
+        return solution[0] if solution else None
+
+def serve(connection):
+    """Solver process loop: answers hint requests, one solver per key so its
+    tables carry over from one hint to the next"""
+    solvers = {}
+    while True:
+        try:
+            request = connection.recv()
+        except EOFError:
+            return
+        if request is None:
+            return
+        key, rules, rotation, sequence, max_nodes, board, index = request
+        try:
+            solver = solvers.get(key)
+            if solver is None:
+                solver = solvers[key] = Solver(rules, rotation, sequence, max_nodes)
+            move = solver.hint(board, index)
+            connection.send((move, solver.complete, move and solver.cells(*move)))
+        except Exception as e:
+            connection.send(e)
+
+class SolverProcess:
+    """Searches for hints in a separate process. hint() blocks until the answer
+    is back, waiting on a pipe without holding the GIL, so call it from a
+    worker thread. Started on the first hint."""
+    def __init__(self):
+        self.connection = None
+        self.process = None
+
+    def start(self):
+        # Spawned, not forked: the game has threads (and SDL) running
+        context = multiprocessing.get_context('spawn')
+        self.connection, child = context.Pipe()
+        process = context.Process(target=serve, args=(child,), name='solver', daemon=True)
+        process.start()
+        child.close()
+        self.process = process
+
+    def hint(self, key, rules, rotation, sequence, max_nodes, board, index):
+        """(move, complete, cells of the move) for piece sequence[index] on board,
+        see Solver.hint. Searches for the same key share one Solver."""
+        if self.process is None:
+            self.start()
+        try:
+            self.connection.send((key, rules, rotation, sequence, max_nodes, board, index))
+            reply = self.connection.recv()
+        except (EOFError, OSError):
+            return None, False, None  # stopped by close() while searching
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+    def close(self):
+        """Stop the process, in the middle of a search if need be"""
+        if self.process is not None:
+            self.process.terminate()
+            self.process.join()
+            self.process = None
@@ -0,0 +1,190 @@
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+
+# Local history of finished games. Writes are queued and a background thread
+# flushes them to SQLite in batches, so the game loop never waits on the disk.
+# Game ids are handed out by SQLite when the row is written, so several
+# processes can share one database.
+
+STATS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tetrizz_stats.db')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    finished_at REAL NOT NULL,
+    mode TEXT NOT NULL,
+    duration_ms INTEGER NOT NULL,
+    score INTEGER NOT NULL,
+    lines INTEGER NOT NULL,
+    level INTEGER NOT NULL,
+    boss TEXT,
+    boss_defeated INTEGER NOT NULL DEFAULT 0,
+    boss_health INTEGER
+);
+CREATE INDEX IF NOT EXISTS games_by_score ON games (mode, score DESC);
+
+CREATE TABLE IF NOT EXISTS piece_counts (
+    game_id INTEGER NOT NULL REFERENCES games (id),
+    shape TEXT NOT NULL,
+    count INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS piece_counts_by_game ON piece_counts (game_id);
+
+CREATE TABLE IF NOT EXISTS boss_kills (
+    game_id INTEGER NOT NULL REFERENCES games (id),
+    boss TEXT NOT NULL,
+    kill_time_ms INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS boss_kills_by_time ON boss_kills (boss, kill_time_ms);
+
+CREATE TABLE IF NOT EXISTS boss_attacks (
+    game_id INTEGER NOT NULL REFERENCES games (id),
+    time_ms INTEGER NOT NULL,
+    attack TEXT NOT NULL,
+    phase INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS boss_attacks_by_game ON boss_attacks (game_id);
+"""
+
+INSERT_GAME = ("INSERT INTO games (finished_at, mode, duration_ms, score, lines, level, boss, boss_defeated, boss_health) "
+               "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)")
+# Rows that belong to a game, game_id goes first
+INSERTS = {
+    'piece_counts': "INSERT INTO piece_counts (game_id, shape, count) VALUES (?, ?, ?)",
+    'boss_kills': "INSERT INTO boss_kills (game_id, boss, kill_time_ms) VALUES (?, ?, ?)",
+    'boss_attacks': "INSERT INTO boss_attacks (game_id, time_ms, attack, phase) VALUES (?, ?, ?, ?)",
+}
+
+class StatsStore:
+    def __init__(self, path=STATS_FILE, flush_interval=2.0, batch_size=500):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.queue = queue.Queue()
+
+        # Schema setup happens once at startup, before the game starts
+        connection = self.connect()
+        with connection:
+            connection.executescript(SCHEMA)
+        connection.close()
+
+        self.writer = threading.Thread(target=self.write_loop, name='stats-writer', daemon=True)
+        self.writer.start()
+
+    def connect(self):
+        connection = sqlite3.connect(self.path, timeout=30)
+        # WAL lets leaderboard reads run while the writer thread is committing
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def record_game(self, game, mode, on_saved=None):
+        """Queue a finished game for writing. Its id is only known once it's
+        written: on_saved(game_id) is then called on the writer thread."""
+        boss = game.boss
+        row = (time.time(), mode, int(game.game_time), game.score, game.lines_cleared, game.level,
+               boss.config['key'] if boss else None, int(game.game_won), boss.health if boss else None)
+        # Child rows without their game_id, which is filled in by the writer
+        children = {table: [] for table in INSERTS}
+        for shape, count in game.piece_counts.items():
+            children['piece_counts'].append((shape, count))
+        if boss:
+            if game.game_won:
+                children['boss_kills'].append((boss.config['key'], int(game.boss_kill_time)))
+            for time_ms, attack, phase in game.attack_history:
+                children['boss_attacks'].append((int(time_ms), attack, phase))
+        self.queue.put((row, children, on_saved))
+
+    def write_games(self, connection, games):
+        """Write a batch in one transaction, returns [(on_saved, game_id)] for the games written"""
+        saved = []
+        try:
+            with connection:
+                for row, children, on_saved in games:
+                    game_id = connection.execute(INSERT_GAME, row).lastrowid
+                    for table, rows in children.items():
+                        if rows:
+                            connection.executemany(INSERTS[table], [(game_id,) + child for child in rows])
+                    saved.append((on_saved, game_id))
+        except sqlite3.Error as e:
+            # The transaction was rolled back; the writer carries on with the next batch
+            print(f"stats: dropped {len(games)} games: {e}", file=sys.stderr)
+            return []
+        return saved
+
+    def write_loop(self):
+        connection = self.connect()
+        pending = []  # queued games
+        pending_count = 0  # rows in them
+        last_flush = time.monotonic()
+        running = True
+
+        while running:
+            timeout = max(0.0, self.flush_interval - (time.monotonic() - last_flush))
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            try:
+                if item == 'close':
+                    running = False
+                elif item is not None and item != 'flush':
+                    pending.append(item)
+                    pending_count += 1 + sum(map(len, item[1].values()))
+
+                if item in ('close', 'flush') or pending_count >= self.batch_size or \
+                        time.monotonic() - last_flush >= self.flush_interval:
+                    if pending:
+                        saved = self.write_games(connection, pending)
+                        pending = []
+                        pending_count = 0
+                        for on_saved, game_id in saved:
+                            if on_saved:
+                                on_saved(game_id)
+                    last_flush = time.monotonic()
+            except Exception as e:
+                print(f"stats: {e}", file=sys.stderr)
+            finally:
+                # flush() must never hang on a failed write
+                if item is not None:
+                    self.queue.task_done()
+
+        connection.close()
+
+    def flush(self):
+        """Block until everything queued so far is on disk (for shutdown or tests, not the game loop)"""
+        self.queue.put('flush')
+        self.queue.join()
+
+    def close(self):
+        self.queue.put('close')
+        self.writer.join()
+
+    def query(self, sql, params=()):
+        connection = self.connect()
+        try:
+            return connection.execute(sql, params).fetchall()
+        finally:
+            connection.close()
+
+    def top_scores(self, mode, limit=10):
+        """Best games for a mode as (score, lines, level, finished_at) rows"""
+        return self.query("SELECT score, lines, level, finished_at FROM games WHERE mode = ? "
+                          "ORDER BY score DESC LIMIT ?", (mode, limit))
+
+    def fastest_boss_kills(self, boss, limit=10):
+        """Quickest wins against a boss as (kill_time_ms, score, finished_at) rows"""
+        return self.query("SELECT k.kill_time_ms, g.score, g.finished_at FROM boss_kills k "
+                          "JOIN games g ON g.id = k.game_id WHERE k.boss = ? "
+                          "ORDER BY k.kill_time_ms LIMIT ?", (boss, limit))
+
+    def piece_totals(self):
+        return dict(self.query("SELECT shape, SUM(count) FROM piece_counts GROUP BY shape"))
+
+    def attack_history(self, game_id):
+        return self.query("SELECT time_ms, attack, phase FROM boss_attacks WHERE game_id = ? ORDER BY time_ms",
+                          (game_id,))
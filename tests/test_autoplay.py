@@ -0,0 +1,20 @@
+import autoplay
+from replay_archive import ReplayArchive
+
+def test_event_stepped_games_replay_exactly(tmp_path):
+    archive = ReplayArchive(str(tmp_path / 'games.tzr'), writable=True)
+    games = []
+    for boss_mode in (False, True):
+        for game, _ in autoplay.run_games(3, 'heuristic', boss_mode, seed=5, max_time=60000, record=True):
+            archive.append_game(game)
+            games.append(game)
+    for game_id, game in enumerate(games, 1):
+        again = archive.replay(game_id)
+        assert (again.score, again.lines_cleared, again.game_time) == (game.score, game.lines_cleared, game.game_time)
+        assert again.grid == game.grid
+    archive.close()
+
+def test_advance_takes_fewer_steps_than_frames():
+    game = next(autoplay.run_games(1, 'heuristic', seed=5, max_time=30000, record=True))[0]
+    steps = sum(1 for i in range(1, len(game.recording), 2) if game.recording[i] == 0)
+    assert steps < game.game_time / 16
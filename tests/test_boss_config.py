@@ -0,0 +1,102 @@
+import copy
+import json
+import os
+import pickle
+
+import pytest
+
+import boss_config
+from boss_config import BossConfigError
+
+with open(boss_config.BOSS_FILE, encoding='utf-8') as f:
+    SHIPPED = json.load(f)
+
+def overlord(data):
+    return data['bosses']['overlord']
+
+# (what to break, where the error should point, what it should say)
+MALFORMED = [
+    (lambda data: data.update(version=2), "config", "unsupported version"),
+    (lambda data: data.update(bosses={}), "config", "at least one boss"),
+    (lambda data: overlord(data).update(max_health=0), "boss 'overlord'", "max_health"),
+    (lambda data: overlord(data).update(phases=[]), "boss 'overlord'", "at least one phase"),
+    (lambda data: overlord(data)['phases'][1].update(health=100), "boss 'overlord' phase 2", "decreasing"),
+    (lambda data: overlord(data)['phases'][0].update(attack_cooldown=0), "boss 'overlord' phase 1", "attack_cooldown"),
+    (lambda data: overlord(data).update(line_damage=[0, 5]), "boss 'overlord'", "line_damage"),
+    (lambda data: overlord(data)['attacks'].update(laser={}), "attack 'laser'", "unknown effect 'laser'"),
+    (lambda data: overlord(data)['attacks']['garbage_lines'].update(weight=-1), "attack 'garbage_lines'", "weight"),
+    (lambda data: overlord(data)['attacks']['garbage_lines'].update(phases=[4]), "attack 'garbage_lines'", "phases"),
+    (lambda data: overlord(data)['attacks']['garbage_lines'].update(colour=1), "attack 'garbage_lines'", "unknown keys"),
+    (lambda data: overlord(data)['attacks']['garbage_lines']['params'].update(min_lines=3), "attack 'garbage_lines'",
+     "min_lines <= max_lines"),
+    (lambda data: overlord(data)['attacks']['speed_boost']['params'].update(lines=1), "attack 'speed_boost'",
+     "no parameter 'lines'"),
+    (lambda data: overlord(data)['difficulty'].update(rate=2), "difficulty", "rate must be between 0 and 1"),
+    (lambda data: overlord(data)['difficulty'].update(gravity_scale=[1.0]), "difficulty", "gravity_scale"),
+    (lambda data: overlord(data)['difficulty'].update(garbage_bonus=[0, 1.5]), "difficulty", "whole lines"),
+    (lambda data: overlord(data)['difficulty']['weight_scale'].update(laser=[1, 2]), "difficulty", "unknown attack 'laser'"),
+]
+
+@pytest.mark.parametrize('breaks, where, message', MALFORMED)
+def test_malformed_bosses_are_rejected(breaks, where, message):
+    data = copy.deepcopy(SHIPPED)
+    breaks(data)
+    with pytest.raises(BossConfigError) as error:
+        boss_config.compile_bosses(data)
+    assert where in str(error.value) and message in str(error.value)
+
+def test_the_shipped_bosses_compile():
+    assert 'overlord' in boss_config.compile_bosses(copy.deepcopy(SHIPPED))
+
+def test_bad_json_names_the_file(tmp_path):
+    path = tmp_path / 'bosses.json'
+    path.write_text('{"version": 1,')
+    with pytest.raises(BossConfigError, match='bosses.json'):
+        boss_config.load_bosses(str(path), use_cache=False)
+
+@pytest.fixture
+def config(tmp_path, monkeypatch):
+    """A bosses.json of our own with the cache in tmp_path, and a count of real compiles"""
+    monkeypatch.setattr(boss_config, 'CACHE_DIR', str(tmp_path / 'cache'))
+    compiles = []
+    compile_bosses = boss_config.compile_bosses
+    monkeypatch.setattr(boss_config, 'compile_bosses', lambda data: compiles.append(1) or compile_bosses(data))
+    path = tmp_path / 'bosses.json'
+    path.write_text(json.dumps(SHIPPED))
+    return str(path), compiles
+
+def cache_file(path):
+    return os.path.join(boss_config.CACHE_DIR, os.path.basename(path) + '.compiled.pickle')
+
+def test_cache_is_used_until_the_file_changes(config):
+    path, compiles = config
+    first = boss_config.load_bosses(path)
+    assert boss_config.load_bosses(path) == first and len(compiles) == 1
+
+    data = copy.deepcopy(SHIPPED)
+    overlord(data)['max_health'] = 1500  # a different size too, whatever the mtime resolution
+    with open(path, 'w') as f:
+        f.write(json.dumps(data))
+    assert boss_config.load_bosses(path)['overlord']['max_health'] == 1500
+    assert len(compiles) == 2
+
+def test_cache_from_another_compiler_version_is_rebuilt(config, monkeypatch):
+    path, compiles = config
+    boss_config.load_bosses(path)
+    monkeypatch.setattr(boss_config, 'COMPILED_VERSION', boss_config.COMPILED_VERSION + 1)
+    boss_config.load_bosses(path)
+    assert len(compiles) == 2
+    # and the rebuilt cache carries the new version
+    with open(cache_file(path), 'rb') as f:
+        stamp, _ = pickle.load(f)
+    assert stamp[0] == boss_config.COMPILED_VERSION
+    boss_config.load_bosses(path)
+    assert len(compiles) == 2
+
+def test_unreadable_cache_is_rebuilt(config):
+    path, compiles = config
+    boss_config.load_bosses(path)
+    with open(cache_file(path), 'wb') as f:
+        f.write(b'not a pickle')
+    assert 'overlord' in boss_config.load_bosses(path)
+    assert len(compiles) == 2
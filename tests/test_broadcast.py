@@ -0,0 +1,48 @@
+import autoplay
+import broadcast
+import main
+import ruleset
+
+def test_mirror_keeps_up_with_the_game():
+    game = main.TetrisGame(False, seed=3, headless=True)
+    mirror = broadcast.BoardMirror.from_game(game)
+    decoder = broadcast.StreamDecoder()
+    decoder.feed(broadcast.encode_header(mirror.width, mirror.height, False))
+    locks = []
+
+    def listener(kind, time_ms, args):
+        for record in decoder.feed(broadcast.encode_event(kind, time_ms, args)):
+            mirror.apply(*record)
+        if kind == 'lock':
+            # Drop points are added before the lock, so the score is current without a line clear
+            locks.append((mirror.score, game.score))
+
+    game.listeners.append(listener)
+    autoplay.play_game(game, autoplay.heuristic_policy, max_time=120000)
+    assert len(locks) > 20
+    assert all(seen == score for seen, score in locks)
+    assert (mirror.score, mirror.lines, mirror.level) == (game.score, game.lines_cleared, game.level)
+
+def test_high_levels_survive_the_stream():
+    mirror = broadcast.BoardMirror(10, 20, False)
+    mirror.score, mirror.lines, mirror.level = 9000000, 3000, 300
+    again = broadcast.BoardMirror(10, 20, False)
+    for record in broadcast.StreamDecoder().feed(broadcast.encode_header(10, 20, False) +
+                                                 broadcast.encode_snapshot(mirror, 0) +
+                                                 broadcast.encode_event('line_clear', 5, ([19], 9000100, 3001, 301))):
+        again.apply(*record)
+    assert (again.score, again.lines, again.level) == (9000100, 3001, 301)
+
+def test_wide_boards_stream_their_garbage(monkeypatch):
+    monkeypatch.setitem(ruleset.RULES, 'huge', ruleset.Ruleset('huge', width=64, height=24, garbage_gaps=3))
+    game = main.TetrisGame(True, ruleset='huge', seed=4, headless=True)
+    mirror = broadcast.BoardMirror.from_game(game)
+    decoder = broadcast.StreamDecoder()
+    decoder.feed(broadcast.encode_header(mirror.width, mirror.height, True))
+    game.listeners.append(lambda kind, time_ms, args: [mirror.apply(*record) for record in
+                                                       decoder.feed(broadcast.encode_event(kind, time_ms, args))])
+    game.add_garbage_lines(3)
+    autoplay.play_game(game, autoplay.heuristic_policy, max_time=30000)
+    assert [[code != 0 for code in row] for row in mirror.board] == \
+        [[cell is not None for cell in row] for row in game.grid]
+    assert any(row[40] for row in mirror.board)
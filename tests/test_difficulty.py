@@ -0,0 +1,35 @@
+import autoplay
+import difficulty
+import main
+from features import BoardFeatures
+
+def test_board_features_follow_the_game_incrementally(monkeypatch):
+    events = []
+    for seed in (11, 12, 13):
+        game = main.TetrisGame(True, seed=seed, headless=True)
+        controller = game.difficulty
+        assert controller is not None
+        # Only ever placed into or shifted from here on, never rebuilt from the grid
+        monkeypatch.setattr(difficulty, 'BoardFeatures', None)
+
+        def checked(method, kind):
+            def hook(*args):
+                method(*args)
+                events.append(kind)
+                # Between a lock and its line clear the game's grid still has the full rows
+                if all(None in row for row in game.grid):
+                    expected = BoardFeatures.from_grid(game.grid, game.corrupted_grid)
+                    features = controller.features
+                    assert features.board.rows == expected.board.rows
+                    assert features.board.cols == expected.board.cols
+                    assert features.board.corrupted == expected.board.corrupted
+                    assert features.columns == expected.columns and features.transitions == expected.transitions
+                    assert controller.height == max(expected.column_heights())
+            return hook
+
+        controller.on_lock = checked(controller.on_lock, 'lock')
+        controller.on_line_clear = checked(controller.on_line_clear, 'line_clear')
+        controller.on_garbage = checked(controller.on_garbage, 'garbage')
+        autoplay.play_game(game, autoplay.heuristic_policy, max_time=180000, seed=seed)
+        monkeypatch.undo()
+    assert {'lock', 'line_clear', 'garbage'} <= set(events)
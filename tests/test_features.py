@@ -0,0 +1,60 @@
+import random
+
+import main
+from features import BoardFeatures
+
+def lock(grid, corrupted_grid, cells, corrupted):
+    for x, y in cells:
+        grid[y][x] = main.CORRUPTION_COLOR if corrupted else (0, 0, 255)
+        corrupted_grid[y][x] = corrupted
+    full = [y for y in range(len(grid)) if None not in grid[y]]
+    for y in sorted(full, reverse=True):
+        del grid[y]
+        del corrupted_grid[y]
+    for _ in full:
+        grid.insert(0, [None] * len(grid[0]))
+        corrupted_grid.insert(0, [False] * len(grid[0]))
+    return len(full)
+
+def test_place_matches_a_rescan_of_the_board():
+    rng = random.Random(7)
+    states = main.ROTATION_SYSTEMS['classic']['states']
+    cleared = 0
+    for _ in range(20):
+        width = 10
+        grid = [[None] * width for _ in range(20)]
+        corrupted_grid = [[False] * width for _ in range(20)]
+        # Start from some corrupted garbage, so clears have corrupted bits to squeeze out
+        for y in range(16, 20):
+            for x in range(width):
+                if rng.random() < 0.7:
+                    grid[y][x] = main.CORRUPTION_COLOR
+                    corrupted_grid[y][x] = True
+            grid[y][rng.randrange(width)] = None
+            corrupted_grid[y] = [cell is not None for cell in grid[y]]
+        features = BoardFeatures.from_grid(grid, corrupted_grid)
+        for _ in range(60):
+            shape = rng.choice('IOTSZJL')
+            placements = [[(x + cx, y + cy) for cx, cy in states[shape][rotation]]
+                          for rotation, x, y in main.enumerate_placements(grid, shape)]
+            if not placements:
+                break
+            # Half the time the placement that fills the most rows, so lines do get cleared
+            if rng.random() < 0.5:
+                cells = max(placements, key=lambda cells: sum(
+                    all(grid[y][x] is not None or (x, y) in cells for x in range(width)) for _, y in set(cells)))
+            else:
+                cells = rng.choice(placements)
+            corrupted = rng.random() < 0.3
+            features = features.place(cells, corrupted)
+            lines = lock(grid, corrupted_grid, cells, corrupted)
+            cleared += lines
+            expected = BoardFeatures.from_grid(grid, corrupted_grid)
+            assert features.board.rows == expected.board.rows
+            assert features.board.cols == expected.board.cols
+            assert features.board.corrupted == expected.board.corrupted
+            assert features.columns == expected.columns
+            assert features.transitions == expected.transitions
+            assert features.lines_cleared == lines
+            assert features.values()[:-1] == expected.values()[:-1]
+    assert cleared >= 10
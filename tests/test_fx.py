@@ -0,0 +1,59 @@
+import random
+
+import pygame
+
+import autoplay
+import main
+
+def renderer():
+    main.init_pygame(audio=False)
+    rules = main.get_ruleset()
+    return main.Renderer(pygame.display.set_mode((rules.window_width, rules.window_height)))
+
+def test_every_fx_is_started_once_across_skipped_snapshots():
+    game = main.TetrisGame(True, seed=2)
+    buffer = main.SnapshotBuffer(game.snapshot())
+    drawn = renderer()
+    started = []
+    drawn.start_fx = started.append
+    produced = []
+    rng = random.Random(2)
+    for frame in range(1500):
+        # Four simulation steps for every frame drawn, like 240 Hz against 60 fps
+        for step in range(4):
+            if (frame * 4 + step) % 120 == 0:
+                move = autoplay.heuristic_policy(game, rng)
+                if move is not None:
+                    autoplay.play_placement(game, *move)
+            alive = game.update(4)
+            produced.extend(game.fx)
+            buffer.publish(game.snapshot(game_over=not alive))
+        drawn.draw(buffer.latest(), 16)
+        if not alive or game.game_won:
+            break
+    # The last frame keeps being drawn once the game is over
+    for _ in range(10):
+        drawn.draw(buffer.latest(), 16)
+    kinds = {event[0] for event in produced}
+    assert kinds == {'burst', 'line_clear', 'garbage', 'shake', 'boss_hit'}
+    assert started == produced
+
+def test_redrawing_a_snapshot_doesnt_restart_its_effects():
+    game = main.TetrisGame(True, seed=2)
+    game.fx += [('line_clear', (18, 19)), ('garbage', 2), ('shake', 6), ('boss_hit',), ('burst', 100, 100, (255, 0, 0), 1.0)]
+    snap = game.snapshot()
+    drawn = renderer()
+    drawn.draw(snap, 16)
+    effects = drawn.effects
+    assert sorted(effect.kind for effect in effects.active) == ['boss_hit', 'garbage_rise', 'line_clear', 'shake']
+    assert len(drawn.particles) == 1
+    first = effects.time
+    drawn.draw(snap, 16)  # the combined values are worked out at the start of a frame
+    rise, flash = effects.rise, effects.boss_flash
+    for _ in range(5):
+        drawn.draw(snap, 16)
+    # The same effects, further along: flashes fade, the board settles, no new particles
+    assert all(effect.start == first for effect in effects.active)
+    assert len(effects.active) == 4 and len(drawn.particles) == 1
+    assert effects.rise < rise and effects.boss_flash < flash
+    assert effects.line_flashes[0][1] < 1
@@ -0,0 +1,70 @@
+import main
+
+LEFT, RIGHT = main.ACTIONS['left'], main.ACTIONS['right']
+
+def setup(das=100, arr=50):
+    # Slow gravity, so only the inputs move the piece
+    game = main.TetrisGame(seed=1, headless=True)
+    game.fall_speed = 100000
+    inputs = main.InputHandler(das, arr)
+    inputs.reset(0)
+    moves = []
+    perform = game.perform
+    game.perform = lambda action: (moves.append((inputs.time, action)), perform(action))
+    return game, inputs, moves
+
+def test_a_tap_moves_once():
+    game, inputs, moves = setup()
+    inputs.push(0, 'right', True)
+    inputs.push(90, 'right', False)
+    inputs.step(game, 1000)
+    assert moves == [(0, RIGHT)]
+
+def test_held_keys_repeat_after_das_every_arr():
+    game, inputs, moves = setup(das=100, arr=50)
+    inputs.push(10, 'right', True)
+    inputs.push(230, 'right', False)
+    inputs.step(game, 1000)
+    assert moves == [(10, RIGHT), (110, RIGHT), (160, RIGHT), (210, RIGHT)]
+
+def test_repeats_land_at_their_own_times_whatever_the_step():
+    timings = []
+    for step in (1, 4, 16, 250):
+        game, inputs, moves = setup(das=100, arr=50)
+        inputs.push(10, 'left', True)
+        for until in list(range(step, 300, step)) + [300]:
+            inputs.step(game, until)
+        timings.append(moves)
+    assert all(moves == timings[0] for moves in timings)
+    assert [time for time, _ in timings[0]] == [10, 110, 160, 210, 260]
+
+def test_zero_arr_slides_to_the_wall_after_das():
+    game, inputs, moves = setup(das=100, arr=0)
+    inputs.push(0, 'left', True)
+    inputs.step(game, 99)
+    assert len(moves) == 1
+    inputs.step(game, 100)
+    assert not game.is_valid_position(game.current_piece, -1, 0)
+    # Only the moves that worked were made
+    assert all(action == LEFT for _, action in moves)
+
+def test_the_latest_direction_wins_and_a_release_falls_back():
+    game, inputs, moves = setup(das=100, arr=50)
+    inputs.push(0, 'left', True)
+    inputs.push(120, 'right', True)  # restarts DAS to the right
+    inputs.push(300, 'right', False)  # left is still held, its DAS starts over
+    inputs.step(game, 420)
+    assert moves == [(0, LEFT), (100, LEFT), (120, RIGHT), (220, RIGHT), (270, RIGHT), (400, LEFT)]
+
+def test_lock_delay_starts_when_the_piece_lands():
+    game = main.TetrisGame(seed=1, headless=True)
+    piece = game.current_piece
+    while game.is_valid_position(piece, 0, 2):
+        piece.y += 1
+    game.fall_time = 0
+    interval = game.current_fall_interval()
+    # One long step: the piece falls its last row at `interval` and then rests for less than the lock delay
+    assert game.update(interval + game.lock_delay - 10)
+    assert game.current_piece is piece
+    assert game.update(10)
+    assert game.current_piece is not piece
@@ -0,0 +1,13 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_main_py_runs_its_body_once():
+    # -X importtime lists every module imported, main.py must only run as __main__
+    result = subprocess.run([sys.executable, '-X', 'importtime', 'main.py', '--help'], cwd=ROOT,
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0
+    imported = [line.rsplit('|', 1)[-1].strip() for line in result.stderr.splitlines()]
+    assert 'launcher' in imported and 'main' not in imported
@@ -0,0 +1,32 @@
+from quality import MAX_UP_WINDOWS, UP_WINDOWS, WINDOW, QualityManager
+
+def run(manager, frame_ms, frames):
+    """Feed frames whose draw time depends on the preset, returns the frames where it changed"""
+    changes = []
+    for frame in range(frames):
+        if manager.frame(frame_ms[manager.name]):
+            changes.append((frame, manager.name))
+    return changes
+
+def test_backs_off_before_retrying_a_preset_that_failed():
+    # High is just over budget, medium has plenty of headroom: the worst case for flapping
+    manager = QualityManager('auto')
+    changes = run(manager, {'high': 15.0, 'medium': 4.0}, 200 * WINDOW)
+    retries = [frame for frame, name in changes if name == 'high']
+    waits = [(later - earlier) // WINDOW for earlier, later in zip(retries, retries[1:])]
+    assert waits and waits[0] >= 2 * UP_WINDOWS
+    assert all(later >= earlier for earlier, later in zip(waits, waits[1:]))
+    assert max(waits) <= MAX_UP_WINDOWS + 1
+    assert len(changes) < 20
+
+def test_steps_back_up_when_there_is_headroom():
+    manager = QualityManager('auto')
+    run(manager, {'high': 30.0, 'medium': 30.0, 'low': 30.0, 'minimal': 30.0}, 10 * WINDOW)
+    assert manager.name == 'minimal'
+    run(manager, {'high': 2.0, 'medium': 2.0, 'low': 2.0, 'minimal': 2.0}, 500 * WINDOW)
+    assert manager.name == 'high'
+
+def test_fixed_presets_never_change():
+    manager = QualityManager('low')
+    assert run(manager, {'low': 100.0}, 10 * WINDOW) == []
+    assert manager.mode == 'low'
@@ -0,0 +1,101 @@
+import main
+
+# The SRS kick tables as published (x right, y up), written out independently of main.py
+JLSTZ = {
+    (0, 1): [(0, 0), (-1, 0), (-1, 1), (0, -2), (-1, -2)],
+    (1, 0): [(0, 0), (1, 0), (1, -1), (0, 2), (1, 2)],
+    (1, 2): [(0, 0), (1, 0), (1, -1), (0, 2), (1, 2)],
+    (2, 1): [(0, 0), (-1, 0), (-1, 1), (0, -2), (-1, -2)],
+    (2, 3): [(0, 0), (1, 0), (1, 1), (0, -2), (1, -2)],
+    (3, 2): [(0, 0), (-1, 0), (-1, -1), (0, 2), (-1, 2)],
+    (3, 0): [(0, 0), (-1, 0), (-1, -1), (0, 2), (-1, 2)],
+    (0, 3): [(0, 0), (1, 0), (1, 1), (0, -2), (1, -2)],
+}
+I = {
+    (0, 1): [(0, 0), (-2, 0), (1, 0), (-2, -1), (1, 2)],
+    (1, 0): [(0, 0), (2, 0), (-1, 0), (2, 1), (-1, -2)],
+    (1, 2): [(0, 0), (-1, 0), (2, 0), (-1, 2), (2, -1)],
+    (2, 1): [(0, 0), (1, 0), (-2, 0), (1, -2), (-2, 1)],
+    (2, 3): [(0, 0), (2, 0), (-1, 0), (2, 1), (-1, -2)],
+    (3, 2): [(0, 0), (-2, 0), (1, 0), (-2, -1), (1, 2)],
+    (3, 0): [(0, 0), (1, 0), (-2, 0), (1, -2), (-2, 1)],
+    (0, 3): [(0, 0), (-1, 0), (2, 0), (-1, 2), (2, -1)],
+}
+SRS = main.ROTATION_SYSTEMS['srs']
+CLASSIC = main.ROTATION_SYSTEMS['classic']
+
+def grid_offsets(table):
+    # The game's y points down
+    return {move: tuple((dx, -dy) for dx, dy in offsets) for move, offsets in table.items()}
+
+def game_with(shape, rotation_system, rotation=0, x=3, y=8, blocks=()):
+    game = main.TetrisGame(rotation_system=rotation_system, seed=1, headless=True)
+    piece = main.Tetromino(shape, main.TETROMINO_COLORS[shape], rotation_system, x, y)
+    piece.rotation = rotation
+    game.current_piece = piece
+    for bx, by in blocks:
+        game.grid[by][bx] = main.CORRUPTION_COLOR
+    return game, piece
+
+def test_srs_kick_tables_match_the_standard():
+    for shape in 'JLSTZ':
+        assert SRS['kicks'][shape] == grid_offsets(JLSTZ)
+    assert SRS['kicks']['I'] == grid_offsets(I)
+    # O never needs a kick
+    assert all(offsets == ((0, 0),) for offsets in SRS['kicks']['O'].values())
+
+def test_srs_has_no_180_or_skipping_moves():
+    for shape, table in SRS['kicks'].items():
+        assert set(table) == set(JLSTZ)
+        assert not any((start - end) % 4 == 2 for start, end in table)
+
+def test_each_srs_kick_is_tried_in_order():
+    # For every move and every kick, block the earlier kicks' cells and check the piece ends up at that kick
+    cases = 0
+    for shape in 'IJLSTZ':
+        for (start, end), offsets in SRS['kicks'][shape].items():
+            for k, (kx, ky) in enumerate(offsets):
+                x, y = 3, 8
+                states = SRS['states'][shape]
+                here = {(x + cx, y + cy) for cx, cy in states[start]}
+                target = {(x + kx + cx, y + ky + cy) for cx, cy in states[end]}
+                blocks = set()
+                for dx, dy in offsets[:k]:
+                    free = {(x + dx + cx, y + dy + cy) for cx, cy in states[end]} - here - target
+                    if not free:
+                        break  # this earlier kick can't be blocked without blocking kick k too
+                    blocks.add(min(free))
+                else:
+                    game, piece = game_with(shape, 'srs', start, x, y, blocks)
+                    assert game.rotate_piece(1 if (end - start) % 4 == 1 else -1)
+                    assert (piece.rotation, piece.x, piece.y) == (end, x + kx, y + ky), (shape, start, end, k)
+                    cases += 1
+    assert cases > 150
+
+def test_rotation_fails_when_every_kick_is_blocked():
+    # A vertical I in a one wide shaft has nowhere to turn
+    blocks = [(bx, by) for by in range(4, 14) for bx in range(10) if bx != 5]
+    game, piece = game_with('I', 'srs', 1, 3, 8, blocks)
+    assert piece.get_cells() == [(5, 8), (5, 9), (5, 10), (5, 11)]
+    assert not game.rotate_piece(1) and not game.rotate_piece(-1)
+    assert (piece.rotation, piece.x, piece.y) == (1, 3, 8)
+
+def test_classic_rotation_never_kicks():
+    for shape, table in CLASSIC['kicks'].items():
+        count = len(CLASSIC['states'][shape])
+        assert set(table) == {(r, (r + d) % count) for r in range(count) for d in (1, -1)}
+        assert all(offsets == ((0, 0),) for offsets in table.values())
+    # One block in the way of the turned piece is enough to stop it, where SRS would kick
+    stopped = 0
+    for shape, states in CLASSIC['states'].items():
+        for (start, end) in CLASSIC['kicks'][shape]:
+            x, y = 3, 8
+            here = {(x + cx, y + cy) for cx, cy in states[start]}
+            target = {(x + cx, y + cy) for cx, cy in states[end]} - here
+            if not target:
+                continue  # O: turning doesn't move any cell
+            game, piece = game_with(shape, 'classic', start, x, y, [min(target)])
+            assert not game.rotate_piece(1 if (end - start) % len(states) == 1 else -1)
+            assert (piece.rotation, piece.x, piece.y) == (start, x, y)
+            stopped += 1
+    assert stopped >= 20
@@ -0,0 +1,17 @@
+from main import EventScheduler, TetrisGame
+
+def test_cancel_ignores_fired_handles():
+    scheduler = EventScheduler()
+    handle = scheduler.schedule(10, 'tick')
+    fired = []
+    scheduler.advance(20, lambda event, data: fired.append(event))
+    scheduler.cancel(handle)
+    assert fired == ['tick']
+    assert not scheduler.cancelled
+
+def test_cancelled_stays_bounded_over_many_attacks():
+    # Only the boss's clock runs, so the fight never ends on its own
+    game = TetrisGame(True, seed=3, headless=True)
+    while len(game.attack_history) < 200:
+        game.scheduler.advance(100, game.handle_event)
+        assert len(game.scheduler.cancelled) <= 4
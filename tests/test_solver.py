@@ -0,0 +1,44 @@
+import main
+from puzzle import Puzzle, PUZZLES
+from solver import Solver, SolverProcess
+
+def setup(spec, max_nodes=1000000):
+    rules = main.get_ruleset(spec.ruleset)
+    grid, _ = spec.build_grid(rules, main.TETROMINO_COLORS, main.CORRUPTION_COLOR)
+    return Solver(rules, main.ROTATION_SYSTEMS[spec.rotation], spec.pieces, max_nodes), Solver.board_from_grid(grid)
+
+def test_solves_the_shipped_puzzles():
+    for key in ('well', 'gap', 'slot', 'tower', 'stairs', 'bowl'):
+        solver, board = setup(PUZZLES[key])
+        solution = solver.solve(board)
+        assert solution and len(solution) <= len(PUZZLES[key].pieces)
+        # Playing the solution back clears the board
+        for shape, rotation, x, y in solution:
+            mask = sum(1 << (cy * solver.width + cx) for cx, cy in solver.cells(shape, rotation, x, y))
+            assert not board & mask
+            board, _ = solver.lock(board, mask)
+        assert board == 0
+
+def test_unsolvable_puzzles_return_none():
+    for pieces, rows in (('I', ['XXXXXXXX..', 'XXXXXXXX..']), ('OO', ['XXXXXXXXX.']), ('T', ['X.X.X.X.X.'])):
+        solver, board = setup(Puzzle('nope', None, pieces, rows))
+        assert solver.solve(board) is None
+        assert solver.complete
+
+def test_search_stops_at_the_node_cap():
+    solver, board = setup(PUZZLES['marathon'], max_nodes=50)
+    assert solver.solve(board) is None
+    assert not solver.complete and solver.nodes == 50
+
+def test_solver_process_gives_the_same_hints():
+    spec = PUZZLES['tower']
+    solver, board = setup(spec)
+    rules = main.get_ruleset(spec.ruleset)
+    process = SolverProcess()
+    try:
+        move, complete, cells = process.hint(spec.key, rules, main.ROTATION_SYSTEMS[spec.rotation], spec.pieces,
+                                             100000, board, 0)
+    finally:
+        process.close()
+    assert complete and move == solver.hint(board, 0)
+    assert cells == solver.cells(*move)
@@ -0,0 +1,33 @@
+from main import TetrisGame
+from stats import StatsStore
+
+def finished_game(seed):
+    game = TetrisGame(True, seed=seed, headless=True)
+    game.update(5000)
+    return game
+
+def test_two_stores_share_a_database(tmp_path):
+    path = str(tmp_path / 'stats.db')
+    first, second = StatsStore(path), StatsStore(path)
+    ids = []
+    for i in range(6):
+        (first if i % 2 else second).record_game(finished_game(i), 'boss', ids.append)
+        # Each store writes its own batch, the way two kiosks would
+        first.flush()
+        second.flush()
+    first.close()
+    second.close()
+    assert sorted(ids) == sorted(set(ids)) and len(ids) == 6
+    assert len(StatsStore(path).top_scores('boss')) == 6
+
+def test_failed_batch_doesnt_stop_the_writer(tmp_path, capsys):
+    store = StatsStore(str(tmp_path / 'stats.db'))
+    saved = []
+    store.record_game(finished_game(1), None, saved.append)  # mode is NOT NULL
+    store.flush()
+    store.record_game(finished_game(2), 'boss', saved.append)
+    store.flush()
+    store.close()
+    assert len(saved) == 1
+    assert len(store.top_scores('boss')) == 1
+    assert 'dropped' in capsys.readouterr().err